@@ -0,0 +1,88 @@
+"""
+Measures the agent's own overhead per loop (prompt assembly, parsing, events, bookkeeping) by replaying a recorded
+run from a cassette with no LLM or tool latency, then replays it with the recorded latency 100x faster.
+
+    python benchmarks/bench_agent_overhead.py [--steps 20] [--runs 50]
+
+The run is recorded from a scripted LLM, swap in a cassette recorded from a real provider to profile real prompts.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from squad_goals import Agent, Cassette, Task  # noqa: E402
+from squad_goals.llms.base_llm import LLM  # noqa: E402
+from squad_goals.tools import BaseTool  # noqa: E402
+
+
+class ScriptedLLM(LLM):
+    """ searches `steps` times, then answers, taking 50ms per call """
+    provider = 'scripted'
+
+    def __init__(self, steps):
+        super().__init__()
+        self.steps = steps
+
+    def _generate(self, messages, **kwargs):
+        time.sleep(0.05)  # recorded latency, replayed 100x faster below
+        done = messages[-1]['content'].count('Observation: result for step')
+        if done >= self.steps:
+            return 'Thought: enough\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "done"}'
+        return (f'Thought: I need step {done}\nAction: Search Tool\n'
+                f'Action Input: {{"query": "step {done}", "filters": {{"year": {{"gte": 2020}}}}}}')
+
+
+class SearchTool(BaseTool):
+    def __init__(self):
+        super().__init__("Search Tool", "Searches the web")
+
+    def run(self, query: str, filters: dict = None) -> str:
+        '''
+        :param query: what to search for
+        :param filters: optional filters
+        '''
+        return f'result for {query}: ' + 'lorem ipsum ' * 50
+
+
+def make_agent(cassette, llm, steps):
+    return Agent(llm=cassette.wrap_llm(llm), tools=cassette.wrap_tools([SearchTool()]), max_loops=steps + 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), 'overhead.jsonl')
+    task = lambda: Task(name='overhead', goal='collect all the steps')  # noqa: E731
+
+    start = time.perf_counter()
+    list(make_agent(Cassette(path, mode='record'), ScriptedLLM(args.steps), args.steps).run(task()))
+    print(f"recorded {args.steps + 1} loops in {time.perf_counter() - start:.2f}s")
+
+    cassette = Cassette(path)
+    agent = make_agent(cassette, ScriptedLLM(args.steps), args.steps)
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        cassette.rewind()
+        events = list(agent.run(task()))
+    elapsed = time.perf_counter() - start
+    assert events[-1]['event'] == 'agent_completed', events[-1]
+    loops = args.runs * (args.steps + 1)
+    print(f"replayed {args.runs} runs without latency: {elapsed / args.runs * 1000:.1f} ms per run, "
+          f"{elapsed / loops * 1e6:.0f} us framework overhead per loop")
+
+    cassette = Cassette(path, latency='recorded', speed=100)
+    agent = make_agent(cassette, ScriptedLLM(args.steps), args.steps)
+    start = time.perf_counter()
+    list(agent.run(task()))
+    print(f"replayed at 100x: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
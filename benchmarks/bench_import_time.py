@@ -0,0 +1,73 @@
+"""
+Cold-start import time of squad_goals, each statement timed in fresh interpreters (median of --runs), failing when
+a bare package import goes over its budget or loads a provider SDK / tool dependency it should leave for first use.
+
+    python benchmarks/bench_import_time.py [--runs 7] [--budget-ms 50] [--profile]
+
+--profile prints the slowest modules `from squad_goals import Agent` imports (python -X importtime).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = str(Path(__file__).resolve().parents[1])
+
+# imports that have to stay within the budget, and what they must not load
+BUDGETED = ['import squad_goals', 'import squad_goals.tools', 'import squad_goals.llms']
+REPORTED = ['from squad_goals.tools import PythonREPLTool', 'from squad_goals import Task',
+            'from squad_goals import Agent, Task']
+DEFERRED_MODULES = ['serpapi', 'requests', 'openai', 'anthropic', 'google.generativeai', 'ollama', 'supabase',
+                    'googleapiclient', 'httpx', 'pydantic']
+
+TIMER = "import time; start = time.perf_counter(); {statement}; print((time.perf_counter() - start) * 1000)"
+LOADED = "import sys; {statement}; print(','.join(m for m in {modules!r} if m in sys.modules))"
+
+
+def run(code, *flags):
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def time_import(statement, runs):
+    return statistics.median(float(run(TIMER.format(statement=statement)).stdout) for _ in range(runs))
+
+
+def profile(statement, top=15):
+    rows = []
+    for line in run(statement, '-X', 'importtime').stderr.splitlines()[1:]:
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|').split('|'))
+        rows.append((int(cumulative_us), int(self_us), name))
+    print(f'\nslowest imports of `{statement}` (cumulative / self ms):')
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f'  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=50.)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    failures = []
+    print(f'{"statement":<45} {"median ms":>10}')
+    for statement in BUDGETED + REPORTED:
+        elapsed = time_import(statement, args.runs)
+        over = statement in BUDGETED and elapsed > args.budget_ms
+        print(f'{statement:<45} {elapsed:>10.1f}{"  OVER BUDGET" if over else ""}')
+        if over:
+            failures.append(f'{statement} took {elapsed:.1f}ms, the budget is {args.budget_ms:.0f}ms')
+
+    loaded = run(LOADED.format(statement='; '.join(BUDGETED), modules=DEFERRED_MODULES)).stdout.strip()
+    if loaded:
+        failures.append(f'{"; ".join(BUDGETED)} loaded {loaded}')
+    if args.profile:
+        profile('from squad_goals import Agent')
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of extract_json_from_string (squad_goals.utils.extraction) against the findall + eval version it
+replaced, on a corpus of final answers, tool inputs and large tool outputs.
+
+    python benchmarks/bench_json_extraction.py
+"""
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from squad_goals.utils.extraction import extract_json_from_string  # noqa: E402
+
+
+def legacy_extract_json_from_string(input_string):
+    matches = re.findall(r'({(?:[^{}]|(?:{[^{}]*}))*})', input_string, re.DOTALL)
+    for match in matches:
+        try:
+            return json.loads(match, strict=False)
+        except Exception:
+            pass
+    matches = re.findall(r'(\{(?:[^{}]|(?:\{[^{}]*\}))*\}|\[(?:[^\[\]]|(?:\[[^\[\]]*\]))*\])', input_string, re.DOTALL)
+    for match in matches:
+        try:
+            match = match.replace('\\"', '"')
+            return eval(match)
+        except Exception:
+            pass
+    matches = re.findall(r'([\[{].*?[\]}])', input_string, re.DOTALL)
+    for match in matches:
+        try:
+            match = match.replace('\\"', '"')
+            return eval(match)
+        except Exception:
+            pass
+    return None
+
+
+def search_results(n):
+    # a large tool output: prose with a few bracketed citations, then the JSON payload
+    rows = [{'title': f'Result {i}', 'url': f'https://example.com/{i}', 'snippet': 'lorem ipsum [citation] ' * 5}
+            for i in range(n)]
+    return 'Here are the results [1][2][3] of the search:\n' + json.dumps({'results': rows})
+
+
+def python_dict(n):
+    # the single quoted, True / None style the legacy version needed eval for
+    return "Action Input: " + repr({'items': [{'id': i, 'done': i % 2 == 0, 'note': None} for i in range(n)]})
+
+
+def deep_tool_input(depth):
+    return 'Action Input: ' + '{"a": ' * depth + '1' + '}' * depth
+
+
+def prose_with_brackets(n):
+    # no JSON at all, only brackets in text, e.g. a long final answer in markdown
+    return 'See [the docs] for {details} and (notes). ' * n
+
+
+CORPUS = {
+    'final answer list': json.dumps({'final_answer': [f'Step {i}: do the thing' for i in range(50)]}),
+    'search results (2k rows)': search_results(2_000),
+    'python dict (2k items)': python_dict(2_000),
+    'tool input nested 50 deep': deep_tool_input(50),
+    'prose with brackets (5k)': prose_with_brackets(5_000),
+    'unclosed object': 'Action Input: ' + '{"a": [' * 500 + '1',
+}
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"  {label:<12}{seconds * 1000:10.3f} ms")
+    return seconds
+
+
+def main():
+    for name, text in CORPUS.items():
+        print(f"{name} ({len(text):,} chars)")
+        same = legacy_extract_json_from_string(text) == extract_json_from_string(text)
+        legacy = bench('legacy', lambda: legacy_extract_json_from_string(text), 5)
+        new = bench('scanner', lambda: extract_json_from_string(text), 5)
+        print(f"  speedup: {legacy / new:.2f}x, same result: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the ReAct parser (squad_goals.utils.parsing) against the nested-brace regex Agent._parse used
+before it, on large generations.
+
+    python benchmarks/bench_react_parser.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from squad_goals.utils.parsing import ReActParser, parse_actions  # noqa: E402
+
+LEGACY_ACTION_REGEX = r"Action:\s*\[?(.*?)\]?\s*[\r\n]+Action Input:.*?({[^{}]*({[^{}]*})*[^{}]*})"
+
+
+def legacy_parse(text):
+    return re.search(LEGACY_ACTION_REGEX, text, re.DOTALL)
+
+
+def legacy_parse_all(text):
+    return list(re.finditer(LEGACY_ACTION_REGEX, text, re.DOTALL))
+
+
+def long_thought(n_chars):
+    thought = ('I should consider the search results above before choosing the next tool. ' * (n_chars // 75 + 1))
+    return f"Thought: {thought[:n_chars]}\nAction: Search Tool\nAction Input: {{\"query\": \"squad goals\"}}"
+
+
+def many_actions(n):
+    return '\n'.join(f'Thought: step {i}\nAction: Search Tool\nAction Input: {{"query": "q{i}", "page": {{"n": {i}}}}}'
+                     for i in range(n))
+
+
+def unclosed_input(n_braces):
+    # an Action Input that never closes, the regex retries every brace position
+    return 'Action: Search Tool\nAction Input: ' + '{"a": ' * n_braces + '1'
+
+
+def inputs_without_json(n):
+    # a model stuck repeating actions without a JSON input, the regex backtracks over every Action line pair
+    return 'Action: Search Tool\nAction Input: none\n' * n
+
+
+CASES = {
+    'long thought': long_thought(200_000),
+    '500 actions': many_actions(500),
+    'unclosed input': unclosed_input(2_000),
+    'inputs without json': inputs_without_json(100),
+}
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"  {label:<28}{seconds * 1000:10.3f} ms")
+    return seconds
+
+
+def main():
+    for name, text in CASES.items():
+        print(f"{name} ({len(text):,} chars)")
+        number = 1 if name == 'inputs without json' else 20
+        bench('legacy regex, first action', lambda: legacy_parse(text), number)
+        legacy = bench('legacy regex, all actions', lambda: legacy_parse_all(text), number)
+        parser = bench('ReActParser, all actions', lambda: parse_actions(text), number)
+
+        def chunked():
+            parser = ReActParser()
+            for i in range(0, len(text), 4):  # ~1 streamed token at a time
+                parser.feed(text[i:i + 4])
+
+        bench('ReActParser, 4 char chunks', chunked, 1)
+        print(f"  speedup over legacy, all actions: {legacy / parser:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
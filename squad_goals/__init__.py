@@ -1,7 +1,26 @@
 __version__ = "0.1.0"
 
-from .agent import Agent
+from typing import TYPE_CHECKING
 
-from .task import Task
+from .utils.lazy import lazy_exports
 
-from .workflow import Plan, Workflow
+# loaded on first use, so `import squad_goals` (and a worker that only needs a Task) stays cheap
+_EXPORTS = {
+    'Agent': 'agent',
+    'Cassette': 'cassette',
+    'SQLiteCheckpointStore': 'checkpoint',
+    'AgentPool': 'pool',
+    'Task': 'task',
+    'Plan': 'workflow',
+    'Workflow': 'workflow',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from .agent import Agent
+    from .cassette import Cassette
+    from .checkpoint import SQLiteCheckpointStore
+    from .pool import AgentPool
+    from .task import Task
+    from .workflow import Plan, Workflow
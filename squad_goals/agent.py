@@ -1,15 +1,29 @@
+import asyncio
+import contextvars
 import datetime
 import json
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from copy import copy
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Tuple
 from typing import Optional
 
 from squad_goals.conversation.models import Conversation, Message
+from .checkpoint import CheckpointStore
 from .llms.base_llm import LLM
+from .llms.near_cache import NearDuplicateCache
+from .prompts.builder import CompiledPrompt
+from .prompts.context import ContextManager
+from .pool import AgentPool, BatchResult
+from .session import AgentSession
 from .task import Task
+from .tracing import span
 from .tools.base_tool import BaseTool, ReturnFinalAnswerTool
+from .tools.cache import ToolCache
+from .tools.registry import ToolRegistry
 from .utils import extract_json_from_string
+from .utils.parsing import ActionInputWatcher, parse_actions
 
 OBSERVATION_TOKEN = "Observation:"
 NEXT_THOUGHT_TOKEN = "Next Thought:"
@@ -57,9 +71,66 @@ First Thought:
 {previous_responses}
 """
 
+MULTI_ACTION_PROMPT_TEMPLATE = """Today is {today} and you can use tools to get new information. 
+Respond to the user's input as best as you can using the following tools:
+
+{tool_description}
+
+Each thought can run SEVERAL independent actions at once. Their results come back together as one Observation per action.
+
+First Thought:
+Thought: comment on what you want to do next and which lookups can happen at the same time.
+Action: the action to take, exactly one element of [{tool_names}]
+Action Input: the input to the action (must be a single line json loadable dictionary of parameters e.g. {param_value_dict})
+Action: another action that does not depend on the previous one (optional), exactly one element of [{tool_names}]
+Action Input: the input to that action (must be a single line json loadable dictionary of parameters e.g. {param_value_dict})
+Observation: the results of the actions
+Next Thought: (7 thoughts left)
+Thought: Now comment on what you want to do next.
+Action: the next action to take, exactly one element of [{tool_names}]
+Action Input: the input to the next action (must be a single line json loadable dictionary of parameters e.g. {param_value_dict})
+Observation: the result of the next action
+... (this Thought/Action/Action Input/Observation repeats until you are sure of the answer)
+Next Thought: (6 thoughts left)
+Thought: I can finally return the final answer
+Action: Return Final Answer Tool
+Action Input: {final_answer_dict}
+
+YOU MUST END WITH THE "Return Final Answer Tool" TO RETURN THE FINAL ANSWER TO THE USER and the final answer must be in the "Action Input" field.
+The "Return Final Answer Tool" must be the only action in its thought.
+
+Begin:
+
+##########
+START GOAL
+##########
+{goal}
+##########
+END GOAL
+##########
+
+First Thought:
+{previous_responses}
+"""
+
+
+TOOL_CALLING_PROMPT_TEMPLATE = """Today is {today} and you can use tools to get new information.
+Respond to the user's input as best as you can by calling the tools you were given.
+When you are sure of the answer, call the "Return_Final_Answer_Tool" tool with the final answer.
+
+##########
+START GOAL
+##########
+{goal}
+##########
+END GOAL
+##########
+
+{previous_responses}
+"""
 
 class Agent():
-    def __init__(self, llm: LLM, tools: List[BaseTool] = [],
+    def __init__(self, llm: LLM, tools: Optional[List[BaseTool]] = None,
                  prompt_template: str = PROMPT_TEMPLATE,
                  max_loops: int = 5,
                  verbose: bool = False,
@@ -67,20 +138,34 @@ class Agent():
                  tool_eval_mode: bool = False,
                  conversation: Optional[Conversation] = None,
                  name: str = 'Agent',
-                 use_conversation: bool = False
+                 use_conversation: bool = False,
+                 multi_action: bool = False,
+                 max_parallel_tools: int = 4,
+                 stream: bool = False,
+                 tool_calling: bool = False,
+                 context_manager: Optional[ContextManager] = None,
+                 checkpoint_store: Optional[CheckpointStore] = None,
+                 near_duplicate_cache: Optional[NearDuplicateCache] = None,
+                 tool_cache: Optional[ToolCache] = None
                  ):
+        self.near_duplicate_cache = near_duplicate_cache  # Answers nearly identical prompts from cache, None = off
+        self._near_duplicate_llm = None  # self.llm behind the near-duplicate cache, see _model
         self.llm = llm  # Language model we are using
-        self.tools = tools  # List of tools the agent can use
+        self._tool_registry = None  # Compiled tool descriptions/schemas, rebuilt when the tools change
+        tools = list(tools or [])  # copy so the caller's list (or a shared default) is never mutated
         if not any(isinstance(tool, ReturnFinalAnswerTool) for tool in tools):  # Ensure we have a final answer tool
             tools.append(ReturnFinalAnswerTool())
+        self.tools = tools  # List of tools the agent can use
+        if stream and tool_calling:
+            raise ValueError("stream and tool_calling can not be used together")
+        if tool_calling and prompt_template == PROMPT_TEMPLATE:  # tools are described by the provider's tool schemas
+            prompt_template = TOOL_CALLING_PROMPT_TEMPLATE
+        elif multi_action and prompt_template == PROMPT_TEMPLATE:  # the default template only allows one action
+            prompt_template = MULTI_ACTION_PROMPT_TEMPLATE
         self.prompt_template = copy(prompt_template)  # Template for the prompt
         self.max_loops = max_loops  # Maximum number of loops to run
-        self.ai_responses = []  # List of responses from the AI
         self.verbose = verbose  # Verbose mode
         self.debug = debug  # Debug mode
-        self.errors_encountered = []  # List of errors encountered
-        self.tools_selected = []  # List of tools selected
-        self.tools_used = []  # List of tools used
         self.tool_eval_mode = tool_eval_mode  # If True, the tools will not be run
         self.stop_pattern = [f'\n{OBSERVATION_TOKEN}', f'\n\t{OBSERVATION_TOKEN}']  # Stop pattern for the LLM
         self.conversation = conversation  # Conversation object
@@ -88,133 +173,573 @@ class Agent():
             self.conversation = Conversation(messages=[])
         self.name = name  # Name of the agent
         self.use_conversation = use_conversation  # If True, the agent will use the conversation object
+        self.multi_action = multi_action  # If True, every Action/Action Input pair in a thought is run
+        self.max_parallel_tools = max_parallel_tools  # Max tools running at once in multi action mode
+        self.stream = stream  # If True, stream the LLM output as token events and dispatch tools early
+        self.tool_calling = tool_calling  # If True, use the provider's native function calling instead of ReAct text
+        self.context_manager = context_manager  # Keeps the scratchpad inside a token budget, None = unbounded
+        self.checkpoint_store = checkpoint_store  # Saves every run after each loop so it can be resumed, None = off
+        self.tool_cache = tool_cache  # Reuses read-only tool results across runs, None = only within each run
+        self.last_session = None  # Session of the most recently started run, per-run state lives on AgentSession
+
+    @property
+    def tools(self) -> List[BaseTool]:
+        return self._tools
+
+    @tools.setter
+    def tools(self, tools: List[BaseTool]):
+        self._tools = tools
+        self._tool_registry = None
+
+    @property
+    def _model(self) -> LLM:
+        ''' the LLM the agent's calls go through: self.llm, behind the near-duplicate cache if there is one '''
+        if self.near_duplicate_cache is None:
+            return self.llm
+        if self._near_duplicate_llm is None or self._near_duplicate_llm.llm is not self.llm:
+            self._near_duplicate_llm = self.near_duplicate_cache.wrap_llm(self.llm)
+        return self._near_duplicate_llm
+
+    @property
+    def tool_registry(self) -> ToolRegistry:
+        # also catches in-place edits like agent.tools.append(...)
+        if self._tool_registry is None or not self._tool_registry.matches(self._tools):
+            self._tool_registry = ToolRegistry(self._tools)
+        return self._tool_registry
 
     @property
     def tool_description(self) -> str:
-        return "\n".join(
-            [f"{tool.name}: {tool.description}. how to run: {tool._describe_run()}" for tool in self.tools])
+        return self.tool_registry.description
 
     @property
     def quoted_tool_names(self) -> str:
-        return ", ".join([f'"{tool.name}"' for tool in self.tools])
+        return self.tool_registry.quoted_names
 
     @property
     def tool_by_names(self) -> Dict[str, BaseTool]:
-        return {tool.name: tool for tool in self.tools}
+        return self.tool_registry.by_name
+
+    # the per-run lists below used to live on the agent, they now read from the most recently started session
+    @property
+    def ai_responses(self) -> List[str]:
+        return self.last_session.ai_responses if self.last_session else []
+
+    @property
+    def errors_encountered(self) -> List[Exception]:
+        return self.last_session.errors_encountered if self.last_session else []
+
+    @property
+    def tools_selected(self) -> List[str]:
+        return self.last_session.tools_selected if self.last_session else []
+
+    @property
+    def tools_used(self) -> List[str]:
+        return self.last_session.tools_used if self.last_session else []
 
-    def run(self, task: Task, yield_events=False):
-        previous_responses = copy(self.ai_responses)
-        num_loops = 0
-        prompt = copy(self.prompt_template).format(
+    def new_session(self, task: Task, history: Optional[List[str]] = None,
+                    run_id: Optional[str] = None) -> AgentSession:
+        """
+        Creates the per-run state for a task. Pass `history` (e.g. an earlier session's ai_responses) to start the
+        scratchpad from previous turns instead of from scratch, and `run_id` to choose the key of its checkpoints.
+        """
+        registry = self.tool_registry  # compiled once per tool list, reused for the whole run
+        prompt = CompiledPrompt(
+            self.prompt_template,
+            turns=history,
+            context_manager=self.context_manager,
             today=datetime.date.today(),
-            tool_description=self.tool_description,
-            tool_names=self.quoted_tool_names,
+            tool_description=registry.description,
+            tool_names=registry.quoted_names,
             goal=task.goal,
-            previous_responses='{previous_responses}',
-            final_answer_dict='{final_answer_dict}',
-            param_value_dict='{param_value_dict}'
+            final_answer_dict=final_answer_dict,
+            param_value_dict=param_value_dict
         )
+        session = AgentSession(task, prompt, registry, run_id)
+        session.checkpoints = self.checkpoint_store
+        session.tool_cache = self.tool_cache if self.tool_cache is not None else ToolCache(ttl=None)
+        task.metrics = session.metrics
+        self.last_session = session
+        return session
 
-        def execute_steps():
-            nonlocal num_loops
-            while num_loops < self.max_loops:
-                num_loops += 1
-                curr_prompt = prompt.replace(
-                    '{previous_responses}', '\n'.join(previous_responses).strip(),
-                ).replace(
-                    '{final_answer_dict}', final_answer_dict
-                ).replace('{param_value_dict}', param_value_dict)
-
-                generated, tool, tool_input = self.decide_next_action(curr_prompt)
-                yield dict(event='next_agent_action', loop=num_loops, tool=tool, tool_input=tool_input,
-                           generated=generated)
-
-                self.tools_selected.append(tool)
-                if tool not in self.tool_by_names:
-                    self.errors_encountered.append(ValueError(f"Unknown tool: {tool}"))
-                    yield dict(event='error', message=f"Unknown tool: {tool}")
-                    continue
+    def restore_session(self, run_id: str, checkpoint_store: Optional[CheckpointStore] = None) -> AgentSession:
+        """
+        Rebuilds a session from the latest checkpoint of a run (from this agent's checkpoint store by default), with
+        the scratchpad, loop count and task state it had after its last completed loop.
+        """
+        store = checkpoint_store or self.checkpoint_store
+        if store is None:
+            raise ValueError("No checkpoint store to restore from, pass one as Agent(..., checkpoint_store=...)")
+        state = store.require(run_id, 'agent')
+        task = Task(name=state['task']['name'], goal=state['task']['goal'],
+                    output_format=state['task']['output_format'])
+        task.raw_output = state['task']['raw_output']
+        task.completed = state['task']['completed']
+        task.succeeded = state['task']['succeeded']
+        session = self.new_session(task, history=state['ai_responses'], run_id=run_id)
+        session.checkpoints = store
+        session.num_loops = session.metrics.loops = state['num_loops']
+        session.tools_selected = state['tools_selected']
+        session.tools_used = state['tools_used']
+        session.errors_encountered = [RuntimeError(error) for error in state['errors']]
+        return session
+
+    def resume(self, run_id: str, yield_events: bool = False):
+        """
+        Continues a run from its latest checkpoint without repeating the LLM and tool calls of the loops it
+        completed. A run that had already finished only returns its final answer again.
+        """
+        session = self.restore_session(run_id)
+        if session.task.completed:
+            events = iter([self._with_totals(dict(event='agent_completed', final_answer=session.task.raw_output),
+                                             session)])
+            return events if yield_events else list(events)
+        return self.run(session.task, yield_events=yield_events, session=session)
+
+    async def aresume(self, run_id: str):
+        ''' async counterpart of resume(), an async generator like arun() '''
+        session = self.restore_session(run_id)
+        if session.task.completed:
+            yield self._with_totals(dict(event='agent_completed', final_answer=session.task.raw_output), session)
+            return
+        async for event in self.arun(session.task, session=session):
+            yield event
+
+    @staticmethod
+    def _checkpoint(session: AgentSession):
+        if session.checkpoints is not None:
+            session.checkpoints.save(session.run_id, 'agent', session.checkpoint_state())
+
+    @staticmethod
+    async def _acheckpoint(session: AgentSession):
+        if session.checkpoints is not None:  # the store may block on disk, keep the event loop free
+            await asyncio.to_thread(session.checkpoints.save, session.run_id, 'agent', session.checkpoint_state())
+
+    def _record_observation(self, generated: str, results: List[Tuple[str, object]], session: AgentSession):
+        if len(results) == 1:
+            generated += f"\n{OBSERVATION_TOKEN} {results[0][1]}"
+        else:  # label each observation with its tool so the LLM can tell them apart
+            for tool, tool_result in results:
+                generated += f"\n{OBSERVATION_TOKEN} [{tool}] {tool_result}"
+        generated += f"\nNext Thought: ({self.max_loops - session.num_loops} thoughts left)"
+        session.record_turn(generated)
+
+    def _complete_task(self, tool_result, session: AgentSession):
+        task = session.task
+        task.raw_output = tool_result
+        task.completed = True
+        task.succeeded = True
+        if self.use_conversation:
+            prompt_final = session.prompt.render()
+            self.conversation.messages.append(
+                Message(content=prompt_final, source=self.name, role='assistant'))
+
+    def _select_tools(self, generated: str, actions: List[Tuple[str, Optional[dict]]],
+                      runnable: List[Tuple[str, Optional[dict]]], session: AgentSession):
+        """ yields the selection events for each parsed action and appends the ones naming a known tool to `runnable` """
+        for tool, tool_input in actions:
+            yield dict(event='next_agent_action', loop=session.num_loops, tool=tool, tool_input=tool_input,
+                       generated=generated, metrics=dict(session.metrics.last_llm_call))
+            session.tools_selected.append(tool)
+            if tool not in session.registry:
+                session.record_error(ValueError(f"Unknown tool: {tool}"))
+                yield dict(event='error', message=f"Unknown tool: {tool}")
+                continue
+            yield dict(event='tool_selected', tool=tool)
+            runnable.append((tool, tool_input))
+
+    def _run_tool(self, tool: str, tool_input: Optional[dict], session: AgentSession):
+        if self.tool_eval_mode:
+            return 'Tool evaluation mode is on. No tool will be run.'
+        with span('tool.run', tool=tool, input_chars=len(json.dumps(tool_input, default=str))) as tool_span:
+            runner = session.registry.by_name[tool]
+            result, hit = session.tool_cache.run(runner, tool_input, lambda: runner.run(**(tool_input or {})))
+            tool_span.set_attributes(output_chars=len(str(result)), cached=hit)
+            return result
+
+    async def _arun_tool(self, tool: str, tool_input: Optional[dict], session: AgentSession):
+        if self.tool_eval_mode:
+            return 'Tool evaluation mode is on. No tool will be run.'
+        with span('tool.run', tool=tool, input_chars=len(json.dumps(tool_input, default=str))) as tool_span:
+            runner = session.registry.by_name[tool]
+            result, hit = await session.tool_cache.arun(runner, tool_input, lambda: runner.arun(**(tool_input or {})))
+            tool_span.set_attributes(output_chars=len(str(result)), cached=hit)
+            return result
+
+    @staticmethod
+    def _tool_slot(session: AgentSession, tool: str):
+        # waits for a free slot when the tool has a limit shared with other runs (see AgentPool)
+        return session.limits.tool(tool) if session.limits else nullcontext()
+
+    @staticmethod
+    def _atool_slot(session: AgentSession, tool: str):
+        return session.limits.atool(tool) if session.limits else nullcontext()
+
+    def _run_tools(self, actions: List[Tuple[str, Optional[dict]]],
+                   session: AgentSession) -> List[Tuple[object, Optional[Exception], float]]:
+        """
+        runs the actions (concurrently on a bounded thread pool if there are several) as (result, error, latency)
+        triples, the latency does not include waiting for a tool slot
+        """
+
+        def run_one(action):
+            with self._tool_slot(session, action[0]):
+                start = time.perf_counter()
+                try:
+                    return self._run_tool(*action, session), None, time.perf_counter() - start
+                except Exception as e:
+                    return None, e, time.perf_counter() - start
+
+        if len(actions) <= 1:
+            return [run_one(action) for action in actions]
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_tools, len(actions))) as pool:
+            # each tool runs in a copy of this context so its span nests under the current agent loop
+            futures = [pool.submit(contextvars.copy_context().run, run_one, action) for action in actions]
+            return [future.result() for future in futures]
 
+    async def _arun_tools(self, actions: List[Tuple[str, Optional[dict]]],
+                          session: AgentSession) -> List[Tuple[object, Optional[Exception], float]]:
+        semaphore = asyncio.Semaphore(self.max_parallel_tools)
+
+        async def run_one(action):
+            async with semaphore, self._atool_slot(session, action[0]):
+                start = time.perf_counter()
                 try:
-                    yield dict(event='tool_selected', tool=tool)
-                    tool_obj = self.tool_by_names[tool]
-                    tool_result = tool_obj.run(**(
-                                tool_input or {})) if not self.tool_eval_mode else 'Tool evaluation mode is on. No tool will be run.'
-                    self.tools_used.append(tool)
-                    yield dict(event='tool_run', tool=tool, tool_input=tool_input, tool_result=tool_result)
+                    return await self._arun_tool(*action, session), None, time.perf_counter() - start
                 except Exception as e:
-                    self.errors_encountered.append(e)
-                    yield dict(event='tool_error', message=f'Error from tool: {e}')
+                    return None, e, time.perf_counter() - start
+
+        return list(await asyncio.gather(*(run_one(action) for action in actions)))
+
+    def _tool_outcome_events(self, actions, outcomes, results: List[Tuple[str, object]], session: AgentSession):
+        """ yields the tool events for finished actions and appends (tool, result) observations to `results` """
+        for (tool, tool_input), (tool_result, error, latency) in zip(actions, outcomes):
+            session.metrics.record_tool_call(latency)
+            metrics = dict(tool_latency=latency)
+            if error is not None:
+                session.record_error(error)
+                yield dict(event='tool_error', message=f'Error from tool: {error}', metrics=metrics)
+                if self.multi_action:  # keep the failure next to the other observations of this thought
+                    results.append((tool, f'Error from tool: {error}'))
+                continue
+            session.tools_used.append(tool)
+            yield dict(event='tool_run', tool=tool, tool_input=tool_input, tool_result=tool_result, metrics=metrics)
+            yield dict(event='tool_result', tool=tool, result=tool_result, metrics=dict(metrics))
+            results.append((tool, tool_result))
+
+    @staticmethod
+    def _final_answer(actions, outcomes) -> Optional[Tuple[str, object]]:
+        for (tool, _), (tool_result, error, _) in zip(actions, outcomes):
+            if tool == 'Return Final Answer Tool' and error is None:
+                return tool, tool_result
+        return None
+
+    def run(self, task: Task, yield_events=False, session: Optional[AgentSession] = None,
+            run_id: Optional[str] = None):
+        """
+        Runs the agent on a task. All per-run state lives on an AgentSession (see new_session), so the same agent
+        can run many tasks at once. Pass `session` to continue a session instead of starting a new one.
+        With a checkpoint store the run is saved under `run_id` (random by default, see session.run_id) after every
+        loop, and can be continued with resume(run_id).
+        """
+        session = session or self.new_session(task, run_id=run_id)
+        self._model.cache_static_prefix(session.prompt.static_prefix)
+
+        def execute_steps():
+            while session.num_loops < self.max_loops:
+                session.num_loops += 1
+                session.metrics.loops = session.num_loops
+                with span('agent.loop', loop=session.num_loops) as loop_span:
+                    curr_prompt = session.prompt.render()
+
+                    decision = []
+                    yield from self._next_actions(curr_prompt, decision, session)
+                    generated, actions = decision
+                    loop_span.set_attribute('tools', ', '.join(tool for tool, _ in actions))
+                    runnable = []
+                    yield from self._select_tools(generated, actions, runnable, session)
+
+                    outcomes = self._run_tools(runnable, session)
+                    results = []
+                    yield from self._tool_outcome_events(runnable, outcomes, results, session)
+                    if all(error is not None for _, error, _ in outcomes):  # nothing ran, let the LLM try again
+                        self._checkpoint(session)
+                        continue
+
+                    self._record_observation(generated, results, session)
+
+                    final = self._final_answer(runnable, outcomes)
+                    if final:
+                        self._complete_task(final[1], session)
+                    self._checkpoint(session)
+                    if final:
+                        yield dict(event='agent_completed', final_answer=final[1])
+                        return
+
+            yield dict(event='max_loops_reached', message=f'Max loops ({self.max_loops}) reached.')
+
+        def instrumented_steps():
+            with span('agent.run', agent=self.name, task=task.name, provider=self.llm.provider):
+                for event in execute_steps():
+                    yield self._with_totals(event, session)
+
+        return instrumented_steps() if yield_events else list(instrumented_steps())
+
+    @staticmethod
+    def _with_totals(event: dict, session: AgentSession) -> dict:
+        ''' adds the cumulative run metrics to an event (token events are left as they are, they are too frequent) '''
+        if event['event'] != 'token':
+            event.setdefault('metrics', {})['totals'] = session.metrics.totals()
+        return event
+
+    async def arun(self, task: Task, session: Optional[AgentSession] = None, run_id: Optional[str] = None):
+        """
+        Async counterpart of run(). An async generator yielding the same event dicts, so many agent loops can
+        share one event loop instead of needing a thread each.
+        e.g. `async for event in agent.arun(task): ...`
+        """
+        session = session or self.new_session(task, run_id=run_id)
+        await self._model.acache_static_prefix(session.prompt.static_prefix)  # off the event loop if it makes a request
+        with span('agent.run', agent=self.name, task=task.name, provider=self.llm.provider):
+            async for event in self._arun_steps(session):
+                yield self._with_totals(event, session)
+
+    async def _arun_steps(self, session: AgentSession):
+        while session.num_loops < self.max_loops:
+            session.num_loops += 1
+            session.metrics.loops = session.num_loops
+            with span('agent.loop', loop=session.num_loops) as loop_span:
+                curr_prompt = session.prompt.render()
+
+                decision = []
+                async for event in self._anext_actions(curr_prompt, decision, session):
+                    yield event
+                generated, actions = decision
+                loop_span.set_attribute('tools', ', '.join(tool for tool, _ in actions))
+                runnable = []
+                for event in self._select_tools(generated, actions, runnable, session):
+                    yield event
+
+                outcomes = await self._arun_tools(runnable, session)
+                results = []
+                for event in self._tool_outcome_events(runnable, outcomes, results, session):
+                    yield event
+                if all(error is not None for _, error, _ in outcomes):  # nothing ran, let the LLM try again
+                    await self._acheckpoint(session)
                     continue
 
-                yield dict(event='tool_result', tool=tool, result=tool_result)
-
-                generated += f"\n{OBSERVATION_TOKEN} {tool_result}\nNext Thought: ({self.max_loops - num_loops} thoughts left)"
-                self.ai_responses.append(generated.strip())
-                previous_responses.append(generated)
-
-                if tool == 'Return Final Answer Tool':
-                    task.raw_output = tool_result
-                    task.completed = True
-                    task.succeeded = True
-                    prompt_final = prompt.replace(
-                        '{previous_responses}', '\n'.join(previous_responses).strip()
-                    ).replace(
-                        '{final_answer_dict}', final_answer_dict
-                    ).replace(
-                        '{param_value_dict}', param_value_dict
-                    )
-                    if self.use_conversation:
-                        self.conversation.messages.append(
-                            Message(content=prompt_final, source=self.name, role='assistant'))
-                    yield dict(event='agent_completed', final_answer=tool_result)
+                self._record_observation(generated, results, session)
+
+                final = self._final_answer(runnable, outcomes)
+                if final:
+                    self._complete_task(final[1], session)
+                await self._acheckpoint(session)
+                if final:
+                    yield dict(event='agent_completed', final_answer=final[1])
                     return
 
-            yield dict(event='max_loops_reached', message=f'Max loops ({self.max_loops}) reached.')
+        yield dict(event='max_loops_reached', message=f'Max loops ({self.max_loops}) reached.')
 
-        return execute_steps() if yield_events else list(execute_steps())
+    def run_many(self, tasks: Iterable[Task], max_concurrency: int = 8,
+                 provider_limits: Optional[Dict[str, int]] = None,
+                 tool_limits: Optional[Dict[str, int]] = None) -> Iterator[BatchResult]:
+        """
+        Runs a batch of tasks concurrently, yielding a BatchResult per task in completion order.
+        Shortcut for AgentPool(self, ...).run_many(tasks), use an AgentPool directly to read the batch stats.
+        """
+        return AgentPool(self, max_concurrency, provider_limits, tool_limits).run_many(tasks)
 
-    def decide_next_action(self, prompt: str) -> str:
+    def arun_many(self, tasks: Iterable[Task], max_concurrency: int = 8,
+                  provider_limits: Optional[Dict[str, int]] = None,
+                  tool_limits: Optional[Dict[str, int]] = None) -> AsyncIterator[BatchResult]:
+        return AgentPool(self, max_concurrency, provider_limits, tool_limits).arun_many(tasks)
+
+    def _messages_for(self, prompt: str) -> List[Dict[str, str]]:
         messages = [{'role': 'user', 'content': prompt}]
         if self.conversation and self.use_conversation:
             messages = self.conversation.messages_as_dicts() + messages
-        generated = self.llm.generate(
-            messages,
+        return messages
+
+    def _next_actions(self, prompt: str, decision: list, session: AgentSession):
+        """
+        Decides the next actions and stores (generated, actions) in `decision`.
+        When streaming, yields a `token` event per chunk and, outside of multi action mode, stops the generation as
+        soon as the Action Input JSON closes so the tool can start right away.
+        """
+        # the LLM call waits for a free slot when its provider has a limit shared with other runs (see AgentPool)
+        with session.limits.llm(self.llm) if session.limits else nullcontext():
+            yield from self._decide(prompt, decision, session)
+
+    async def _anext_actions(self, prompt: str, decision: list, session: AgentSession):
+        async with session.limits.allm(self.llm) if session.limits else nullcontext():
+            async for event in self._adecide(prompt, decision, session):
+                yield event
+
+    def _decide(self, prompt: str, decision: list, session: AgentSession):
+        messages = self._messages_for(prompt)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        start = time.perf_counter()
+        if self.tool_calling:
+            text, tool_calls = self._model.generate_with_tools(messages, session.registry.specs)
+            session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars, text)
+            decision.extend(self._tool_call_decision(text, tool_calls, session.registry))
+            return
+        if not self.stream:
+            generated, actions = self.decide_next_actions(prompt, session)
+            session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars, generated)
+            decision.extend((generated, actions))
+            return
+        watcher = ActionInputWatcher()
+        chunks = []
+        stream = self._model.stream(messages, stop=self.stop_pattern)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield dict(event='token', token=chunk)
+                if not self.multi_action and watcher.feed(chunk):
+                    break
+        finally:
+            stream.close()  # cancels the rest of the generation
+        session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars)
+        decision.extend(self._streamed_decision(chunks, watcher, session))
+
+    async def _adecide(self, prompt: str, decision: list, session: AgentSession):
+        messages = self._messages_for(prompt)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        start = time.perf_counter()
+        if self.tool_calling:
+            text, tool_calls = await self._model.agenerate_with_tools(messages, session.registry.specs)
+            session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars, text)
+            decision.extend(self._tool_call_decision(text, tool_calls, session.registry))
+            return
+        if not self.stream:
+            generated, actions = await self.adecide_next_actions(prompt, session)
+            session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars, generated)
+            decision.extend((generated, actions))
+            return
+        watcher = ActionInputWatcher()
+        chunks = []
+        stream = self._model.astream(messages, stop=self.stop_pattern)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield dict(event='token', token=chunk)
+                if not self.multi_action and watcher.feed(chunk):
+                    break
+        finally:
+            await stream.aclose()
+        session.metrics.record_llm_call(time.perf_counter() - start, prompt_chars)
+        decision.extend(self._streamed_decision(chunks, watcher, session))
+
+    def _tool_call_decision(self, text: str, tool_calls: List[dict], registry: ToolRegistry):
+        """
+        Turns native tool calls into (generated, actions). The calls are written into the scratchpad in the usual
+        Action / Action Input format so later loops (and the conversation) can read what happened.
+        """
+        if not tool_calls:  # a plain text reply is the final answer, there is nothing to parse or retry
+            actions = [('Return Final Answer Tool', {'final_answer': text})]
+        else:
+            if not self.multi_action:
+                tool_calls = tool_calls[:1]
+            actions = []
+            for call in tool_calls:
+                spec = registry.spec_by_function_name.get(call['name'])
+                actions.append((spec.name if spec else call['name'], call['arguments']))
+        generated = f"Thought: {text.strip()}"
+        for tool, tool_input in actions:
+            generated += f"\nAction: {tool}\nAction Input: {json.dumps(tool_input, default=str)}"
+        return generated, actions
+
+    def _streamed_decision(self, chunks: List[str], watcher: ActionInputWatcher, session: AgentSession):
+        generated = ''.join(chunks)
+        if watcher.closed:  # drop anything the last chunk carried past the closing brace
+            generated = generated[:watcher.end]
+        return generated, self._actions_from_generated(generated, session)
+
+    def decide_next_action(self, prompt: str,
+                           session: Optional[AgentSession] = None) -> Tuple[str, str, Optional[dict]]:
+        generated = self._model.generate(
+            self._messages_for(prompt),
+            stop=self.stop_pattern)
+        return (generated, *self._tool_from_generated(generated, session))
+
+    async def adecide_next_action(self, prompt: str,
+                                  session: Optional[AgentSession] = None) -> Tuple[str, str, Optional[dict]]:
+        generated = await self._model.agenerate(
+            self._messages_for(prompt),
+            stop=self.stop_pattern)
+        return (generated, *self._tool_from_generated(generated, session))
+
+    def decide_next_actions(self, prompt: str,
+                            session: Optional[AgentSession] = None) -> Tuple[str, List[Tuple[str, Optional[dict]]]]:
+        """ like decide_next_action, but returns every (tool, tool_input) pair when multi_action is on """
+        generated = self._model.generate(
+            self._messages_for(prompt),
             stop=self.stop_pattern)
+        return generated, self._actions_from_generated(generated, session)
 
-        tool, tool_input = self._parse(generated)
+    async def adecide_next_actions(self, prompt: str, session: Optional[AgentSession] = None
+                                   ) -> Tuple[str, List[Tuple[str, Optional[dict]]]]:
+        generated = await self._model.agenerate(
+            self._messages_for(prompt),
+            stop=self.stop_pattern)
+        return generated, self._actions_from_generated(generated, session)
+
+    def _actions_from_generated(self, generated: str,
+                                session: Optional[AgentSession] = None) -> List[Tuple[str, Optional[dict]]]:
+        if not self.multi_action:
+            return [self._tool_from_generated(generated, session)]
+        return [self._load_tool_input(tool, tool_input, session)
+                for tool, tool_input in self._parse_all(generated, session)]
+
+    def _tool_from_generated(self, generated: str,
+                             session: Optional[AgentSession] = None) -> Tuple[str, Optional[dict]]:
+        return self._load_tool_input(*self._parse(generated, session), session)
+
+    @staticmethod
+    def _record_error(session: Optional[AgentSession], error: Exception):
+        # the parsing helpers can also be called outside of a run, in which case there is nowhere to record to
+        if session is not None:
+            session.record_error(error)
+
+    def _load_tool_input(self, tool: str, tool_input: str,
+                         session: Optional[AgentSession] = None) -> Tuple[str, Optional[dict]]:
         if self.debug:
             print('raw tool', tool)
             print('raw tool_input', tool_input)
         try:
             tool_input = extract_json_from_string(tool_input)  # Attempt to load as JSON
         except Exception as e:
-            self.errors_encountered.append(e)  # Add error to the list of errors
+            self._record_error(session, e)  # Add error to the list of errors
             if self.verbose:
                 print(f"\tError loading JSON from tool_input: {e}")
             tool_input = None  # Set to None if we can't load as JSON
-        return generated, tool, tool_input
+        return tool, tool_input
 
-    def _parse(self, generated: str) -> Tuple[str, str]:
+    def _parse_all(self, generated: str, session: Optional[AgentSession] = None) -> List[Tuple[str, str]]:
+        """ every Action / Action Input pair in the generation, falling back to _parse if there are none """
+        actions = [(action.tool, self._clean_tool_input(action.tool_input)) for action in parse_actions(generated)]
+        return actions or [self._parse(generated, session)]
+
+    @staticmethod
+    def _clean_tool_input(tool_input: str) -> str:
+        tool_input = tool_input.split(OBSERVATION_TOKEN)[0].split(NEXT_THOUGHT_TOKEN)[0].strip()
+        return tool_input.strip(" ").strip('"')
+
+    def _parse(self, generated: str, session: Optional[AgentSession] = None) -> Tuple[str, str]:
         if self.debug:
             print('generated', generated)
-        regex = r"Action:\s*\[?(.*?)\]?\s*[\r\n]+Action Input:.*?({[^{}]*({[^{}]*})*[^{}]*})"
-        match = re.search(regex, generated, re.DOTALL)
-        if not match:  # special case: generated is json loadable and has the "final_answer" key, then it is the final answer
+        actions = parse_actions(generated)
+        if not actions:  # special case: generated is json loadable and has the "final_answer" key, then it is the final answer
             try:
                 tool_input = extract_json_from_string(generated)
                 if 'final_answer' in tool_input:
                     return 'Return Final Answer Tool', json.dumps(tool_input)
             except:
                 pass
-            self.errors_encountered.append(
-                ValueError(f"Output of LLM is not parsable for next tool use: `{generated}`"))
+            self._record_error(session, ValueError(f"Output of LLM is not parsable for next tool use: `{generated}`"))
             if self.verbose:
                 print(f"Error parsing generated output: {generated}")
             # if not debug, add this as the observation so the agent can try again
             tool = F'TOOL ERROR. MAKE SURE TO STATE A TOOL NAME FROM THE LIST: {self.quoted_tool_names}. If you are trying to end the conversation or you think the task is already solved, please use the "Action: Return Final Answer Tool" and give the final answer this way.'
-            tool_input = tool
-        else:
-            tool = match.group(1).strip()
-            tool_input = match.group(2).split(OBSERVATION_TOKEN)[0].split(NEXT_THOUGHT_TOKEN)[0].strip()
-        return tool, tool_input.strip(" ").strip('"')
+            return tool, tool.strip(" ").strip('"')
+        return actions[0].tool, self._clean_tool_input(actions[0].tool_input)
@@ -0,0 +1,308 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .llms.base_llm import LLM
+from .llms.response import LLMResponse
+from .tools.base_tool import BaseTool
+
+RECORD, REPLAY = 'record', 'replay'
+# agent prompts include today's date, which would otherwise make every request a miss the day after recording
+DATE_PATTERN = re.compile(r'\b\d{4}-\d{2}-\d{2}\b')
+
+
+class CassetteMiss(KeyError):
+    """ A replayed cassette has no recording of the request """
+
+
+class RecordedToolError(Exception):
+    """ Raised on replay where the recorded tool call raised, with the same message so the agent sees the same text """
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+class Cassette:
+    """
+    Records the requests and responses of LLM calls and tool runs to a JSON lines file and replays them, so agents
+    can be regression-tested and profiled without API keys, e.g.
+
+    cassette = Cassette('run.jsonl', mode='record')
+    agent = Agent(llm=cassette.wrap_llm(OpenAILLM()), tools=cassette.wrap_tools([SerpTool()]))
+    agent.run(task)
+
+    cassette = Cassette('run.jsonl', mode='replay', latency='recorded', speed=100)  # 100x faster than it ran
+
+    Each line is one call keyed by a hash of its request (provider, model, messages and generation kwargs for LLM
+    calls, tool name and input for tools). Replay looks calls up by that key, an identical request made several times
+    gets its recordings in order (then the last one again), and a request that was never recorded raises CassetteMiss.
+    Recording appends to the file, so one cassette can hold many runs.
+
+    :param latency: how long replayed calls take. None returns immediately (to measure the framework's own
+    overhead), 'recorded' waits as long as the recorded call took, a number waits that many seconds and a callable
+    gets the entry dict and returns seconds. Divided by `speed`.
+    :param ignore_dates: leave YYYY-MM-DD dates out of the request keys
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY,
+                 latency: Union[None, str, float, Callable[[Dict[str, Any]], float]] = None, speed: float = 1.0,
+                 ignore_dates: bool = True):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}, use '{RECORD}' or '{REPLAY}'")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.speed = speed
+        self.ignore_dates = ignore_dates
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Dict[str, Any]]] = {}
+        self._played: Dict[str, int] = {}
+        if mode == REPLAY:
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    def __len__(self) -> int:
+        return sum(map(len, self._index.values()))
+
+    def key(self, kind: str, request: Dict[str, Any]) -> str:
+        canonical = json.dumps(dict(kind=kind, request=request), sort_keys=True, default=str)
+        if self.ignore_dates:
+            canonical = DATE_PATTERN.sub('<date>', canonical)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No cassette at {self.path}, record one with mode='{RECORD}' first")
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    # re-keyed rather than trusting the stored key, so ignore_dates can differ from when it was recorded
+                    self._index.setdefault(self.key(entry['kind'], entry['request']), []).append(entry)
+
+    def record(self, kind: str, request: Dict[str, Any], response: Dict[str, Any], latency: float):
+        key = self.key(kind, request)
+        entry = dict(kind=kind, key=key, request=request, response=response, latency=latency)
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self._index.setdefault(key, []).append(entry)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+    def play(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        ''' the next recording of the request '''
+        key = self.key(kind, request)
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMiss(f"No {kind} recording for request {key} in {self.path}: "
+                                   f"{json.dumps(request, default=str)[:200]}")
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+        return entries[min(played, len(entries) - 1)]
+
+    def delay(self, entry: Dict[str, Any]) -> float:
+        ''' seconds a replayed call should take '''
+        if self.latency is None:
+            return 0.
+        if self.latency == 'recorded':
+            seconds = entry.get('latency') or 0.
+        elif callable(self.latency):
+            seconds = self.latency(entry)
+        else:
+            seconds = float(self.latency)
+        return seconds / self.speed
+
+    def rewind(self):
+        ''' replay every request from its first recording again '''
+        with self._lock:
+            self._played = {}
+
+    def wrap_llm(self, llm: LLM) -> 'CassetteLLM':
+        return CassetteLLM(llm, self)
+
+    def wrap_tool(self, tool: BaseTool) -> 'CassetteTool':
+        return CassetteTool(tool, self)
+
+    def wrap_tools(self, tools: List[BaseTool]) -> List['CassetteTool']:
+        return [self.wrap_tool(tool) for tool in tools]
+
+    def __repr__(self) -> str:
+        return f"Cassette({self.path}, {self.mode}, {len(self)} recordings)"
+
+
+def _response_json(response) -> Dict[str, Any]:
+    return LLMResponse.of(response).as_dict()
+
+
+def _response_from_json(recorded: Dict[str, Any]) -> LLMResponse:
+    return LLMResponse.from_dict(recorded)
+
+
+class CassetteLLM(LLM):
+    """
+    Wraps an LLM so its calls are recorded to or replayed from a Cassette. On replay the wrapped LLM is never called.
+    Streaming goes through generate, so a streamed call is recorded (and replayed) as a single chunk.
+    """
+
+    def __init__(self, llm: LLM, cassette: Cassette):
+        super().__init__(retry=None)  # the wrapped LLM retries its own calls, replays never fail
+        self.llm = llm
+        self.cassette = cassette
+        self.provider = llm.provider
+        self.model_name = getattr(llm, 'model_name', None)
+
+    def _request(self, messages, kwargs, tools=None) -> Dict[str, Any]:
+        request = dict(provider=self.provider, model=self.model_name, messages=messages, kwargs=kwargs)
+        if tools is not None:
+            request['tools'] = [spec.function_name for spec in tools]
+        return request
+
+    def cache_static_prefix(self, prefix: str):
+        if self.cassette.recording:
+            self.llm.cache_static_prefix(prefix)
+
+    async def acache_static_prefix(self, prefix: str):
+        if self.cassette.recording:
+            await self.llm.acache_static_prefix(prefix)
+
+    def _generate(self, messages, **kwargs):
+        request = self._request(messages, kwargs)
+        if not self.cassette.recording:
+            entry = self.cassette.play('llm', request)
+            time.sleep(self.cassette.delay(entry))
+            return _response_from_json(entry['response'])
+        start = time.perf_counter()
+        response = self.llm.generate(messages, **kwargs)
+        self.cassette.record('llm', request, _response_json(response), time.perf_counter() - start)
+        return response
+
+    async def _agenerate(self, messages, **kwargs):
+        request = self._request(messages, kwargs)
+        if not self.cassette.recording:
+            entry = self.cassette.play('llm', request)
+            await asyncio.sleep(self.cassette.delay(entry))
+            return _response_from_json(entry['response'])
+        start = time.perf_counter()
+        response = await self.llm.agenerate(messages, **kwargs)
+        self.cassette.record('llm', request, _response_json(response), time.perf_counter() - start)
+        return response
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        request = self._request(messages, kwargs, tools)
+        if not self.cassette.recording:
+            entry = self.cassette.play('llm_tools', request)
+            time.sleep(self.cassette.delay(entry))
+            return _response_from_json(entry['response']['text']), entry['response']['tool_calls']
+        start = time.perf_counter()
+        text, tool_calls = self.llm.generate_with_tools(messages, tools, **kwargs)
+        self.cassette.record('llm_tools', request, dict(text=_response_json(text), tool_calls=tool_calls),
+                             time.perf_counter() - start)
+        return text, tool_calls
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        request = self._request(messages, kwargs, tools)
+        if not self.cassette.recording:
+            entry = self.cassette.play('llm_tools', request)
+            await asyncio.sleep(self.cassette.delay(entry))
+            return _response_from_json(entry['response']['text']), entry['response']['tool_calls']
+        start = time.perf_counter()
+        text, tool_calls = await self.llm.agenerate_with_tools(messages, tools, **kwargs)
+        self.cassette.record('llm_tools', request, dict(text=_response_json(text), tool_calls=tool_calls),
+                             time.perf_counter() - start)
+        return text, tool_calls
+
+
+class CassetteTool(BaseTool):
+    """
+    Wraps a tool so its runs are recorded to or replayed from a Cassette. run and arun keep the signature and
+    docstring of the wrapped tool's, so the prompt and tool schemas are the same as without the cassette.
+    Results are stored as JSON, anything else is stored as its str.
+    """
+
+    def __init__(self, tool: BaseTool, cassette: Cassette):
+        super().__init__(tool.name, tool.description)
+        self.tool = tool
+        self.cassette = cassette
+
+        def run(**kwargs):
+            return self._run(**kwargs)
+
+        async def arun(**kwargs):
+            return await self._arun(**kwargs)
+
+        self.run = functools.wraps(tool.run)(run)
+        self.arun = functools.wraps(tool.arun)(arun)
+
+    def _describe_run(self):
+        return self.tool._describe_run()
+
+    @property
+    def cache_ttl(self):
+        return self.tool.cache_ttl
+
+    @property
+    def cache_namespace(self):
+        return self.tool.cache_namespace
+
+    def is_cacheable(self, tool_input: dict) -> bool:
+        return self.tool.is_cacheable(tool_input)
+
+    def _request(self, kwargs) -> Dict[str, Any]:
+        return dict(tool=self.name, input=kwargs)
+
+    @staticmethod
+    def _replayed(entry: Dict[str, Any]):
+        recorded = entry['response']
+        if 'error' in recorded:
+            raise RecordedToolError(recorded['error']['type'], recorded['error']['message'])
+        return recorded['result']
+
+    def _record(self, kwargs, start: float, result=None, error: Optional[Exception] = None):
+        if error is not None:
+            response = dict(error=dict(type=type(error).__name__, message=str(error)))
+        else:
+            try:
+                json.dumps(result)
+            except (TypeError, ValueError):
+                result = str(result)
+            response = dict(result=result)
+        self.cassette.record('tool', self._request(kwargs), response, time.perf_counter() - start)
+
+    def _run(self, **kwargs):
+        if not self.cassette.recording:
+            entry = self.cassette.play('tool', self._request(kwargs))
+            time.sleep(self.cassette.delay(entry))
+            return self._replayed(entry)
+        start = time.perf_counter()
+        try:
+            result = self.tool.run(**kwargs)
+        except Exception as e:
+            self._record(kwargs, start, error=e)
+            raise
+        self._record(kwargs, start, result)
+        return result
+
+    async def _arun(self, **kwargs):
+        if not self.cassette.recording:
+            entry = self.cassette.play('tool', self._request(kwargs))
+            await asyncio.sleep(self.cassette.delay(entry))
+            return self._replayed(entry)
+        start = time.perf_counter()
+        try:
+            result = await self.tool.arun(**kwargs)
+        except Exception as e:
+            self._record(kwargs, start, error=e)
+            raise
+        self._record(kwargs, start, result)
+        return result
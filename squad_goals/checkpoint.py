@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class CheckpointStore:
+    """
+    Keeps the latest checkpoint of each run so it can be resumed after the process dies, see Agent.resume and
+    Workflow.resume. A checkpoint is a JSON-serializable dict, `kind` says what wrote it ('agent' or 'workflow').
+    """
+
+    def save(self, run_id: str, kind: str, state: Dict[str, Any]):
+        raise NotImplementedError("save method must be implemented in subclass")
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        ''' the latest checkpoint of the run as {'run_id', 'kind', 'state', 'updated_at'}, None if there is none '''
+        raise NotImplementedError("load method must be implemented in subclass")
+
+    def delete(self, run_id: str):
+        raise NotImplementedError("delete method must be implemented in subclass")
+
+    def runs(self) -> List[Dict[str, Any]]:
+        ''' run_id, kind and updated_at of every stored run, most recently updated first '''
+        raise NotImplementedError("runs method must be implemented in subclass")
+
+    def require(self, run_id: str, kind: str) -> Dict[str, Any]:
+        ''' the state of the latest checkpoint, raising if there is none or another kind of run wrote it '''
+        checkpoint = self.load(run_id)
+        if checkpoint is None:
+            raise KeyError(f"No checkpoint for run {run_id}")
+        if checkpoint['kind'] != kind:
+            raise ValueError(f"Run {run_id} is a {checkpoint['kind']} run, not a {kind} run")
+        return checkpoint['state']
+
+
+class InMemoryCheckpointStore(CheckpointStore):
+    """ Checkpoints in a dict, for tests. States are stored as JSON so they behave like a durable store's """
+
+    def __init__(self):
+        self._checkpoints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def save(self, run_id: str, kind: str, state: Dict[str, Any]):
+        with self._lock:
+            self._checkpoints[run_id] = dict(run_id=run_id, kind=kind, state=json.dumps(state, default=str),
+                                             updated_at=time.time())
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        checkpoint = self._checkpoints.get(run_id)
+        return None if checkpoint is None else dict(checkpoint, state=json.loads(checkpoint['state']))
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._checkpoints.pop(run_id, None)
+
+    def runs(self) -> List[Dict[str, Any]]:
+        return sorted(({key: checkpoint[key] for key in ('run_id', 'kind', 'updated_at')}
+                       for checkpoint in self._checkpoints.values()), key=lambda run: -run['updated_at'])
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    Checkpoints in a local SQLite file, one row per run overwritten on every save, e.g.
+
+    store = SQLiteCheckpointStore('runs.db')
+    agent = Agent(llm=llm, tools=tools, checkpoint_store=store)
+    agent.run(task, run_id='report-42')  # the process dies halfway
+    agent.resume('report-42')  # in a new process, continues after the last completed loop
+
+    Safe to share between threads, and between processes thanks to SQLite's write-ahead log.
+    """
+
+    def __init__(self, path: str = 'squad_goals_checkpoints.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            if path != ':memory:':
+                self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS checkpoints ('
+                                     'run_id TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, '
+                                     'updated_at REAL NOT NULL)')
+
+    def save(self, run_id: str, kind: str, state: Dict[str, Any]):
+        row = (run_id, kind, json.dumps(state, default=str), time.time())
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)', row)
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute('SELECT kind, state, updated_at FROM checkpoints WHERE run_id = ?',
+                                           (run_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(run_id=run_id, kind=row[0], state=json.loads(row[1]), updated_at=row[2])
+
+    def delete(self, run_id: str):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM checkpoints WHERE run_id = ?', (run_id,))
+
+    def runs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT run_id, kind, updated_at FROM checkpoints ORDER BY updated_at DESC').fetchall()
+        return [dict(run_id=run_id, kind=kind, updated_at=updated_at) for run_id, kind, updated_at in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __repr__(self) -> str:
+        return f"SQLiteCheckpointStore({self.path})"
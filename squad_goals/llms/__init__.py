@@ -0,0 +1,47 @@
+from typing import TYPE_CHECKING
+
+from ..utils.lazy import lazy_exports
+
+# providers are imported on first use, so their SDKs are only loaded by the processes that use them
+_EXPORTS = {
+    'LLM': 'base_llm',
+    'LLMResponse': 'response',
+    'AnthropicLLM': 'anthropic',
+    'DeepSeekLLM': 'deepseek',
+    'GeminiLLM': 'gemini',
+    'GroqLLM': 'groq',
+    'InceptionLLM': 'inception',
+    'CustomLlama': 'llama',
+    'OllamaLLM': 'ollama',
+    'OpenAILLM': 'openai',
+    'OpenRouterLLM': 'openrouter',
+    'RouterLLM': 'router',
+    'ResponseCache': 'cache',
+    'ClientRegistry': 'clients',
+    'client_registry': 'clients',
+    'NearDuplicateCache': 'near_cache',
+    'RetryPolicy': 'resilience',
+    'HedgePolicy': 'resilience',
+    'PromptLogger': 'warehouse',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from .anthropic import AnthropicLLM
+    from .base_llm import LLM
+    from .cache import ResponseCache
+    from .clients import ClientRegistry, client_registry
+    from .deepseek import DeepSeekLLM
+    from .gemini import GeminiLLM
+    from .groq import GroqLLM
+    from .inception import InceptionLLM
+    from .llama import CustomLlama
+    from .near_cache import NearDuplicateCache
+    from .ollama import OllamaLLM
+    from .openai import OpenAILLM
+    from .openrouter import OpenRouterLLM
+    from .resilience import HedgePolicy, RetryPolicy
+    from .response import LLMResponse
+    from .router import RouterLLM
+    from .warehouse import PromptLogger
@@ -1,9 +1,13 @@
 import os
 
 from .base_llm import LLM
+from .clients import ClientRegistry, client_registry
+from .response import LLMResponse
 
 
 class AnthropicLLM(LLM):
+    provider = 'anthropic'
+
     def __init__(self, model_name="claude-3-opus-20240229", api_key=None, **kwargs):
         try:
             from anthropic import Anthropic
@@ -17,15 +21,21 @@ class AnthropicLLM(LLM):
             raise ValueError("Anthropic API key is required")
 
         self.model_name = model_name
-        self.client = Anthropic(api_key=api_key)
+        self._api_key = api_key
         super().__init__(**kwargs)
+        options = self._sdk_client_options()
+        self.client = client_registry().get(ClientRegistry.key('anthropic', api_key=api_key, **options),
+                                            lambda: Anthropic(api_key=api_key, **options))
 
-    def _generate(self, messages, **kwargs):
-        """
-        Sends a prompt to Claude and returns the generated response.
-        :param messages: List of dictionaries, where each dictionary represents a message with 'role' and 'content'.
-        :return: Generated text from Claude.
-        """
+    @property
+    def async_client(self):
+        # created on first use so sync-only callers never open an async connection pool, one per event loop
+        from anthropic import AsyncAnthropic
+        options = self._sdk_client_options()
+        return client_registry().get_async(ClientRegistry.key('anthropic', api_key=self._api_key, **options),
+                                           lambda: AsyncAnthropic(api_key=self._api_key, **options))
+
+    def _request_kwargs(self, messages, **kwargs):
         # Convert the input message format if necessary
         if 'stop' in kwargs:
             kwargs['stop_sequences'] = kwargs.pop('stop')
@@ -42,12 +52,72 @@ class AnthropicLLM(LLM):
         if 'max_tokens' not in kwargs:
             kwargs['max_tokens'] = 4096
 
+        return dict(model=self.model_name, messages=anthropic_messages, **kwargs)
+
+    @staticmethod
+    def _response(response, text) -> LLMResponse:
+        usage = getattr(response, 'usage', None)
+        return LLMResponse(text, prompt_tokens=getattr(usage, 'input_tokens', None),
+                           completion_tokens=getattr(usage, 'output_tokens', None),
+                           finish_reason=getattr(response, 'stop_reason', None), model=getattr(response, 'model', None))
+
+    def _generate(self, messages, **kwargs):
+        """
+        Sends a prompt to Claude and returns the generated response.
+        :param messages: List of dictionaries, where each dictionary represents a message with 'role' and 'content'.
+        :return: Generated text from Claude.
+        """
         # Make a request to Claude via Anthropic's API
-        response = self.client.messages.create(
-            model=self.model_name,
-            messages=anthropic_messages,
-            **kwargs
-        )
+        response = self.client.messages.create(**self._request_kwargs(messages, **kwargs))
 
         # Return the response text
-        return response.content[0].text
+        return self._response(response, response.content[0].text)
+
+    async def _agenerate(self, messages, **kwargs):
+        response = await self.async_client.messages.create(**self._request_kwargs(messages, **kwargs))
+        return self._response(response, response.content[0].text)
+
+    def _stream(self, messages, **kwargs):
+        response = self.client.messages.create(stream=True, **self._request_kwargs(messages, **kwargs))
+        try:
+            for event in response:
+                if event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                    yield event.delta.text
+        finally:
+            response.close()  # closing the connection stops the generation if we bail out early
+
+    async def _astream(self, messages, **kwargs):
+        response = await self.async_client.messages.create(stream=True, **self._request_kwargs(messages, **kwargs))
+        try:
+            async for event in response:
+                if event.type == 'content_block_delta' and getattr(event.delta, 'text', None):
+                    yield event.delta.text
+        finally:
+            await response.close()
+
+    @staticmethod
+    def _tool_schemas(tools):
+        return [{'name': spec.function_name, 'description': spec.function_description, 'input_schema': spec.parameters}
+                for spec in tools]
+
+    @staticmethod
+    def _parse_tool_calls(response):
+        text, tool_calls = '', []
+        for block in response.content:
+            if block.type == 'text':
+                text += block.text
+            elif block.type == 'tool_use':
+                tool_calls.append(dict(name=block.name, arguments=block.input))
+        return text, tool_calls
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        response = self.client.messages.create(tools=self._tool_schemas(tools),
+                                               **self._request_kwargs(messages, **kwargs))
+        text, tool_calls = self._parse_tool_calls(response)
+        return self._response(response, text), tool_calls
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        response = await self.async_client.messages.create(tools=self._tool_schemas(tools),
+                                                           **self._request_kwargs(messages, **kwargs))
+        text, tool_calls = self._parse_tool_calls(response)
+        return self._response(response, text), tool_calls
@@ -1,44 +1,339 @@
+import asyncio
 import json
-import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from .cache import ResponseCache, response_from_payload, response_payload
+from .resilience import HedgePolicy, RetryPolicy, acall_hedged, call_hedged
+from .response import LLMResponse
+from .warehouse import PromptLogger, prompt_logger
+from ..tracing import current_span, span
+from ..tracing.tracer import NOOP_SPAN
+
+# transient provider errors (rate limits, 5xx, timeouts) are retried by default, pass retry=None to turn it off.
+# SDK clients of LLMs that retry are built with the SDK's own retries off (see _sdk_client_options)
+DEFAULT_RETRY = RetryPolicy()
+# suffix of the cache key a stream closed early is cached under: generate() never reads it, since the text is only
+# the part the caller consumed, and stream() only falls back to it, since it closes the stream at the same point
+STREAM_PREFIX = ':stream-prefix'
 
 
 class LLM:
+    provider = 'custom'  # provider name used to key per-provider limits, e.g. AgentPool(provider_limits={'openai': 8})
 
-    def __init__(self, warehouse=None, static_generation_kwargs=None):
-        self.warehouse = warehouse
+    def __init__(self, warehouse=None, static_generation_kwargs=None, retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+                 hedge: Optional[HedgePolicy] = None, cache: Optional[ResponseCache] = None):
+        self.warehouse = warehouse  # prompt logging: 'supabase', 'jsonl', 'sqlite', a PromptSink or a PromptLogger
+        self._prompt_logger: Optional[PromptLogger] = None
         self.static_generation_kwargs = static_generation_kwargs or {}
+        self.cache = cache  # serves repeated identical requests without calling the provider, None = never
+        self.retry = retry  # how transient errors are retried, None = raise right away
+        self.hedge = hedge  # when a slow call gets a duplicate request, None = never
+        self.resilience_stats = dict(retries=0, hedged=0, hedge_wins=0)
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=hedge.window if hedge else 1)  # recent call latencies for the hedge threshold
 
     def _generate(self, messages, **kwargs):
         raise NotImplementedError("generate method must be implemented in subclass")
 
-    def generate(self, messages, **kwargs):
+    async def _agenerate(self, messages, **kwargs):
+        # providers without a native async client run the blocking call in a worker thread
+        return await asyncio.to_thread(self._generate, messages, **kwargs)
+
+    def _stream(self, messages, **kwargs):
+        # providers without native streaming yield the whole completion as a single chunk
+        yield self._generate(messages, **kwargs)
+
+    async def _astream(self, messages, **kwargs):
+        yield await self._agenerate(messages, **kwargs)
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        raise NotImplementedError(f"{self.__class__.__name__} does not support native tool calling")
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        return await asyncio.to_thread(self._generate_with_tools, messages, tools, **kwargs)
+
+    def _sdk_client_options(self) -> dict:
+        ''' options for the provider SDK's client: its own retries are off when this LLM retries, so they do not stack '''
+        return {} if self.retry is None else dict(max_retries=0)
+
+    def cache_static_prefix(self, prefix: str):
+        ''' hint that upcoming prompts start with `prefix`, providers that can cache it server-side do (GeminiLLM) '''
+        pass
+
+    async def acache_static_prefix(self, prefix: str):
+        ''' cache_static_prefix for the event loop, providers that make a request for it do so off the loop '''
+        self.cache_static_prefix(prefix)
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.resilience_stats[stat] += 1
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        if self.retry is None or not self.retry.should_retry(error, attempt):
+            return False
+        self._count('retries')
+        active = current_span()
+        if active is not None:
+            active.set_attribute('retries', attempt)
+        return True
+
+    def _hedge_threshold(self) -> Optional[float]:
+        return None if self.hedge is None else self.hedge.threshold(self._latencies)
+
+    def _record_hedge(self, hedged: bool, hedge_won: bool):
+        if hedged:
+            self._count('hedged')
+        if hedge_won:
+            self._count('hedge_wins')
+
+    def _call(self, func, *args, **kwargs):
+        ''' calls a provider method with the retry and hedge policies '''
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                threshold = self._hedge_threshold()
+                if threshold is None:
+                    result = func(*args, **kwargs)
+                else:
+                    result, hedged, hedge_won = call_hedged(lambda: func(*args, **kwargs), threshold)
+                    self._record_hedge(hedged, hedge_won)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self.retry.delay(attempt, e))
+                continue
+            self._latencies.append(time.perf_counter() - start)
+            return result
+
+    async def _acall(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                threshold = self._hedge_threshold()
+                if threshold is None:
+                    result = await func(*args, **kwargs)
+                else:
+                    result, hedged, hedge_won = await acall_hedged(lambda: func(*args, **kwargs), threshold)
+                    self._record_hedge(hedged, hedge_won)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt, e))
+                continue
+            self._latencies.append(time.perf_counter() - start)
+            return result
+
+    def _cache_key(self, messages, kwargs, tools=None) -> str:
+        request = dict(provider=self.provider, model=getattr(self, 'model_name', None), messages=messages,
+                       kwargs=kwargs)
+        if tools is not None:
+            request['tools'] = [dict(name=spec.function_name, description=spec.function_description,
+                                     parameters=spec.parameters) for spec in tools]
+        return self.cache.key(request)
+
+    def _cached(self, call, llm_span, messages, kwargs, tools=None):
+        ''' call() through the response cache, if there is one '''
+        if self.cache is None:
+            return call()
+        payload, hit = self.cache.get_or_call(self._cache_key(messages, kwargs, tools), lambda: response_payload(call()))
+        llm_span.set_attribute('cache', 'hit' if hit else 'miss')
+        return response_from_payload(payload, cached=hit)
+
+    async def _acached(self, call, llm_span, messages, kwargs, tools=None):
+        if self.cache is None:
+            return await call()
+
+        async def payload_of_call():
+            return response_payload(await call())
+
+        payload, hit = await self.cache.aget_or_call(self._cache_key(messages, kwargs, tools), payload_of_call)
+        llm_span.set_attribute('cache', 'hit' if hit else 'miss')
+        return response_from_payload(payload, cached=hit)
+
+    def _llm_span(self, name: str, messages):
+        return span(name, provider=self.provider, model=getattr(self, 'model_name', None),
+                    prompt_chars=sum(len(str(message.get('content', ''))) for message in messages))
+
+    def _timed(self, response, start: float, llm_span=NOOP_SPAN) -> LLMResponse:
+        response = LLMResponse.of(response)
+        response.latency = time.perf_counter() - start
+        if response.model is None:
+            response.model = getattr(self, 'model_name', None)
+        llm_span.set_attributes(completion_chars=len(response), prompt_tokens=response.prompt_tokens,
+                                completion_tokens=response.completion_tokens, finish_reason=response.finish_reason)
+        return response
+
+    def generate(self, messages, **kwargs) -> LLMResponse:
+        '''
+        :return: the generated text as an LLMResponse (a str carrying token usage, finish reason and latency)
+        '''
         if self.static_generation_kwargs:
             kwargs.update(self.static_generation_kwargs)
-        raw_text_response = self._generate(messages, **kwargs)
-        if self.warehouse:
-            if self.warehouse == 'supabase':
-                # check for supabase environment variables
-                if 'SUPABASE_URL' not in os.environ or 'SUPABASE_KEY' not in os.environ:
-                    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables must be set")
-                try:
-                    from supabase import create_client, Client
-                except ImportError:
-                    raise ImportError("Please install supabase with `pip install supabase`")
-                supabase_table = os.environ.get('SUPABASE_TABLE', 'cost_projecting')
-                # find all class variables and add to a dictionary
-                class_vars = {}
-                for key, value in self.__dict__.items():
-                    if type(value) in (str, int, float, bool, list, dict) and not key.startswith('_'):
-                        class_vars[key] = value
-
-                class_vars.update(kwargs)
-                supabase_url = os.environ['SUPABASE_URL']
-                supabase_key = os.environ['SUPABASE_KEY']
-                supabase_client: Client = create_client(supabase_url, supabase_key)
-                supabase_client.table(supabase_table).insert({
-                    'prompt': json.dumps(messages),
-                    'response': raw_text_response,
-                    'inference_params': class_vars,
-                    'model': self.__class__.__name__
-                }).execute()
+        with self._llm_span('llm.generate', messages) as llm_span:
+            start = time.perf_counter()
+            response = self._cached(lambda: self._call(self._generate, messages, **kwargs), llm_span, messages, kwargs)
+            raw_text_response = self._timed(response, start, llm_span)
+        if self.warehouse and not raw_text_response.cached:
+            self._log_to_warehouse(messages, raw_text_response, **kwargs)
+        return raw_text_response
+
+    async def agenerate(self, messages, **kwargs) -> LLMResponse:
+        if self.static_generation_kwargs:
+            kwargs.update(self.static_generation_kwargs)
+        with self._llm_span('llm.generate', messages) as llm_span:
+            start = time.perf_counter()
+            response = await self._acached(lambda: self._acall(self._agenerate, messages, **kwargs), llm_span, messages,
+                                           kwargs)
+            raw_text_response = self._timed(response, start, llm_span)
+        if self.warehouse and not raw_text_response.cached:
+            self._log_to_warehouse(messages, raw_text_response, **kwargs)
         return raw_text_response
+
+    def generate_with_tools(self, messages, tools, **kwargs):
+        """
+        Generates with the provider's native function calling instead of ReAct text.
+        :param messages: List of dictionaries with 'role' and 'content'.
+        :param tools: List of ToolSpec (see squad_goals.tools.registry) the model may call.
+        :return: (text, tool_calls) where text is an LLMResponse and tool_calls is a list of
+        {'name': function_name, 'arguments': dict}
+        """
+        if self.static_generation_kwargs:
+            kwargs.update(self.static_generation_kwargs)
+        with self._llm_span('llm.generate', messages) as llm_span:
+            start = time.perf_counter()
+            text, tool_calls = self._cached(lambda: self._call(self._generate_with_tools, messages, tools, **kwargs),
+                                            llm_span, messages, kwargs, tools)
+            text = self._timed(text, start, llm_span)
+            llm_span.set_attribute('tool_calls', len(tool_calls))
+        if self.warehouse and not text.cached:
+            self._log_to_warehouse(messages, json.dumps(dict(text=text, tool_calls=tool_calls)), **kwargs)
+        return text, tool_calls
+
+    async def agenerate_with_tools(self, messages, tools, **kwargs):
+        if self.static_generation_kwargs:
+            kwargs.update(self.static_generation_kwargs)
+        with self._llm_span('llm.generate', messages) as llm_span:
+            start = time.perf_counter()
+            text, tool_calls = await self._acached(
+                lambda: self._acall(self._agenerate_with_tools, messages, tools, **kwargs), llm_span, messages, kwargs,
+                tools)
+            text = self._timed(text, start, llm_span)
+            llm_span.set_attribute('tool_calls', len(tool_calls))
+        if self.warehouse and not text.cached:
+            self._log_to_warehouse(messages, json.dumps(dict(text=text, tool_calls=tool_calls)), **kwargs)
+        return text, tool_calls
+
+    def stream(self, messages, **kwargs):
+        """
+        Yields the completion as text chunks while it is generated.
+        Closing the generator early (e.g. once the agent has parsed its next action) cancels the rest of the generation.
+        Errors before the first chunk are retried like generate's, later ones are raised (the chunks are already out).
+        A cached completion is yielded as a single chunk. Completions streamed to the end are cached, a stream closed
+        early is logged and cached with the text it produced so far, which only stream() calls are served (see
+        STREAM_PREFIX).
+        """
+        if self.static_generation_kwargs:
+            kwargs.update(self.static_generation_kwargs)
+        cache_key = None if self.cache is None else self._cache_key(messages, kwargs)
+        cached = None if cache_key is None else self.cache.get(cache_key, cache_key + STREAM_PREFIX)
+        if cached is not None:
+            with self._llm_span('llm.stream', messages) as llm_span:
+                llm_span.set_attributes(cache='hit', chunks=1)
+                yield response_from_payload(cached)
+            return
+        chunks, complete = [], None  # None until it ends or is closed, a failed stream is not logged or cached
+        with self._llm_span('llm.stream', messages) as llm_span:
+            attempt = 0
+            try:
+                while True:
+                    attempt += 1
+                    provider_stream = self._stream(messages, **kwargs)
+                    try:
+                        for chunk in provider_stream:
+                            chunks.append(chunk)
+                            yield chunk
+                        break
+                    except Exception as e:
+                        if chunks or not self._should_retry(e, attempt):
+                            raise
+                        error = e
+                    finally:
+                        provider_stream.close()
+                    time.sleep(self.retry.delay(attempt, error))
+                complete = True
+            except GeneratorExit:  # closed early, e.g. by the agent once it parsed its next action
+                complete = False
+                raise
+            finally:
+                llm_span.set_attributes(chunks=len(chunks), completion_chars=sum(map(len, chunks)))
+                if complete or (complete is False and chunks):
+                    self._stream_finished(messages, kwargs, cache_key, ''.join(chunks), complete)
+
+    async def astream(self, messages, **kwargs):
+        if self.static_generation_kwargs:
+            kwargs.update(self.static_generation_kwargs)
+        cache_key = None if self.cache is None else self._cache_key(messages, kwargs)
+        cached = None if cache_key is None else self.cache.get(cache_key, cache_key + STREAM_PREFIX)
+        if cached is not None:
+            with self._llm_span('llm.stream', messages) as llm_span:
+                llm_span.set_attributes(cache='hit', chunks=1)
+                yield response_from_payload(cached)
+            return
+        chunks, complete = [], None  # None until it ends or is closed, a failed stream is not logged or cached
+        with self._llm_span('llm.stream', messages) as llm_span:
+            attempt = 0
+            try:
+                while True:
+                    attempt += 1
+                    provider_stream = self._astream(messages, **kwargs)
+                    try:
+                        async for chunk in provider_stream:
+                            chunks.append(chunk)
+                            yield chunk
+                        break
+                    except Exception as e:
+                        if chunks or not self._should_retry(e, attempt):
+                            raise
+                        error = e
+                    finally:
+                        await provider_stream.aclose()
+                    await asyncio.sleep(self.retry.delay(attempt, error))
+                complete = True
+            except GeneratorExit:  # closed early, e.g. by the agent once it parsed its next action
+                complete = False
+                raise
+            finally:
+                llm_span.set_attributes(chunks=len(chunks), completion_chars=sum(map(len, chunks)))
+                if complete or (complete is False and chunks):
+                    self._stream_finished(messages, kwargs, cache_key, ''.join(chunks), complete)
+
+    def _stream_finished(self, messages, kwargs, cache_key, text: str, complete: bool):
+        if self.warehouse:
+            self._log_to_warehouse(messages, text, **kwargs)
+        if cache_key is not None:
+            self.cache.put(cache_key if complete else cache_key + STREAM_PREFIX, response_payload(text))
+
+    def _log_to_warehouse(self, messages, raw_text_response, **kwargs):
+        # queued for the warehouse's background writer, so the call does not wait on it
+        if self._prompt_logger is None:
+            self._prompt_logger = prompt_logger(self.warehouse)
+        # find all class variables and add to a dictionary
+        class_vars = {}
+        for key, value in self.__dict__.items():
+            if type(value) in (str, int, float, bool, list, dict) and not key.startswith('_'):
+                class_vars[key] = value
+
+        class_vars.update(kwargs)
+        self._prompt_logger.log({
+            'prompt': json.dumps(messages),
+            'response': str(raw_text_response),
+            'inference_params': class_vars,
+            'model': self.__class__.__name__
+        })
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .response import LLMResponse
+
+
+def response_payload(value) -> Dict[str, Any]:
+    ''' the JSON-serializable form of a generation, an LLMResponse or a (text, tool_calls) pair '''
+    if isinstance(value, tuple):
+        text, tool_calls = value
+        return dict(response=LLMResponse.of(text).as_dict(), tool_calls=tool_calls)
+    return dict(response=LLMResponse.of(value).as_dict())
+
+
+def response_from_payload(payload: Dict[str, Any], cached: bool = True):
+    response = LLMResponse.from_dict(payload['response'])
+    response.cached = cached
+    return (response, payload['tool_calls']) if 'tool_calls' in payload else response
+
+
+class ResponseCache:
+    """
+    Caches LLM generations by request (provider, model, messages, generation kwargs and tool schemas), opt in per
+    LLM with e.g. OpenAILLM(cache=ResponseCache('llm_cache.db', ttl=24 * 3600)).
+
+    Two tiers: an in-process LRU of `max_entries` responses in front of an optional SQLite file at `path` that
+    survives restarts and is shared between processes, trimmed to `max_bytes` by evicting the least recently used.
+    Entries older than `ttl` seconds are misses. Identical requests made concurrently share one call (singleflight).
+
+    Only cache what should be reproducible: with a sampling temperature, every hit replays one sample.
+    `stats()` returns the hit / miss counters.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None, max_entries: int = 1024,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires_at, payload)
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self._counters = dict(memory_hits=0, disk_hits=0, misses=0, shared=0, expired=0, evictions=0, stores=0)
+        self._connection = None
+        self._disk_bytes = 0
+        if path is not None:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._connection:
+                if path != ':memory:':
+                    self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, '
+                                         'payload TEXT NOT NULL, bytes INTEGER NOT NULL, expires_at REAL, '
+                                         'accessed_at REAL NOT NULL)')
+                self._connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+                self._disk_bytes = self._connection.execute(
+                    'SELECT COALESCE(SUM(bytes), 0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        canonical = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _remember(self, key: str, expires_at: Optional[float], payload: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= now:
+                del self._memory[key]
+                self._counters['expired'] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._counters['memory_hits'] += 1
+            return entry[1]
+
+    def _from_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if self._connection is None:
+            return None
+        with self._lock, self._connection:
+            row = self._connection.execute('SELECT payload, bytes, expires_at FROM responses WHERE key = ?',
+                                           (key,)).fetchone()
+            if row is None:
+                return None
+            if row[2] is not None and row[2] <= now:
+                self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._disk_bytes -= row[1]
+                self._counters['expired'] += 1
+                return None
+            self._connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._counters['disk_hits'] += 1
+        payload = json.loads(row[0])
+        self._remember(key, row[2], payload)
+        return payload
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        payload = self._from_memory(key, now)
+        return payload if payload is not None else self._from_disk(key, now)
+
+    def get(self, key: str, *fallbacks: str) -> Optional[Dict[str, Any]]:
+        ''' the cached payload of the request (or of the first fallback key that has one), None on a miss '''
+        for candidate in (key,) + fallbacks:
+            payload = self._lookup(candidate)
+            if payload is not None:
+                return payload
+        self._count('misses')
+        return None
+
+    def put(self, key: str, payload: Dict[str, Any]):
+        now = time.time()
+        expires_at = None if self.ttl is None else now + self.ttl
+        self._remember(key, expires_at, payload)
+        self._count('stores')
+        if self._connection is None:
+            return
+        serialized = json.dumps(payload, default=str)
+        with self._lock, self._connection:
+            previous = self._connection.execute('SELECT bytes FROM responses WHERE key = ?', (key,)).fetchone()
+            self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                     (key, serialized, len(serialized), expires_at, now))
+            self._disk_bytes += len(serialized) - (previous[0] if previous else 0)
+            self._evict()
+
+    def _evict(self):
+        # called holding the lock, drops least recently used rows until the file is within max_bytes
+        while self._disk_bytes > self.max_bytes:
+            rows = self._connection.execute('SELECT key, bytes FROM responses ORDER BY accessed_at LIMIT 64').fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                return
+            for key, size in rows:
+                self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._disk_bytes -= size
+                self._counters['evictions'] += 1
+                if self._disk_bytes <= self.max_bytes:
+                    return
+
+    def _join(self, key: str):
+        ''' (payload, None) on a hit, (None, flight) to wait on another caller's call, (None, None) to make it '''
+        with self._lock:
+            payload = self._lookup(key)
+            if payload is not None:
+                return payload, None
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self._counters['shared'] += 1
+                return None, flight
+            self._counters['misses'] += 1
+            self._in_flight[key] = Future()
+            return None, None
+
+    def _land(self, key: str, payload: Optional[Dict[str, Any]] = None, error: Optional[BaseException] = None):
+        with self._lock:
+            flight = self._in_flight.pop(key)
+        if error is not None:
+            flight.set_exception(error)
+            return
+        self.put(key, payload)
+        flight.set_result(payload)
+
+    def get_or_call(self, key: str, call: Callable[[], Dict[str, Any]]):
+        ''' (payload, hit): the cached payload, else the payload of call(), made once for concurrent callers '''
+        payload, flight = self._join(key)
+        if payload is not None:
+            return payload, True
+        if flight is not None:
+            return flight.result(), True
+        try:
+            payload = call()
+        except BaseException as e:
+            self._land(key, error=e)
+            raise
+        self._land(key, payload)
+        return payload, False
+
+    async def aget_or_call(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]):
+        payload, flight = self._join(key)
+        if payload is not None:
+            return payload, True
+        if flight is not None:
+            return await asyncio.wrap_future(flight), True
+        try:
+            payload = await call()
+        except BaseException as e:
+            self._land(key, error=e)
+            raise
+        self._land(key, payload)
+        return payload, False
+
+    def stats(self) -> Dict[str, Any]:
+        ''' hit / miss counters, `shared` counts callers that waited on an identical in-flight call '''
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._memory), disk_bytes=self._disk_bytes)
+        hits = stats['memory_hits'] + stats['disk_hits'] + stats['shared']
+        stats.update(hits=hits, hit_rate=hits / (hits + stats['misses']) if hits + stats['misses'] else 0.)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.execute('DELETE FROM responses')
+                self._disk_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __repr__(self) -> str:
+        return f"ResponseCache({self.path or 'memory'}, {len(self._memory)} in memory)"
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import inspect
+import threading
+import warnings
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_default_registry: Optional['ClientRegistry'] = None
+_default_registry_lock = threading.Lock()
+
+
+def _close(client) -> Any:
+    close = getattr(client, 'close', None) or getattr(client, 'aclose', None)
+    return close() if callable(close) else None
+
+
+async def _aclose(client):
+    result = _close(client)
+    if inspect.isawaitable(result):
+        await result
+
+
+class ClientRegistry:
+    """
+    Process-wide SDK clients shared by the LLMs that would build identical ones: every OpenAILLM (and Groq, DeepSeek,
+    OpenRouter) or AnthropicLLM with the same base_url and API key uses one client and so one warm connection pool,
+    instead of one per instance. Each LLM gets its clients from client_registry().
+
+    Async clients are kept per event loop, since their connection pools are bound to the loop that opened them.
+    Close the clients when the process is done with them, e.g. at shutdown:
+
+    client_registry().close()  # or `await client_registry().aclose()` from the event loop, to close async clients too
+
+    LLMs keep the clients they were built with, so LLMs built before close() have to be built again to be used after.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple, Any] = {}
+        self._async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]' = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._counters = dict(created=0, reused=0, closed=0)
+
+    @staticmethod
+    def key(sdk: str, base_url: Optional[str] = None, api_key: Optional[str] = None, **options) -> Tuple:
+        ''' the key of a client, the API key is hashed so it does not show up in stats or errors '''
+        api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else None
+        return (sdk, base_url, api_key_hash) + tuple(sorted(options.items()))
+
+    def _get(self, clients: Dict[Tuple, Any], key: Tuple, factory: Callable[[], Any]):
+        # called holding the lock, so concurrent first calls build one client
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = factory()
+            self._counters['created'] += 1
+        else:
+            self._counters['reused'] += 1
+        return client
+
+    def get(self, key: Tuple, factory: Callable[[], Any]):
+        ''' the client registered under `key`, built with factory() the first time '''
+        with self._lock:
+            return self._get(self._clients, key, factory)
+
+    def get_async(self, key: Tuple, factory: Callable[[], Any]):
+        ''' the async client registered under `key` for the running event loop (or a shared one outside a loop) '''
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            if loop is None:
+                return self._get(self._clients, ('async',) + key, factory)
+            return self._get(self._async_clients.setdefault(loop, {}), key, factory)
+
+    def close(self):
+        '''
+        closes every client: async clients are closed on their event loop if it is still running, the ones of loops
+        that stopped cannot be and are dropped with a ResourceWarning (close those with aclose() from their loop)
+        '''
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            async_clients, self._async_clients = self._async_clients, weakref.WeakKeyDictionary()
+            self._counters['closed'] += len(clients)
+        for client in clients.values():
+            result = _close(client)
+            if inspect.isawaitable(result):  # an async client created outside a loop, it cannot be awaited here
+                result.close()
+        dropped = 0
+        for loop, loop_clients in list(async_clients.items()):
+            if loop.is_closed() or not loop.is_running():
+                dropped += len(loop_clients)
+                continue
+            for client in loop_clients.values():
+                asyncio.run_coroutine_threadsafe(_aclose(client), loop)
+            with self._lock:
+                self._counters['closed'] += len(loop_clients)
+        if dropped:
+            warnings.warn(f"ClientRegistry.close() dropped {dropped} async clients of event loops that are not running "
+                          f"without closing them, close them with `await registry.aclose()` from their loop",
+                          ResourceWarning, stacklevel=2)
+
+    async def aclose(self):
+        ''' closes every client, awaiting the async ones of the running loop '''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            async_clients = self._async_clients.pop(loop, {})
+            self._counters['closed'] += len(async_clients)
+        for client in async_clients.values():
+            await _aclose(client)
+        self.close()
+
+    def stats(self) -> Dict[str, int]:
+        ''' clients held, async clients held across loops, and how many were created, reused and closed '''
+        with self._lock:
+            return dict(self._counters, clients=len(self._clients),
+                        async_clients=sum(len(clients) for clients in self._async_clients.values()))
+
+    def __repr__(self) -> str:
+        return f"ClientRegistry({len(self._clients)} clients)"
+
+
+def client_registry() -> ClientRegistry:
+    ''' the process-wide registry the built-in LLMs take their SDK clients from '''
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = ClientRegistry()
+    return _default_registry
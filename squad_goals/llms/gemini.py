@@ -1,10 +1,50 @@
+import asyncio
+import datetime
+import json
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
 from .base_llm import LLM
+from .clients import ClientRegistry, client_registry
+from .response import LLMResponse
+
+# seconds before a context cache's expiry it stops being used, so requests never reference an expired cache
+CONTEXT_CACHE_MARGIN = 60.0
+# context caching needs an explicit model version, e.g. gemini-1.5-flash-001, not the gemini-1.5-flash alias
+CACHEABLE_MODEL = re.compile(r'-\d{3}$')
+
+_configured_key = None
+_configure_lock = threading.Lock()
+
+
+def _configure(genai, api_key):
+    # the SDK holds one global API key, it is only configured again when an LLM uses a different one
+    global _configured_key
+    with _configure_lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
 
 
 class GeminiLLM(LLM):
-    def __init__(self, model_name="gemini-1.5-flash", api_key=None, **kwargs):
+    """
+    Gemini through google-generativeai. Generation configs are built once per set of kwargs.
+
+    With `context_cache_ttl` (seconds), static prompt prefixes of at least `context_cache_min_chars` (see
+    cache_static_prefix, an Agent registers its CompiledPrompt.static_prefix) are stored with Gemini context caching,
+    so requests starting with one send only the rest. Caching needs a versioned model name (e.g.
+    "gemini-1.5-flash-001", other models are skipped without a request) and a prefix above the model's minimum token
+    count (32k tokens for Gemini 1.5). A prefix the API refuses is sent in full as before, and not tried again until
+    context_cache_ttl has passed. Tool calls always send the full prompt.
+    """
+    provider = 'gemini'
+
+    def __init__(self, model_name="gemini-1.5-flash", api_key=None, context_cache_ttl: Optional[float] = None,
+                 context_cache_min_chars: int = 4 * 32768, **kwargs):
         try:
             import google.generativeai as genai
         except ImportError:
@@ -15,11 +55,123 @@ class GeminiLLM(LLM):
             api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("Gemini API key is required.")
-        genai.configure(api_key=api_key)
+        _configure(genai, api_key)
         self.model_name = model_name
-        self.client = genai.GenerativeModel(model_name)
+        self.client = client_registry().get(ClientRegistry.key('gemini', api_key=api_key, model=model_name),
+                                            lambda: genai.GenerativeModel(model_name))
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_min_chars = context_cache_min_chars
+        self.context_cache_stats = dict(context_caches=0, context_cache_hits=0, context_cache_errors=0)
+        self.last_context_cache_error: Optional[Exception] = None
+        self._configs: 'OrderedDict[str, Any]' = OrderedDict()  # generation kwargs -> GenerationConfig
+        # prefix -> (model on the cached content, or None while it is created or after it failed, expires)
+        self._context_caches: Dict[str, Tuple[Optional[Any], float]] = {}
+        self._lock = threading.Lock()
         super().__init__(**kwargs)
 
+    @staticmethod
+    def _contents(messages):
+        # Convert messages to the format expected by the SDK
+        return [{"role": 'model' if msg['role'] == 'assistant' else msg['role'], "parts": [msg['content']]}
+                for msg in messages]
+
+    def _generation_config(self, max_output_tokens, stop, kwargs):
+        import google.generativeai as genai
+        key = json.dumps([max_output_tokens, stop, kwargs], sort_keys=True, default=str)
+        with self._lock:
+            config = self._configs.get(key)
+            if config is not None:
+                self._configs.move_to_end(key)
+                return config
+        config = genai.types.GenerationConfig(max_output_tokens=max_output_tokens, stop_sequences=stop, **kwargs)
+        with self._lock:
+            self._configs[key] = config
+            while len(self._configs) > 64:
+                self._configs.popitem(last=False)
+        return config
+
+    def _claim_context_cache(self, prefix: str) -> bool:
+        ''' whether `prefix` should be cached now, marking it as taken so concurrent sessions do not create it too '''
+        if (self.context_cache_ttl is None or len(prefix) < self.context_cache_min_chars
+                or not CACHEABLE_MODEL.search(self.model_name)):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            cached = self._context_caches.get(prefix)
+            if cached is not None and cached[1] > now:
+                return False
+            # until created, and for a whole ttl if creating it fails, requests send the prefix in full
+            self._context_caches[prefix] = (None, now + self.context_cache_ttl)
+        return True
+
+    def _create_context_cache(self, prefix: str):
+        try:
+            import google.generativeai as genai
+            from google.generativeai import caching
+            cached_content = caching.CachedContent.create(
+                model=self.model_name, contents=[{'role': 'user', 'parts': [prefix]}],
+                ttl=datetime.timedelta(seconds=self.context_cache_ttl))
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        except Exception as e:  # e.g. under the model's minimum size, the prompt is then sent whole
+            self.last_context_cache_error = e
+            with self._lock:
+                self.context_cache_stats['context_cache_errors'] += 1
+            return
+        # stop using it a little before the API expires it
+        expires_at = time.monotonic() + self.context_cache_ttl - min(CONTEXT_CACHE_MARGIN, self.context_cache_ttl / 2)
+        with self._lock:
+            self._context_caches[prefix] = (model, expires_at)
+            self.context_cache_stats['context_caches'] += 1
+
+    def cache_static_prefix(self, prefix: str):
+        if self._claim_context_cache(prefix):
+            self._create_context_cache(prefix)
+
+    async def acache_static_prefix(self, prefix: str):
+        if self._claim_context_cache(prefix):
+            await asyncio.to_thread(self._create_context_cache, prefix)
+
+    def _model_for(self, messages):
+        ''' (model, messages): the model on a cached prefix the first message starts with, and the messages without
+        it, or the plain model and messages '''
+        first = messages[0]
+        if not self._context_caches or first['role'] != 'user' or not isinstance(first['content'], str):
+            return self.client, messages
+        now = time.monotonic()
+        with self._lock:
+            for prefix, (model, expires_at) in list(self._context_caches.items()):
+                if expires_at <= now:
+                    del self._context_caches[prefix]
+                elif model is not None and len(first['content']) > len(prefix) and first['content'].startswith(prefix):
+                    self.context_cache_stats['context_cache_hits'] += 1
+                    return model, [dict(first, content=first['content'][len(prefix):])] + messages[1:]
+        return self.client, messages
+
+    def _prepare_chat(self, messages, max_output_tokens=1024, stop=None, cached=True, **kwargs):
+        """
+        Builds the chat session and generation config shared by the sync and async paths.
+        :param cached: start the chat on the context cache of a static prefix the first message starts with
+        :return: (chat session, generation config, the content to send)
+        """
+        if messages[-1]['role'] != 'user':
+            raise ValueError("The last message in the conversation history must be from the user.")
+        generation_config = self._generation_config(max_output_tokens, stop, kwargs)
+        model = self.client
+        if cached:
+            model, messages = self._model_for(messages)
+
+        # Start a chat session with the existing history
+        chat = model.start_chat(history=self._contents(messages[:-1]))
+        return chat, generation_config, messages[-1]['content']
+
+    @staticmethod
+    def _response(response, text) -> LLMResponse:
+        usage = getattr(response, 'usage_metadata', None)
+        finish_reason = getattr(response.candidates[0], 'finish_reason', None)
+        return LLMResponse(text, prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                           completion_tokens=getattr(usage, 'candidates_token_count', None),
+                           finish_reason=getattr(finish_reason, 'name', finish_reason))
+
     def _generate(self, messages, max_output_tokens=1024, stop=None, **kwargs):
         """
         Sends a prompt to the Gemini model and returns the generated response.
@@ -29,27 +181,94 @@ class GeminiLLM(LLM):
         :param kwargs: Additional arguments to pass to the API.
         :return: Generated text from the Gemini model.
         """
-        import google.generativeai as genai
-        if messages[-1]['role'] != 'user':
-            raise ValueError("The last message in the conversation history must be from the user.")
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, **kwargs)
 
-        # Convert messages to the format expected by the SDK
-        history = [{"role": 'model' if msg['role'] == 'assistant' else msg['role'], "parts": [msg['content']]} for msg
-                   in messages[:-1]]
+        # Send the final user message and get the response
+        response = chat.send_message(
+            content,  # Pass the content directly
+            generation_config=generation_config
+        )
+        return self._response(response, response.candidates[0].content.parts[0].text)
 
-        # Start a chat session with the existing history
-        chat = self.client.start_chat(history=history)
+    async def _agenerate(self, messages, max_output_tokens=1024, stop=None, **kwargs):
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, **kwargs)
+        response = await chat.send_message_async(
+            content,
+            generation_config=generation_config
+        )
+        return self._response(response, response.candidates[0].content.parts[0].text)
 
-        # Prepare the generation configuration
-        generation_config = genai.types.GenerationConfig(
-            max_output_tokens=max_output_tokens,
-            stop_sequences=stop,
-            **kwargs
+    def _stream(self, messages, max_output_tokens=1024, stop=None, **kwargs):
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, **kwargs)
+        response = chat.send_message(
+            content,
+            generation_config=generation_config,
+            stream=True
         )
+        for chunk in response:
+            for part in chunk.parts:
+                yield part.text
 
-        # Send the final user message and get the response
+    async def _astream(self, messages, max_output_tokens=1024, stop=None, **kwargs):
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, **kwargs)
+        response = await chat.send_message_async(
+            content,
+            generation_config=generation_config,
+            stream=True
+        )
+        async for chunk in response:
+            for part in chunk.parts:
+                yield part.text
+
+    @classmethod
+    def _gemini_schema(cls, schema):
+        # Gemini schemas have no additionalProperties and every property needs a type
+        schema = {key: value for key, value in schema.items() if key != 'additionalProperties'}
+        if 'properties' in schema:
+            schema['properties'] = {name: cls._gemini_schema(prop) for name, prop in schema['properties'].items()}
+        schema.setdefault('type', 'string')
+        return schema
+
+    @classmethod
+    def _tool_schemas(cls, tools):
+        return [{'function_declarations': [
+            {'name': spec.function_name, 'description': spec.function_description,
+             'parameters': cls._gemini_schema(spec.parameters)}
+            for spec in tools
+        ]}]
+
+    @staticmethod
+    def _parse_tool_calls(response):
+        text, tool_calls = '', []
+        for part in response.candidates[0].content.parts:
+            if part.function_call and part.function_call.name:
+                tool_calls.append(dict(name=part.function_call.name, arguments=dict(part.function_call.args)))
+            elif part.text:
+                text += part.text
+        return text, tool_calls
+
+    def _generate_with_tools(self, messages, tools, max_output_tokens=1024, stop=None, **kwargs):
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, cached=False, **kwargs)
         response = chat.send_message(
-            messages[-1]["content"],  # Pass the content directly
-            generation_config=generation_config
+            content,
+            generation_config=generation_config,
+            tools=self._tool_schemas(tools)
+        )
+        text, tool_calls = self._parse_tool_calls(response)
+        return self._response(response, text), tool_calls
+
+    async def _agenerate_with_tools(self, messages, tools, max_output_tokens=1024, stop=None, **kwargs):
+        chat, generation_config, content = self._prepare_chat(
+            messages, max_output_tokens=max_output_tokens, stop=stop, cached=False, **kwargs)
+        response = await chat.send_message_async(
+            content,
+            generation_config=generation_config,
+            tools=self._tool_schemas(tools)
         )
-        return response.candidates[0].content.parts[0].text
+        text, tool_calls = self._parse_tool_calls(response)
+        return self._response(response, text), tool_calls
@@ -1,40 +1,75 @@
+import json
 import os
-import requests
 
 from .base_llm import LLM
+from .response import LLMResponse
+from ..utils.http import http_pool, iter_lines
 
 
 class InceptionLLM(LLM):
+    provider = 'inception'
+
     def __init__(self, model_name='mercury-coder-small', api_key=None, **kwargs):
         if not api_key:
             api_key = os.getenv("INCEPTION_API_KEY")
         if not api_key:
             raise ValueError("API key is required")
-            
+
         self.model_name = model_name
         self.api_key = api_key
         self.base_url = "https://api.inceptionlabs.ai/v1"
         super().__init__(**kwargs)
 
-    def _generate(self, messages, **kwargs):
+    def _request(self, messages, **kwargs):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+
         payload = {
             "messages": messages,
             "model": self.model_name
         }
-        
+
         # Add any additional parameters from kwargs
         payload.update({k: v for k, v in kwargs.items() if k not in ["messages", "model"]})
-        
-        response = requests.post(
+        return headers, payload
+
+    def _generate(self, messages, **kwargs):
+        headers, payload = self._request(messages, **kwargs)
+
+        response = http_pool().post(
             f"{self.base_url}/chat/completions",
             headers=headers,
             json=payload
         )
-        
+
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"] 
\ No newline at end of file
+        body = response.json()
+        usage = body.get("usage") or {}
+        return LLMResponse(body["choices"][0]["message"]["content"], prompt_tokens=usage.get("prompt_tokens"),
+                           completion_tokens=usage.get("completion_tokens"),
+                           finish_reason=body["choices"][0].get("finish_reason"))
+
+    def _stream(self, messages, **kwargs):
+        headers, payload = self._request(messages, stream=True, **kwargs)
+        response = http_pool().post(
+            f"{self.base_url}/chat/completions",
+            headers=headers,
+            json=payload,
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            # OpenAI-compatible server-sent events: `data: {...}` lines ending with `data: [DONE]`
+            for line in iter_lines(response):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                content = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
+        finally:
+            response.close()  # closing the connection stops the generation if we bail out early
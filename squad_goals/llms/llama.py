@@ -1,9 +1,10 @@
-import requests
-
 from .base_llm import LLM
+from ..utils.http import http_pool
 
 
 class CustomLlama(LLM):
+    provider = 'llama'
+
     def __init__(self, url, **kwargs):
         self.url = url
         super().__init__(**kwargs)
@@ -16,6 +17,6 @@ class CustomLlama(LLM):
                 'content'],
             'stop_pattern': stop
         }
-        response = requests.post(self.url, headers=headers, json=messages)
+        response = http_pool().post(self.url, headers=headers, json=messages)
         response.raise_for_status()
         return response.text
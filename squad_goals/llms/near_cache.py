@@ -0,0 +1,253 @@
+import heapq
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Pattern, Sequence, Tuple
+
+from .base_llm import LLM
+from .cache import ResponseCache, response_from_payload, response_payload
+
+# fields the prompt templates fill in that change between otherwise identical prompts: the "Today is {today}" line
+# of the agent's templates. Dates and ids anywhere else (goals, observations) are part of the question
+VOLATILE_PATTERNS: List[Tuple[Pattern, str]] = [
+    (re.compile(r'^Today\s+is\s+\d{4}-\d{2}-\d{2}\b', re.MULTILINE | re.IGNORECASE), 'Today is <today>'),
+]
+_TOKENS = re.compile(r'\w+|[^\w\s]')
+# words with a digit (numbers, dates, times, ids) have to match exactly, a near hit only tolerates other rewordings
+_ANCHORS = re.compile(r'[\w.:-]*\d(?:[\w.:-]*\w)?')
+# how many of the smallest shingle hashes (a bottom-k MinHash) index an entry, similar prompts share most of them
+INDEX_HASHES = 8
+
+
+class Signature:
+    """ The shingles of a normalized prompt (hashed word n-grams) and the smallest of them, which index it """
+
+    def __init__(self, shingles: FrozenSet[int], anchors: Tuple[str, ...] = ()):
+        self.shingles = shingles
+        self.anchors = anchors
+        self.index = heapq.nsmallest(INDEX_HASHES, shingles)
+
+    def compare(self, other: 'Signature') -> Tuple[float, int]:
+        ''' (Jaccard similarity, number of shingles only one of the two has), 0 when their anchors differ '''
+        if self.anchors != other.anchors:
+            return 0., len(self.shingles) + len(other.shingles)
+        if not self.shingles and not other.shingles:
+            return 1., 0
+        shared = len(self.shingles & other.shingles)
+        union = len(self.shingles) + len(other.shingles) - shared
+        return shared / union, union - shared
+
+
+class NearDuplicateCache:
+    """
+    Serves a cached completion for a prompt that is nearly the same as one seen before: the same provider, model,
+    generation kwargs, tools and message roles, and message text that only differs in the template's volatile fields
+    (today's date, see VOLATILE_PATTERNS), case, whitespace or a few words without digits. Opt in per agent with
+    Agent(llm=llm, near_duplicate_cache=NearDuplicateCache(threshold=0.9)), or per LLM with cache.wrap_llm(llm).
+
+    Prompts are compared on their word `shingle_size`-grams, without any embedding API: the smallest shingle hashes
+    index the entries (bottom-k MinHash), candidates are verified on their exact Jaccard similarity, which must be at
+    least `threshold`, with at most `max_changed` shingles differing (a changed word changes shingle_size of them on
+    both sides). A near match can still need a different answer ("CEO of Acme" vs "CEO of Globex"), so a share
+    `audit_rate` of near hits is also sent to the provider and compared, see stats()['accuracy'].
+    """
+
+    def __init__(self, threshold: float = 0.9, max_changed: Optional[int] = 12, shingle_size: int = 3,
+                 max_entries: int = 512, audit_rate: float = 0.0,
+                 volatile_patterns: Sequence[Tuple[Pattern, str]] = tuple(VOLATILE_PATTERNS)):
+        self.threshold = threshold
+        self.max_changed = max_changed
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.volatile_patterns = list(volatile_patterns)
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()  # id -> (scope, signature, payload)
+        self._index: Dict[Tuple[str, int], set] = {}  # (scope, index hash) -> entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._counters = dict(exact_hits=0, near_hits=0, misses=0, audits=0, audit_agreements=0, evictions=0)
+        self._similarity_sum = 0.
+
+    def normalize(self, text: str) -> str:
+        for pattern, placeholder in self.volatile_patterns:
+            text = pattern.sub(placeholder, text)
+        return text.lower()
+
+    def signature(self, text: str) -> Signature:
+        text = self.normalize(text)
+        tokens = _TOKENS.findall(text)
+        size = min(self.shingle_size, len(tokens)) or 1
+        # hash() of the word tuples is salted per process, which is fine for a cache that lives in memory
+        return Signature(frozenset(map(hash, zip(*(tokens[i:] for i in range(size))))),
+                         tuple(sorted(_ANCHORS.findall(text))))
+
+    def similar(self, a: Signature, b: Signature) -> Tuple[bool, float]:
+        similarity, changed = a.compare(b)
+        return similarity >= self.threshold and (self.max_changed is None or changed <= self.max_changed), similarity
+
+    def lookup(self, scope: str, text: str) -> Tuple[Signature, Optional[Dict[str, Any]], float]:
+        ''' (signature of the text, payload of the most similar entry or None, its similarity) '''
+        signature = self.signature(text)
+        best, best_similarity = None, 0.
+        with self._lock:
+            candidates: Dict[int, int] = {}
+            for index_hash in signature.index:
+                for entry_id in self._index.get((scope, index_hash), ()):
+                    candidates[entry_id] = candidates.get(entry_id, 0) + 1
+            # the entries sharing the most index hashes are the likeliest matches, only those are verified
+            for entry_id in heapq.nlargest(INDEX_HASHES, candidates, key=candidates.get):
+                matches, similarity = self.similar(signature, self._entries[entry_id][1])
+                if matches and similarity > best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self._counters['misses'] += 1
+                return signature, None, 0.
+            self._entries.move_to_end(best)
+            self._counters['exact_hits' if best_similarity == 1. else 'near_hits'] += 1
+            self._similarity_sum += best_similarity
+            return signature, self._entries[best][2], best_similarity
+
+    def store(self, scope: str, signature: Signature, payload: Dict[str, Any]):
+        with self._lock:
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            self._entries[entry_id] = (scope, signature, payload)
+            for index_hash in signature.index:
+                self._index.setdefault((scope, index_hash), set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                evicted, (evicted_scope, evicted_signature, _) = self._entries.popitem(last=False)
+                for index_hash in evicted_signature.index:
+                    bucket = self._index.get((evicted_scope, index_hash))
+                    if bucket is not None:
+                        bucket.discard(evicted)
+                        if not bucket:
+                            del self._index[(evicted_scope, index_hash)]
+                self._counters['evictions'] += 1
+
+    def should_audit(self, similarity: float) -> bool:
+        return similarity < 1. and random.random() < self.audit_rate
+
+    def record_audit(self, cached: Dict[str, Any], fresh: Dict[str, Any]) -> bool:
+        ''' compares a near hit's cached completion with the provider's, returns whether they agree '''
+        agreed = (cached.get('tool_calls') == fresh.get('tool_calls') and self.similar(
+            self.signature(cached['response']['text']), self.signature(fresh['response']['text']))[0])
+        with self._lock:
+            self._counters['audits'] += 1
+            self._counters['audit_agreements'] += agreed
+        return agreed
+
+    def stats(self) -> Dict[str, Any]:
+        '''
+        hit / miss counters, hit_rate, the mean similarity of hits and the accuracy of audited near hits (the share
+        whose cached completion agreed with a fresh one, None before any audit)
+        '''
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._entries))
+            similarity_sum = self._similarity_sum
+        hits = stats['exact_hits'] + stats['near_hits']
+        lookups = hits + stats['misses']
+        stats.update(hits=hits, hit_rate=hits / lookups if lookups else 0.,
+                     mean_similarity=similarity_sum / hits if hits else None,
+                     accuracy=stats['audit_agreements'] / stats['audits'] if stats['audits'] else None)
+        return stats
+
+    def wrap_llm(self, llm: LLM) -> 'NearDuplicateLLM':
+        return NearDuplicateLLM(llm, self)
+
+    def __repr__(self) -> str:
+        return f"NearDuplicateCache(threshold={self.threshold}, {len(self._entries)} entries)"
+
+
+class NearDuplicateLLM(LLM):
+    """ Wraps an LLM so its generations go through a NearDuplicateCache, the wrapped LLM keeps its retries """
+
+    def __init__(self, llm: LLM, cache: NearDuplicateCache):
+        super().__init__(retry=None)
+        self.llm = llm
+        self.near_cache = cache
+        self.provider = llm.provider
+        self.model_name = getattr(llm, 'model_name', None)
+
+    def _request(self, messages, kwargs, tools=None) -> Tuple[str, str]:
+        ''' (key of everything that has to match exactly, the text that may differ slightly) '''
+        # the wrapped LLM adds its static_generation_kwargs (temperature, ...) to every call, they have to match too
+        scope = dict(provider=self.provider, model=self.model_name, kwargs=kwargs,
+                     static_kwargs=self.llm.static_generation_kwargs,
+                     roles=[message.get('role') for message in messages])
+        if tools is not None:
+            scope['tools'] = [spec.function_name for spec in tools]
+        return ResponseCache.key(scope), '\n'.join(str(message.get('content', '')) for message in messages)
+
+    def _serve(self, call, messages, kwargs, tools=None):
+        scope, text = self._request(messages, kwargs, tools)
+        signature, payload, similarity = self.near_cache.lookup(scope, text)
+        if payload is not None and not self.near_cache.should_audit(similarity):
+            return response_from_payload(payload)
+        fresh = call()
+        if payload is not None:
+            self.near_cache.record_audit(payload, response_payload(fresh))
+        self.near_cache.store(scope, signature, response_payload(fresh))
+        return fresh
+
+    async def _aserve(self, call, messages, kwargs, tools=None):
+        scope, text = self._request(messages, kwargs, tools)
+        signature, payload, similarity = self.near_cache.lookup(scope, text)
+        if payload is not None and not self.near_cache.should_audit(similarity):
+            return response_from_payload(payload)
+        fresh = await call()
+        if payload is not None:
+            self.near_cache.record_audit(payload, response_payload(fresh))
+        self.near_cache.store(scope, signature, response_payload(fresh))
+        return fresh
+
+    def cache_static_prefix(self, prefix: str):
+        self.llm.cache_static_prefix(prefix)
+
+    async def acache_static_prefix(self, prefix: str):
+        await self.llm.acache_static_prefix(prefix)
+
+    def _generate(self, messages, **kwargs):
+        return self._serve(lambda: self.llm.generate(messages, **kwargs), messages, kwargs)
+
+    async def _agenerate(self, messages, **kwargs):
+        return await self._aserve(lambda: self.llm.agenerate(messages, **kwargs), messages, kwargs)
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        return self._serve(lambda: self.llm.generate_with_tools(messages, tools, **kwargs), messages, kwargs, tools)
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        return await self._aserve(lambda: self.llm.agenerate_with_tools(messages, tools, **kwargs), messages, kwargs,
+                                  tools)
+
+    def _stream(self, messages, **kwargs):
+        # a hit is yielded as one chunk, a miss is streamed from the wrapped LLM and stored if it runs to the end
+        scope, text = self._request(messages, kwargs)
+        signature, payload, _ = self.near_cache.lookup(scope, text)
+        if payload is not None:
+            yield response_from_payload(payload)
+            return
+        chunks = []
+        wrapped_stream = self.llm.stream(messages, **kwargs)
+        try:
+            for chunk in wrapped_stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            wrapped_stream.close()
+        self.near_cache.store(scope, signature, response_payload(''.join(chunks)))
+
+    async def _astream(self, messages, **kwargs):
+        scope, text = self._request(messages, kwargs)
+        signature, payload, _ = self.near_cache.lookup(scope, text)
+        if payload is not None:
+            yield response_from_payload(payload)
+            return
+        chunks = []
+        wrapped_stream = self.llm.astream(messages, **kwargs)
+        try:
+            async for chunk in wrapped_stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await wrapped_stream.aclose()
+        self.near_cache.store(scope, signature, response_payload(''.join(chunks)))
@@ -1,6 +1,10 @@
 from .base_llm import LLM
+from .clients import ClientRegistry, client_registry
+from .response import LLMResponse
 
 class OllamaLLM(LLM):
+    provider = 'ollama'
+
     def __init__(self, model_name="llama3.2", **kwargs):
         try:
             import ollama
@@ -10,6 +14,30 @@ class OllamaLLM(LLM):
         self.model_name = model_name
         super().__init__(**kwargs)
 
+    @property
+    def async_client(self):
+        return client_registry().get_async(ClientRegistry.key('ollama'), self.client.AsyncClient)
+
+    @staticmethod
+    def _response(response) -> LLMResponse:
+        return LLMResponse(response['message']['content'], prompt_tokens=response.get('prompt_eval_count'),
+                           completion_tokens=response.get('eval_count'), finish_reason=response.get('done_reason'))
+
     def _generate(self, messages, **kwargs):
         response = self.client.chat(model=self.model_name, messages=messages, options=kwargs)
-        return response['message']['content']
+        return self._response(response)
+
+    async def _agenerate(self, messages, **kwargs):
+        response = await self.async_client.chat(model=self.model_name, messages=messages, options=kwargs)
+        return self._response(response)
+
+    def _stream(self, messages, **kwargs):
+        for chunk in self.client.chat(model=self.model_name, messages=messages, options=kwargs, stream=True):
+            if chunk['message']['content']:
+                yield chunk['message']['content']
+
+    async def _astream(self, messages, **kwargs):
+        response = await self.async_client.chat(model=self.model_name, messages=messages, options=kwargs, stream=True)
+        async for chunk in response:
+            if chunk['message']['content']:
+                yield chunk['message']['content']
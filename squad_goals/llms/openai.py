@@ -1,9 +1,19 @@
+import json
 import os
 
 from .base_llm import LLM
+from .clients import ClientRegistry, client_registry
+from .response import LLMResponse
+from ..utils import extract_json_from_string
 
 
 class OpenAILLM(LLM):
+    provider = 'openai'
+
+    # OpenAI-compatible providers (Groq, DeepSeek, OpenRouter) override these two
+    api_key_env_var = "OPENAI_API_KEY"
+    base_url = None
+
     def __init__(self, model_name='gpt-4o', api_key=None, **kwargs):
         try:
             from openai import OpenAI
@@ -11,16 +21,113 @@ class OpenAILLM(LLM):
             raise ImportError('Please install openai with "pip install openai"')
 
         if not api_key:
-            api_key = os.getenv("OPENAI_API_KEY")
+            api_key = os.getenv(self.api_key_env_var)
         if not api_key:
             raise ValueError("API key is required")
         self.model_name = model_name
-        self.openai = OpenAI(api_key=api_key)
+        self._api_key = api_key
         super().__init__(**kwargs)
+        options = self._sdk_client_options()
+        # shared with every other LLM using the same endpoint, key and options, see ClientRegistry
+        self.openai = client_registry().get(ClientRegistry.key('openai', self.base_url, api_key, **options),
+                                            lambda: OpenAI(api_key=api_key, base_url=self.base_url, **options))
+
+    @property
+    def async_openai(self):
+        # created on first use so sync-only callers never open an async connection pool, one per event loop
+        from openai import AsyncOpenAI
+        options = self._sdk_client_options()
+        return client_registry().get_async(
+            ClientRegistry.key('openai', self.base_url, self._api_key, **options),
+            lambda: AsyncOpenAI(api_key=self._api_key, base_url=self.base_url, **options))
+
+    @staticmethod
+    def _response(response, text=None) -> LLMResponse:
+        choice, usage = response.choices[0], getattr(response, 'usage', None)
+        return LLMResponse(choice.message.content if text is None else text,
+                           prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                           completion_tokens=getattr(usage, 'completion_tokens', None),
+                           finish_reason=getattr(choice, 'finish_reason', None),
+                           model=getattr(response, 'model', None))
 
     def _generate(self, messages, **kwargs):
-        return self.openai.chat.completions.create(
+        return self._response(self.openai.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            **kwargs
+        ))
+
+    async def _agenerate(self, messages, **kwargs):
+        response = await self.async_openai.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            **kwargs
+        )
+        return self._response(response)
+
+    def _stream(self, messages, **kwargs):
+        response = self.openai.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            stream=True,
+            **kwargs
+        )
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()  # closing the connection stops the generation if we bail out early
+
+    async def _astream(self, messages, **kwargs):
+        response = await self.async_openai.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            stream=True,
+            **kwargs
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+    @staticmethod
+    def _tool_schemas(tools):
+        return [{
+            'type': 'function',
+            'function': {'name': spec.function_name, 'description': spec.function_description,
+                         'parameters': spec.parameters}
+        } for spec in tools]
+
+    @staticmethod
+    def _parse_tool_calls(message):
+        tool_calls = []
+        for call in message.tool_calls or []:
+            try:
+                arguments = json.loads(call.function.arguments or '{}')
+            except json.JSONDecodeError:  # models occasionally emit slightly broken JSON
+                arguments = extract_json_from_string(call.function.arguments)
+            tool_calls.append(dict(name=call.function.name, arguments=arguments))
+        return message.content or '', tool_calls
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        response = self.openai.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            tools=self._tool_schemas(tools),
+            **kwargs
+        )
+        text, tool_calls = self._parse_tool_calls(response.choices[0].message)
+        return self._response(response, text), tool_calls
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        response = await self.async_openai.chat.completions.create(
             model=self.model_name,
             messages=messages,
+            tools=self._tool_schemas(tools),
             **kwargs
-        ).choices[0].message.content
+        )
+        text, tool_calls = self._parse_tool_calls(response.choices[0].message)
+        return self._response(response, text), tool_calls
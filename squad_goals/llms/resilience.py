@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import email.utils
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Sequence
+
+# request timeout, conflict, too early, rate limited, server errors and Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+
+# hedged calls run on worker threads so the caller can wait on the first and the duplicate at once
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    ''' the HTTP status of a provider error, wherever the SDK keeps it (openai / anthropic / httpx / requests / google) '''
+    response = getattr(error, 'response', None)
+    for code in (getattr(error, 'status_code', None), getattr(error, 'status', None),
+                 getattr(response, 'status_code', None), getattr(error, 'code', None)):
+        if isinstance(code, int) and not isinstance(code, bool):
+            return code
+    return None
+
+
+def retry_after(error: Optional[BaseException]) -> Optional[float]:
+    ''' seconds the provider asked us to wait (Retry-After / retry-after-ms headers or a retry_after attribute) '''
+    if error is None:
+        return None
+    if isinstance(getattr(error, 'retry_after', None), (int, float)):
+        return float(error.retry_after)
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get('retry-after-ms') or headers.get('Retry-After-Ms')
+        if milliseconds is not None:
+            return float(milliseconds) / 1000
+        value = headers.get('retry-after') or headers.get('Retry-After')
+    except AttributeError:  # headers that are not a mapping
+        return None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.)
+    except ValueError:  # an HTTP date
+        try:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.)
+        except (TypeError, ValueError):
+            return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    ''' rate limits, server errors, timeouts and dropped connections, not bad requests or auth errors '''
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__  # e.g. openai.APIConnectionError, httpx.ReadTimeout, requests.ConnectionError
+    return 'Timeout' in name or 'Connection' in name
+
+
+class RetryPolicy:
+    """
+    How LLM calls are retried: up to `max_attempts` calls in total for errors `retry_on` accepts, waiting with
+    exponential backoff and full jitter (a random wait between 0 and base_delay * multiplier ** retry) or as long as
+    the provider's Retry-After header says, never more than max_delay.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 multiplier: float = 2.0, jitter: bool = True,
+                 retry_on: Callable[[BaseException], bool] = is_retryable):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def should_retry(self, error: BaseException, attempt: int) -> bool:
+        ''' `attempt` is the number of calls made so far '''
+        return attempt < self.max_attempts and self.retry_on(error)
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        backoff = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+    def __repr__(self) -> str:
+        return f"RetryPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, max_delay={self.max_delay})"
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate of a slow call and take whichever finishes first: after `after` seconds, or once
+    `min_samples` calls have been seen, after the `quantile` latency of the last `window` calls (p95 by default).
+    The slower duplicate is cancelled where the client allows it (async), otherwise its result is dropped.
+    """
+
+    def __init__(self, after: Optional[float] = None, quantile: float = 0.95, min_samples: int = 20,
+                 window: int = 200):
+        self.after = after
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+
+    def threshold(self, latencies: Sequence[float]) -> Optional[float]:
+        ''' seconds to wait before hedging, None to not hedge (yet) '''
+        if self.after is not None:
+            return self.after
+        if len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[max(math.ceil(self.quantile * len(ordered)) - 1, 0)]
+
+    def __repr__(self) -> str:
+        return f"HedgePolicy(after={self.after}, quantile={self.quantile})"
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:  # concurrent first hedged calls (e.g. an AgentPool) must not each build a pool
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='squad_goals_hedge')
+    return _hedge_executor
+
+
+def call_hedged(call: Callable, threshold: float):
+    '''
+    runs call() and, if it has not finished after `threshold` seconds, a duplicate of it.
+    Returns (result, hedged, hedge_won), raising only if both fail
+    '''
+    executor = _executor()
+    # every call runs in its own copy of the caller's context so spans nest under the caller's
+    first = executor.submit(contextvars.copy_context().run, call)
+    done, _ = wait([first], timeout=threshold)
+    if done:
+        return first.result(), False, False
+    second = executor.submit(contextvars.copy_context().run, call)
+    pending, error = {first, second}, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result(), True, future is second
+            error = future.exception()
+    raise error
+
+
+async def acall_hedged(call: Callable, threshold: float):
+    ''' async counterpart of call_hedged, `call` returns a coroutine and the call that loses is cancelled '''
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=threshold)
+        if done:
+            return tasks[0].result(), False, False
+        tasks.append(asyncio.ensure_future(call()))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True, task is tasks[1]
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()  # does nothing to finished tasks
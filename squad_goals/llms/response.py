@@ -0,0 +1,59 @@
+from typing import Optional
+
+
+class LLMResponse(str):
+    """
+    The text of a generation together with the metadata the provider sent back with it. It is a str, so callers
+    that treat generations as plain text keep working, e.g.
+
+    response = llm.generate(messages)
+    response.upper(), response.prompt_tokens, response.completion_tokens, response.finish_reason, response.latency
+
+    Fields a provider does not report are None.
+    """
+
+    def __new__(cls, text: Optional[str], prompt_tokens: Optional[int] = None,
+                completion_tokens: Optional[int] = None, finish_reason: Optional[str] = None,
+                latency: Optional[float] = None, model: Optional[str] = None, cached: bool = False):
+        response = super().__new__(cls, text or '')
+        response.prompt_tokens = prompt_tokens
+        response.completion_tokens = completion_tokens
+        response.finish_reason = finish_reason
+        response.latency = latency  # wall-clock seconds of the provider call, set by LLM.generate
+        response.model = model
+        response.cached = cached  # served from a ResponseCache, the tokens were spent by an earlier call
+        return response
+
+    @classmethod
+    def of(cls, value) -> 'LLMResponse':
+        ''' wraps a plain string from a provider without metadata, LLMResponses are returned as they are '''
+        return value if isinstance(value, cls) else cls(value)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LLMResponse':
+        return cls(data['text'], prompt_tokens=data.get('prompt_tokens'), completion_tokens=data.get('completion_tokens'),
+                   finish_reason=data.get('finish_reason'), model=data.get('model'))
+
+    def as_dict(self) -> dict:
+        ''' the JSON-serializable text and metadata, without the per-call latency '''
+        return dict(text=self.text, prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens,
+                    finish_reason=self.finish_reason, model=self.model)
+
+    @property
+    def text(self) -> str:
+        return str.__str__(self)
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        if self.prompt_tokens is None and self.completion_tokens is None:
+            return None
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+    @property
+    def usage(self) -> dict:
+        return dict(prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens,
+                    total_tokens=self.total_tokens, finish_reason=self.finish_reason, latency=self.latency)
+
+    def __reduce__(self):
+        return LLMResponse, (self.text, self.prompt_tokens, self.completion_tokens, self.finish_reason, self.latency,
+                             self.model, self.cached)
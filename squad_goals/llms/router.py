@@ -0,0 +1,244 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .base_llm import LLM
+from .resilience import is_retryable
+from ..tracing import current_span
+
+
+class BackendStats:
+    """ Live health of one backend: exponentially weighted moving averages of its latency and error rate """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.latency: Optional[float] = None  # EWMA of successful call latency in seconds, None until one succeeds
+        self.error_rate = 0.
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return dict(calls=self.calls, errors=self.errors, latency=self.latency, error_rate=round(self.error_rate, 4),
+                    healthy=self.healthy(now), cooldown=max(self.unhealthy_until - now, 0.))
+
+
+class AllBackendsFailed(Exception):
+    """ Every backend of a RouterLLM failed the request, `errors` maps backend names to their errors """
+
+    def __init__(self, errors: Dict[str, Exception]):
+        super().__init__("All backends failed: " + ', '.join(f"{name}: {error!r}" for name, error in errors.items()))
+        self.errors = errors
+
+
+class RouterLLM(LLM):
+    """
+    An LLM over several providers that sends each request to the fastest healthy one and fails over to the next on
+    errors, e.g.
+
+    llm = RouterLLM([GroqLLM(), OpenAILLM('gpt-4o-mini'), AnthropicLLM()])
+    agent = Agent(llm=llm, tools=tools)
+    llm.routing_stats()  # calls, errors, latency and error rate EWMAs and health of every backend
+
+    Backends are ranked by their latency EWMA, inflated by their error rate EWMA. Backends that have not answered yet
+    go first so every backend gets measured, and `explore` is the share of requests sent to a random healthy backend
+    to keep the others' numbers fresh. After `failure_threshold` failures in a row a backend sits out `cooldown`
+    seconds, and is only tried after the healthy ones until then. Streams fail over only before their first chunk.
+    Only errors `fail_over_on` accepts (rate limits, server errors, timeouts) fail over and count against a backend,
+    others (bad requests, auth errors, bad arguments) are raised right away instead of cooling down every backend.
+
+    Each backend keeps its own retry policy, pass backends with retry=None to fail over without retrying first.
+    An AgentPool limits a router as the single provider 'router', its `provider_limits` for the backends' providers do
+    not apply to the requests the router sends them.
+
+    :param alpha: weight of the newest sample in the moving averages
+    :param error_penalty: how much a 100% error rate multiplies a backend's latency when ranking
+    """
+    provider = 'router'
+
+    def __init__(self, backends: List[LLM], alpha: float = 0.3, error_penalty: float = 4.0,
+                 failure_threshold: int = 2, cooldown: float = 30.0, explore: float = 0.05,
+                 fail_over_on: Callable[[BaseException], bool] = is_retryable, **kwargs):
+        if not backends:
+            raise ValueError("RouterLLM needs at least one backend")
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.explore = explore
+        self.fail_over_on = fail_over_on
+        self.model_name = None
+        names = [f"{backend.provider}:{getattr(backend, 'model_name', None) or type(backend).__name__}"
+                 for backend in self.backends]
+        # the same provider and model twice (e.g. two API keys) get numbered names
+        self.stats = [BackendStats(name if names.count(name) == 1 else f"{name}#{i}") for i, name in enumerate(names)]
+        self._lock = threading.Lock()
+        kwargs.setdefault('retry', None)  # failing over is the router's retry
+        super().__init__(**kwargs)
+
+    def _score(self, stats: BackendStats) -> float:
+        return (stats.latency or 0.) * (1 + self.error_penalty * stats.error_rate)
+
+    def _order(self, explore: bool = True) -> List[int]:
+        ''' indices of the backends in the order to try them '''
+        now = time.monotonic()
+        with self._lock:
+            healthy = sorted((i for i, stats in enumerate(self.stats) if stats.healthy(now)),
+                             key=lambda i: self._score(self.stats[i]))
+            cooling = sorted((i for i, stats in enumerate(self.stats) if not stats.healthy(now)),
+                             key=lambda i: self.stats[i].unhealthy_until)
+        if explore and len(healthy) > 1 and random.random() < self.explore:
+            healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+        return healthy + cooling
+
+    def _succeeded(self, index: int, latency: float):
+        with self._lock:
+            stats = self.stats[index]
+            stats.calls += 1
+            if stats.latency is not None:
+                latency = self.alpha * latency + (1 - self.alpha) * stats.latency
+            stats.latency = latency
+            stats.error_rate *= 1 - self.alpha
+            stats.consecutive_failures = 0
+            stats.unhealthy_until = 0.
+
+    def _failed(self, index: int):
+        with self._lock:
+            stats = self.stats[index]
+            stats.calls += 1
+            stats.errors += 1
+            stats.error_rate = self.alpha + (1 - self.alpha) * stats.error_rate
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.unhealthy_until = time.monotonic() + self.cooldown
+
+    def _routed(self, index: int, failovers: int):
+        active = current_span()
+        if active is not None:
+            active.set_attributes(backend=self.stats[index].name, failovers=failovers)
+
+    def _route(self, method: str, *args, **kwargs):
+        errors = {}
+        for index in self._order():
+            start = time.perf_counter()
+            try:
+                result = getattr(self.backends[index], method)(*args, **kwargs)
+            except Exception as e:
+                if not self.fail_over_on(e):
+                    raise
+                self._failed(index)
+                errors[self.stats[index].name] = e
+                continue
+            self._succeeded(index, time.perf_counter() - start)
+            self._routed(index, len(errors))
+            return result
+        raise AllBackendsFailed(errors)
+
+    async def _aroute(self, method: str, *args, **kwargs):
+        errors = {}
+        for index in self._order():
+            start = time.perf_counter()
+            try:
+                result = await getattr(self.backends[index], method)(*args, **kwargs)
+            except Exception as e:
+                if not self.fail_over_on(e):
+                    raise
+                self._failed(index)
+                errors[self.stats[index].name] = e
+                continue
+            self._succeeded(index, time.perf_counter() - start)
+            self._routed(index, len(errors))
+            return result
+        raise AllBackendsFailed(errors)
+
+    def cache_static_prefix(self, prefix: str):
+        for backend in self.backends:
+            backend.cache_static_prefix(prefix)
+
+    async def acache_static_prefix(self, prefix: str):
+        await asyncio.gather(*(backend.acache_static_prefix(prefix) for backend in self.backends))
+
+    def _generate(self, messages, **kwargs):
+        return self._route('generate', messages, **kwargs)
+
+    async def _agenerate(self, messages, **kwargs):
+        return await self._aroute('agenerate', messages, **kwargs)
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        return self._route('generate_with_tools', messages, tools, **kwargs)
+
+    async def _agenerate_with_tools(self, messages, tools, **kwargs):
+        return await self._aroute('agenerate_with_tools', messages, tools, **kwargs)
+
+    def _stream(self, messages, **kwargs):
+        errors = {}
+        for index in self._order():
+            start, started = time.perf_counter(), False
+            backend_stream = self.backends[index].stream(messages, **kwargs)
+            try:
+                for chunk in backend_stream:
+                    started = True
+                    yield chunk
+            except GeneratorExit:  # closed by the caller once it had what it needed, which counts as a success
+                self._succeeded(index, time.perf_counter() - start)
+                self._routed(index, len(errors))
+                raise
+            except Exception as e:
+                if not self.fail_over_on(e):
+                    raise
+                self._failed(index)
+                if started:
+                    raise
+                errors[self.stats[index].name] = e
+                continue
+            finally:
+                backend_stream.close()
+            self._succeeded(index, time.perf_counter() - start)
+            self._routed(index, len(errors))
+            return
+        raise AllBackendsFailed(errors)
+
+    async def _astream(self, messages, **kwargs):
+        errors = {}
+        for index in self._order():
+            start, started = time.perf_counter(), False
+            backend_stream = self.backends[index].astream(messages, **kwargs)
+            try:
+                async for chunk in backend_stream:
+                    started = True
+                    yield chunk
+            except GeneratorExit:  # closed by the caller once it had what it needed, which counts as a success
+                self._succeeded(index, time.perf_counter() - start)
+                self._routed(index, len(errors))
+                raise
+            except Exception as e:
+                if not self.fail_over_on(e):
+                    raise
+                self._failed(index)
+                if started:
+                    raise
+                errors[self.stats[index].name] = e
+                continue
+            finally:
+                await backend_stream.aclose()
+            self._succeeded(index, time.perf_counter() - start)
+            self._routed(index, len(errors))
+            return
+        raise AllBackendsFailed(errors)
+
+    def routing_stats(self) -> Dict[str, Dict[str, Any]]:
+        ''' {backend name: calls, errors, latency, error_rate, healthy, cooldown} in the order requests would go now '''
+        now = time.monotonic()
+        with self._lock:
+            stats = {stats.name: stats.as_dict(now) for stats in self.stats}
+        return {self.stats[i].name: stats[self.stats[i].name] for i in self._order(explore=False)}
+
+    def __repr__(self) -> str:
+        return f"RouterLLM({', '.join(stats.name for stats in self.stats)})"
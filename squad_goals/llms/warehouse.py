@@ -0,0 +1,265 @@
+import atexit
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .resilience import RetryPolicy
+
+# the writer retries a failed batch with backoff whatever the error, the sink is usually just unreachable for a bit
+WRITE_RETRY = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=10.0, retry_on=lambda error: True)
+
+_shared_loggers: Dict[str, 'PromptLogger'] = {}
+_shared_loggers_lock = threading.Lock()
+
+
+class PromptSink:
+    """ Where a PromptLogger writes batches of prompt records ({'prompt', 'response', 'inference_params', 'model'}) """
+
+    def write(self, records: List[Dict[str, Any]]):
+        raise NotImplementedError("write method must be implemented in subclass")
+
+    def close(self):
+        pass
+
+
+class InMemorySink(PromptSink):
+    """ Keeps the records in a list, for tests """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict[str, Any]]):
+        with self._lock:
+            self.records.extend(records)
+            self.batches += 1
+
+
+class JSONLSink(PromptSink):
+    """ Appends the records to a local file, one JSON object per line """
+
+    def __init__(self, path: str = 'squad_goals_prompts.jsonl'):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, records: List[Dict[str, Any]]):
+        lines = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(lines)
+
+    def __repr__(self) -> str:
+        return f"JSONLSink({self.path})"
+
+
+class SQLiteSink(PromptSink):
+    """ Inserts the records into a table of a local SQLite file, one transaction per batch """
+
+    def __init__(self, path: str = 'squad_goals_prompts.db', table: str = 'prompt_logs'):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            if path != ':memory:':
+                self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                                     'id INTEGER PRIMARY KEY AUTOINCREMENT, logged_at REAL NOT NULL, model TEXT, '
+                                     'prompt TEXT, response TEXT, inference_params TEXT)')
+
+    def write(self, records: List[Dict[str, Any]]):
+        now = time.time()
+        rows = [(now, record.get('model'), record.get('prompt'), str(record.get('response')),
+                 json.dumps(record.get('inference_params'), default=str)) for record in records]
+        with self._lock, self._connection:
+            self._connection.executemany(f'INSERT INTO {self.table} (logged_at, model, prompt, response, '
+                                         'inference_params) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __repr__(self) -> str:
+        return f"SQLiteSink({self.path}, table={self.table})"
+
+
+class SupabaseSink(PromptSink):
+    """
+    Inserts the records into a Supabase table with one request per batch. The url, key and table default to the
+    SUPABASE_URL, SUPABASE_KEY and SUPABASE_TABLE (or 'cost_projecting') environment variables.
+    """
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, table: Optional[str] = None):
+        url = url or os.environ.get('SUPABASE_URL')
+        key = key or os.environ.get('SUPABASE_KEY')
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables must be set")
+        try:
+            from supabase import create_client
+        except ImportError:
+            raise ImportError("Please install supabase with `pip install supabase`")
+        self.table = table or os.environ.get('SUPABASE_TABLE', 'cost_projecting')
+        self.client = create_client(url, key)
+
+    def write(self, records: List[Dict[str, Any]]):
+        self.client.table(self.table).insert(records).execute()
+
+    def __repr__(self) -> str:
+        return f"SupabaseSink(table={self.table})"
+
+
+class PromptLogger:
+    """
+    Writes prompt records to a sink from a background thread, so logging never waits on the network, e.g.
+
+    OpenAILLM(warehouse=PromptLogger(SQLiteSink('prompts.db'), sample_rate=0.1))
+
+    log() only queues the record. The writer sends a batch once `batch_size` records are waiting or the oldest has
+    waited `flush_interval` seconds, and retries a failed batch with `retry` before dropping it (counted in
+    stats()['failed']). When more than `max_queue` records are waiting, new ones are dropped instead of blocking the
+    caller. `sample_rate` keeps a random share of the records, `sample(record)`, if given, decides instead.
+    Waiting records are written when the process exits, or on flush() / close().
+    """
+
+    def __init__(self, sink: PromptSink, batch_size: int = 50, flush_interval: float = 1.0, max_queue: int = 10000,
+                 sample_rate: float = 1.0, sample: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 retry: Optional[RetryPolicy] = WRITE_RETRY):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.sample = sample
+        self.retry = retry
+        self.last_error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._counters = dict(logged=0, sampled_out=0, dropped=0, written=0, failed=0, batches=0, retries=0)
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='squad_goals-prompt-logger', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        ''' queues the record unless it is sampled out, the queue is full or the logger is closed '''
+        if self.sample is not None and not self.sample(record) or \
+                self.sample is None and self.sample_rate < 1. and random.random() >= self.sample_rate:
+            self._count('sampled_out')
+            return False
+        if self._closed:
+            self._count('dropped')
+            return False
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('logged')
+        return True
+
+    def _run(self):
+        # the queue holds records, threading.Events to set once everything before them is written, and None to stop
+        batch, deadline = [], None
+        while True:
+            timeout = None if deadline is None else max(0., deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()  # the oldest record waited flush_interval
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch, deadline = [], None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.sink.write(batch)
+            except Exception as e:
+                self.last_error = e
+                if self.retry is None or not self.retry.should_retry(e, attempt) or self._closed:
+                    self._count('failed', len(batch))
+                    return
+                self._count('retries')
+                time.sleep(self.retry.delay(attempt, e))
+                continue
+            with self._lock:
+                self._counters['written'] += len(batch)
+                self._counters['batches'] += 1
+            return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        ''' waits until the records logged so far are written (or dropped), returns False on timeout '''
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        written = threading.Event()
+        self._queue.put(written)
+        return written.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        ''' writes the waiting records (no more retries) and stops the writer, later logs are dropped '''
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+            atexit.unregister(self.close)
+        self.sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        '''
+        records logged (queued), sampled_out, dropped (queue full or closed), written and failed (after retries),
+        batches written, retries of failed batches and the records still queued
+        '''
+        with self._lock:
+            return dict(self._counters, queued=self._queue.qsize())
+
+    def __repr__(self) -> str:
+        return f"PromptLogger({self.sink!r}, batch_size={self.batch_size}, sample_rate={self.sample_rate})"
+
+
+def prompt_logger(warehouse) -> PromptLogger:
+    '''
+    the PromptLogger for an LLM's `warehouse`: a PromptLogger as is, a PromptSink in a PromptLogger of its own, and
+    'supabase', 'jsonl' or 'sqlite' in a process-wide PromptLogger writing to that sink with its defaults
+    '''
+    if isinstance(warehouse, PromptLogger):
+        return warehouse
+    if isinstance(warehouse, PromptSink):
+        return PromptLogger(warehouse)
+    sinks = dict(supabase=SupabaseSink, jsonl=JSONLSink, sqlite=SQLiteSink)
+    if warehouse not in sinks:
+        raise ValueError(f"Unknown warehouse {warehouse!r}, use one of {list(sinks)}, a PromptSink or a PromptLogger")
+    with _shared_loggers_lock:
+        if warehouse not in _shared_loggers:
+            _shared_loggers[warehouse] = PromptLogger(sinks[warehouse]())
+        return _shared_loggers[warehouse]
@@ -0,0 +1,240 @@
+import asyncio
+import math
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from .task import Task
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    ''' nearest-rank percentile, e.g. percentile(latencies, 95) '''
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(max(math.ceil(q / 100 * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+class ConcurrencyLimits:
+    """
+    Named concurrency limits shared by every run in an AgentPool: LLM calls are limited per provider
+    (`LLM.provider`, e.g. {'openai': 8, 'anthropic': 4}) and tool runs per tool name
+    (e.g. {'Google Search Tool': 2}). Names without a limit are not restricted.
+    """
+
+    def __init__(self, provider_limits: Optional[Dict[str, int]] = None,
+                 tool_limits: Optional[Dict[str, int]] = None):
+        self.provider_limits = dict(provider_limits or {})
+        self.tool_limits = dict(tool_limits or {})
+        self._semaphores = {
+            **{('provider', name): threading.BoundedSemaphore(n) for name, n in self.provider_limits.items()},
+            **{('tool', name): threading.BoundedSemaphore(n) for name, n in self.tool_limits.items()},
+        }
+        # asyncio semaphores belong to an event loop, so they are created per loop on first use
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def _limit(self, kind: str, name: str) -> Optional[int]:
+        return (self.provider_limits if kind == 'provider' else self.tool_limits).get(name)
+
+    @contextmanager
+    def _hold(self, kind: str, name: str):
+        semaphore = self._semaphores.get((kind, name))
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    @asynccontextmanager
+    async def _ahold(self, kind: str, name: str):
+        limit = self._limit(kind, name)
+        if limit is None:
+            yield
+            return
+        semaphores = self._async_semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.setdefault((kind, name), asyncio.Semaphore(limit))
+        async with semaphore:
+            yield
+
+    def llm(self, llm):
+        return self._hold('provider', llm.provider)
+
+    def allm(self, llm):
+        return self._ahold('provider', llm.provider)
+
+    def tool(self, name: str):
+        return self._hold('tool', name)
+
+    def atool(self, name: str):
+        return self._ahold('tool', name)
+
+
+class BatchResult:
+    """ The outcome of one task in a batch: its events from Agent.run, any exception it raised and its latency """
+
+    def __init__(self, task: Task, events: List[dict], latency: float, error: Optional[Exception] = None):
+        self.task = task
+        self.events = events
+        self.latency = latency  # seconds from the start of this task's run to its last event
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and self.task.succeeded
+
+    def __repr__(self) -> str:
+        return f"BatchResult({self.task.name[:50]}, succeeded: {self.succeeded}, latency: {self.latency:.3f}s)"
+
+
+class BatchStats:
+    """ Running throughput and latency numbers for a batch, updated as each result comes back """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.latencies: List[float] = []
+        self.succeeded = 0
+        self.failed = 0
+
+    def record(self, result: BatchResult):
+        self.latencies.append(result.latency)
+        if result.succeeded:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    @property
+    def completed(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        ''' tasks completed per second '''
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def p50(self) -> Optional[float]:
+        return percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return percentile(self.latencies, 95)
+
+    @property
+    def p99(self) -> Optional[float]:
+        return percentile(self.latencies, 99)
+
+    def as_dict(self) -> dict:
+        return dict(completed=self.completed, succeeded=self.succeeded, failed=self.failed, elapsed=self.elapsed,
+                    throughput=self.throughput, p50=self.p50, p95=self.p95, p99=self.p99)
+
+    def __repr__(self) -> str:
+        if not self.completed:
+            return "BatchStats(no tasks completed)"
+        return (f"BatchStats({self.completed} tasks ({self.failed} failed) in {self.elapsed:.2f}s, "
+                f"{self.throughput:.2f} tasks/s, p50: {self.p50:.3f}s, p95: {self.p95:.3f}s, p99: {self.p99:.3f}s)")
+
+
+class AgentPool:
+    """
+    Runs many tasks through one (reentrant) Agent concurrently and yields a BatchResult per task in completion
+    order. `max_concurrency` bounds the tasks in flight, `provider_limits` / `tool_limits` bound the LLM calls per
+    provider and the runs per tool across all of them. Tasks are pulled from the iterable lazily, so it can be a
+    generator over thousands of tasks. Throughput and tail latency of the current batch are kept on `stats`.
+    Limits apply to the agent's llm.provider: an agent on a RouterLLM is limited as 'router', the limits of the
+    providers it routes to do not apply.
+
+    e.g.
+    pool = AgentPool(agent, max_concurrency=16, provider_limits={'openai': 8}, tool_limits={'Google Search Tool': 2})
+    for result in pool.run_many(tasks):
+        ...
+    print(pool.stats)
+    """
+
+    def __init__(self, agent, max_concurrency: int = 8, provider_limits: Optional[Dict[str, int]] = None,
+                 tool_limits: Optional[Dict[str, int]] = None):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.limits = ConcurrencyLimits(provider_limits, tool_limits)
+        self.stats = BatchStats()
+
+    def _run_one(self, task: Task) -> BatchResult:
+        session = self.agent.new_session(task)
+        session.limits = self.limits
+        start = time.perf_counter()
+        try:
+            events = self.agent.run(task, session=session)
+        except Exception as e:
+            return BatchResult(task, [], time.perf_counter() - start, error=e)
+        return BatchResult(task, events, time.perf_counter() - start)
+
+    async def _arun_one(self, task: Task) -> BatchResult:
+        session = self.agent.new_session(task)
+        session.limits = self.limits
+        start = time.perf_counter()
+        events = []
+        try:
+            async for event in self.agent.arun(task, session=session):
+                events.append(event)
+        except Exception as e:
+            return BatchResult(task, events, time.perf_counter() - start, error=e)
+        return BatchResult(task, events, time.perf_counter() - start)
+
+    def run_many(self, tasks: Iterable[Task]) -> Iterator[BatchResult]:
+        self.stats = BatchStats()
+        tasks = iter(tasks)
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        pending = set()
+        try:
+            for task in tasks:
+                pending.add(pool.submit(self._run_one, task))
+                if len(pending) >= self.max_concurrency:
+                    break
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    next_task = next(tasks, None)
+                    if next_task is not None:
+                        pending.add(pool.submit(self._run_one, next_task))
+                    result = future.result()
+                    self.stats.record(result)
+                    yield result
+        finally:
+            # when the caller stopped iterating early the runs not started yet are dropped and the ones in progress
+            # finish in the background, instead of blocking the caller until every pending run is done
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.stats.finished_at = time.perf_counter()
+
+    async def arun_many(self, tasks: Iterable[Task]) -> AsyncIterator[BatchResult]:
+        ''' async counterpart of run_many: the runs share the current event loop instead of a thread pool '''
+        self.stats = BatchStats()
+        tasks = iter(tasks)
+        pending = set()
+        try:
+            for task in tasks:
+                pending.add(asyncio.ensure_future(self._arun_one(task)))
+                if len(pending) >= self.max_concurrency:
+                    break
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    next_task = next(tasks, None)
+                    if next_task is not None:
+                        pending.add(asyncio.ensure_future(self._arun_one(next_task)))
+                    result = future.result()
+                    self.stats.record(result)
+                    yield result
+        finally:
+            for future in pending:  # the caller stopped iterating early
+                future.cancel()
+            self.stats.finished_at = time.perf_counter()
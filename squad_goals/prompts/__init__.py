@@ -1 +1,3 @@
 from .base_prompts import AGENT_PROMPT
+from .builder import CompiledPrompt
+from .context import ContextManager
@@ -0,0 +1,64 @@
+from typing import List, Optional
+
+from .context import ContextManager
+
+SCRATCHPAD_PLACEHOLDER = '{previous_responses}'
+
+
+class CompiledPrompt:
+    """
+    A prompt template rendered once into a static prefix (date, tool descriptions, goal, ...) with the agent's
+    scratchpad appended turn by turn, instead of re-formatting the whole template on every loop.
+
+    The static prefix never changes during a run, so providers can cache it and only send/process the dynamic suffix.
+    """
+
+    def __init__(self, template: str, turns: Optional[List[str]] = None,
+                 context_manager: Optional[ContextManager] = None, **fields):
+        """
+        :param template: a prompt template with a {previous_responses} placeholder for the scratchpad
+        :param turns: scratchpad turns to start from (e.g. responses from an earlier run)
+        :param context_manager: keeps the rendered scratchpad inside a token budget, see ContextManager
+        :param fields: values for every other placeholder in the template
+        """
+        head, placeholder, tail = template.partition(SCRATCHPAD_PLACEHOLDER)
+        self.static_prefix = head.format(**fields)
+        self._tail = tail.format(**fields) if placeholder else ''
+        self._has_scratchpad = bool(placeholder)  # templates without one never render the turns
+        self.turns = []  # every turn, verbatim
+        self._scratchpad = ''
+        self.context_manager = context_manager
+        if context_manager:
+            self._budget = context_manager.max_tokens - context_manager.count_tokens(self.static_prefix + self._tail)
+            self._fitted_turns = []  # turns as they are rendered (observations truncated)
+            self._fitted_tokens = 0
+            self._compacting = False  # once over budget the scratchpad is re-fitted on every append
+        for turn in turns or []:
+            self.append(turn)
+
+    def append(self, turn: str):
+        ''' add a new turn to the scratchpad without touching the rendered prefix '''
+        first_turn = not self.turns
+        self.turns.append(turn)
+        if self.context_manager:
+            turn = self.context_manager.fit_turn(turn)
+            self._fitted_turns.append(turn)
+            self._fitted_tokens += self.context_manager.count_tokens(turn) + 1
+            if self._compacting or self._fitted_tokens > self._budget:
+                self._compacting = True
+                self._scratchpad = '\n'.join(self.context_manager.fit(self._fitted_turns, self._budget))
+                return
+        self._scratchpad = turn if first_turn else f'{self._scratchpad}\n{turn}'
+
+    @property
+    def dynamic_suffix(self) -> str:
+        ''' everything after the static prefix: the scratchpad so far and the rest of the template '''
+        if not self._has_scratchpad:
+            return ''
+        return self._scratchpad.strip() + self._tail
+
+    def render(self) -> str:
+        return self.static_prefix + self.dynamic_suffix
+
+    def __str__(self) -> str:
+        return self.render()
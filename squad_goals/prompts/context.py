@@ -0,0 +1,78 @@
+import re
+from typing import Callable, List, Optional
+
+# an observation runs until the next observation, the next thought marker or the end of the turn
+OBSERVATION_PATTERN = re.compile(r'(Observation: (?:\[[^\]\n]*\] )?)(.*?)(?=\nObservation: |\nNext Thought: |\Z)',
+                                 re.DOTALL)
+
+
+class ContextManager:
+    """
+    Keeps the agent scratchpad inside a token budget so prompt size (and latency) stays bounded however many loops
+    a task takes:
+
+    1. every observation is truncated to `max_observation_tokens` as it is recorded
+    2. when the prompt goes over `max_tokens`, observations in older turns are elided down to
+       `compacted_observation_tokens`, oldest first, while the last `keep_recent_turns` turns stay verbatim
+    3. if that is still not enough, the oldest turns are dropped and replaced by a short note
+
+    Tokens are estimated as ~4 characters each unless a `token_counter` (e.g. a tiktoken encoder's
+    `lambda text: len(enc.encode(text))`) is given.
+    """
+
+    def __init__(self, max_tokens: int = 8000, keep_recent_turns: int = 2,
+                 max_observation_tokens: Optional[int] = 2000, compacted_observation_tokens: int = 100,
+                 token_counter: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.max_observation_tokens = max_observation_tokens
+        self.compacted_observation_tokens = compacted_observation_tokens
+        self.token_counter = token_counter
+
+    def count_tokens(self, text: str) -> int:
+        if self.token_counter:
+            return self.token_counter(text)
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        ''' cut text down to roughly max_tokens, noting how much was removed '''
+        tokens = self.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        keep = int(len(text) * max_tokens / tokens)
+        return f"{text[:keep]} ... [{len(text) - keep} characters elided]"
+
+    def _truncate_observations(self, turn: str, max_tokens: int) -> str:
+        return OBSERVATION_PATTERN.sub(lambda match: match.group(1) + self.truncate(match.group(2), max_tokens), turn)
+
+    def fit_turn(self, turn: str) -> str:
+        ''' the turn as it should first appear in the prompt, with oversized observations truncated '''
+        if self.max_observation_tokens is None:
+            return turn
+        return self._truncate_observations(turn, self.max_observation_tokens)
+
+    def compact_turn(self, turn: str) -> str:
+        ''' an older turn with its observations elided to a short preview '''
+        return self._truncate_observations(turn, self.compacted_observation_tokens)
+
+    def fit(self, turns: List[str], budget: int) -> List[str]:
+        ''' the turns to render so that together they use at most `budget` tokens (where possible) '''
+        turns = list(turns)
+        counts = [self.count_tokens(turn) + 1 for turn in turns]  # +1 for the joining newline
+        total = sum(counts)
+        n_old = max(len(turns) - self.keep_recent_turns, 0)
+
+        for i in range(n_old):
+            if total <= budget:
+                return turns
+            turns[i] = self.compact_turn(turns[i])
+            new_count = self.count_tokens(turns[i]) + 1
+            total += new_count - counts[i]
+            counts[i] = new_count
+
+        dropped, note = 0, ''
+        while total + self.count_tokens(note) > budget and dropped < n_old:
+            total -= counts[dropped]
+            dropped += 1
+            note = f"[{dropped} earlier thoughts omitted to save space]"
+        return ([note] if note else []) + turns[dropped:]
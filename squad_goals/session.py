@@ -0,0 +1,109 @@
+import time
+import uuid
+from typing import List, Optional
+
+from .prompts.builder import CompiledPrompt
+from .task import Task
+from .tools.registry import ToolRegistry
+
+
+class RunMetrics:
+    """
+    Where the time of one run went: LLM and tool latency, prompt size and token usage, per call and cumulative.
+    Token counts are only summed for providers that report them, and not for responses served from a cache.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.elapsed = 0.0  # wall-clock seconds of the run so far
+        self.loops = 0
+        self.llm_calls = 0
+        self.llm_cache_hits = 0
+        self.llm_latency = 0.0
+        self.tool_calls = 0
+        self.tool_latency = 0.0
+        self.prompt_chars = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.last_llm_call: dict = {}  # metrics of the most recent LLM call
+
+    def record_llm_call(self, latency: float, prompt_chars: int, response=None) -> dict:
+        ''' `response` is the LLMResponse if there is one (streamed generations have no usage data) '''
+        prompt_tokens = getattr(response, 'prompt_tokens', None)
+        completion_tokens = getattr(response, 'completion_tokens', None)
+        cached = getattr(response, 'cached', False)
+        self.llm_calls += 1
+        self.llm_cache_hits += cached
+        self.llm_latency += latency
+        self.prompt_chars += prompt_chars
+        if not cached:
+            self.prompt_tokens += prompt_tokens or 0
+            self.completion_tokens += completion_tokens or 0
+        self.last_llm_call = dict(llm_latency=latency, prompt_chars=prompt_chars, prompt_tokens=prompt_tokens,
+                                  completion_tokens=completion_tokens,
+                                  finish_reason=getattr(response, 'finish_reason', None), cached=cached)
+        return self.last_llm_call
+
+    def record_tool_call(self, latency: float):
+        self.tool_calls += 1
+        self.tool_latency += latency
+
+    def totals(self) -> dict:
+        self.elapsed = time.perf_counter() - self.started_at
+        return dict(elapsed=self.elapsed, loops=self.loops, llm_calls=self.llm_calls,
+                    llm_cache_hits=self.llm_cache_hits, llm_latency=self.llm_latency,
+                    tool_calls=self.tool_calls, tool_latency=self.tool_latency, prompt_chars=self.prompt_chars,
+                    prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+
+    def __repr__(self) -> str:
+        return (f"RunMetrics({self.loops} loops in {self.elapsed:.2f}s, llm: {self.llm_latency:.2f}s over "
+                f"{self.llm_calls} calls, tools: {self.tool_latency:.2f}s over {self.tool_calls} calls, "
+                f"tokens: {self.prompt_tokens} prompt / {self.completion_tokens} completion)")
+
+
+class AgentSession:
+    """
+    The mutable state of a single Agent.run / Agent.arun: the scratchpad, the loop counter and the bookkeeping lists.
+    The Agent itself only holds configuration (LLM, tools, prompt template, ...), so one configured agent can serve
+    many sessions at once from a thread pool or an event loop without runs leaking into each other.
+    """
+
+    def __init__(self, task: Task, prompt: CompiledPrompt, registry: ToolRegistry, run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex  # Key of this run's checkpoints, pass it to Agent.resume
+        self.task = task
+        self.prompt = prompt  # Compiled prompt holding the scratchpad of this run
+        self.registry = registry  # Tools compiled when the session started
+        self.num_loops = 0  # Loops run so far
+        self.ai_responses: List[str] = list(prompt.turns)  # Responses from the AI (including any starting history)
+        self.errors_encountered: List[Exception] = []  # List of errors encountered
+        self.tools_selected: List[str] = []  # List of tools selected
+        self.tools_used: List[str] = []  # List of tools used
+        self.limits = None  # Optional ConcurrencyLimits shared with other runs (set by AgentPool)
+        self.metrics = RunMetrics()  # Latency, prompt size and token usage of this run
+        self.checkpoints = None  # Optional CheckpointStore saved to after every loop (set by Agent / Workflow)
+        self.tool_cache = None  # ToolCache reusing read-only tool results, at least within this run (set by Agent)
+
+    def record_error(self, error: Exception):
+        self.errors_encountered.append(error)
+
+    def record_turn(self, turn: str):
+        self.ai_responses.append(turn.strip())
+        self.prompt.append(turn)
+
+    def checkpoint_state(self) -> dict:
+        ''' everything needed to continue this run in another process, see Agent.restore_session '''
+        task = self.task
+        return dict(
+            task=dict(name=task.name, goal=task.goal, output_format=task.output_format, raw_output=task.raw_output,
+                      completed=task.completed, succeeded=task.succeeded),
+            num_loops=self.num_loops,
+            ai_responses=list(self.ai_responses),
+            tools_selected=list(self.tools_selected),
+            tools_used=list(self.tools_used),
+            errors=[str(error) for error in self.errors_encountered],
+        )
+
+    def __repr__(self) -> str:
+        return (f"AgentSession({self.task.name[:50]}, loops: {self.num_loops}, tools used: {self.tools_used}, "
+                f"errors: {len(self.errors_encountered)})")
+
@@ -10,6 +10,7 @@ class Task:
         self.output_format = output_format
         self.completed = False
         self.succeeded = False
+        self.metrics = None  # RunMetrics of the latest run on this task (latency, prompt size, token usage)
 
     def __str__(self) -> str:
         return f"{self.name}: {self.goal}"
@@ -1,7 +1,33 @@
-from .api_tool import APITool, ApolloTool
-from .base_tool import BaseTool, ReturnFinalAnswerTool
-from .catfish import ReversePhoneLookupTool
-from .firecrawl import FirecrawlSearchTool
-from .google_sheets import GoogleSpreadsheetTool
-from .python_tool import PythonREPLTool
-from .serp_tool import SerpTool, ReverseImageSearchTool
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+from ..utils.lazy import lazy_exports
+
+# tools are imported on first use, so e.g. PythonREPLTool does not pay for (or need) serpapi or google-api-python-client
+_EXPORTS = {
+    'APITool': 'api_tool',
+    'ApolloTool': 'api_tool',
+    'BaseTool': 'base_tool',
+    'ReturnFinalAnswerTool': 'base_tool',
+    'ToolCache': 'cache',
+    'ReversePhoneLookupTool': 'catfish',
+    'FirecrawlSearchTool': 'firecrawl',
+    'GoogleSpreadsheetTool': 'google_sheets',
+    'PythonREPLTool': 'python_tool',
+    'ToolRegistry': 'registry',
+    'ToolSpec': 'registry',
+    'SerpTool': 'serp_tool',
+    'ReverseImageSearchTool': 'serp_tool',
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from .api_tool import APITool, ApolloTool
+    from .base_tool import BaseTool, ReturnFinalAnswerTool
+    from .cache import ToolCache
+    from .catfish import ReversePhoneLookupTool
+    from .firecrawl import FirecrawlSearchTool
+    from .google_sheets import GoogleSpreadsheetTool
+    from .python_tool import PythonREPLTool
+    from .registry import ToolRegistry, ToolSpec
+    from .serp_tool import SerpTool, ReverseImageSearchTool
@@ -1,9 +1,10 @@
+import hashlib
+import json
 import re
 from copy import copy
 
-import requests
-
 from .base_tool import BaseTool
+from ..utils.http import http_pool
 
 
 class APITool(BaseTool):
@@ -28,9 +29,16 @@ class APITool(BaseTool):
         re_pattern = r'{(\w+)}'
         self.url_variables = re.findall(re_pattern, api_url)
         self.static_kwargs = static_kwargs
+        # another endpoint or account returns other data, the key is hashed so it does not show up in cache keys
+        self.cache_namespace = hashlib.sha256(json.dumps([api_url, api_key, static_kwargs], sort_keys=True,
+                                                         default=str).encode()).hexdigest()[:16]
 
         super().__init__(name, description, **kwargs)
 
+    def is_cacheable(self, tool_input: dict) -> bool:
+        # GET requests only read, anything else may write
+        return self.api_method == 'GET'
+
     def run(self, api_payload: dict = None, **kwargs) -> dict:
         headers = {
             self.api_header_key: f"{self.api_header_value}{self.api_key}"
@@ -47,9 +55,9 @@ class APITool(BaseTool):
 
         # Use api_payload as query parameters for GET requests
         if self.api_method == 'GET' and api_payload:
-            response = requests.get(url_to_use, headers=headers, params=api_payload)
+            response = http_pool().get(url_to_use, headers=headers, params=api_payload)
         else:
-            response = getattr(requests, self.api_method.lower())(url_to_use, headers=headers, json=api_payload)
+            response = http_pool().request(self.api_method, url_to_use, headers=headers, json=api_payload)
 
         return response.json()
 
@@ -64,6 +72,8 @@ class ApolloTool(APITool):
     Tool for interacting with the Apollo.io API.
     Enables operations like searching contacts and managing contact data.
     """
+    read_actions = ("search_contacts", "get_contact")  # cacheable, create_contact and update_contact always run
+    cache_ttl = 3600.0
     
     def __init__(
             self,
@@ -85,6 +95,9 @@ class ApolloTool(APITool):
             **kwargs
         )
     
+    def is_cacheable(self, tool_input: dict) -> bool:
+        return tool_input.get('action', 'search_contacts') in self.read_actions
+
     def super_run(self, **kwargs):
         """Call the parent class run method to avoid recursion"""
         return super().run(**kwargs)
@@ -1,12 +1,17 @@
 # base class for tools
+import asyncio
 import inspect
-import io
 import json
-from contextlib import redirect_stdout
-from typing import Any
+from typing import Any, Optional
 
 
 class BaseTool:
+    # results of read-only tools can be reused, see squad_goals.tools.cache.ToolCache
+    cacheable = False
+    cache_ttl: Optional[float] = None  # seconds a cached result stays fresh, None = the ToolCache's ttl
+    # separates the cached results of same-named tools that read different data (another spreadsheet, account, ...)
+    cache_namespace: Optional[str] = None
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
@@ -14,24 +19,23 @@ class BaseTool:
     def run(self):
         raise NotImplementedError("Method run not implemented")
 
-    def _describe_run(self):
-        # Create an in-memory text stream
-        help_output = io.StringIO()
-
-        # Redirect stdout to the text stream and call help
-        with redirect_stdout(help_output):
-            help(self.run)
-
-        # Get the content of the help output as a string
-        help_string = help_output.getvalue()
-
-        # Close the StringIO object
-        help_output.close()
+    async def arun(self, **kwargs):
+        # tools without a native async implementation run in a worker thread so the event loop stays free
+        return await asyncio.to_thread(self.run, **kwargs)
 
-        # remove the first line of the help string
-        help_string = help_string[help_string.find('\n') + 1:].strip()
+    def is_cacheable(self, tool_input: dict) -> bool:
+        ''' whether this run only reads, so its result can be reused. Tools with write actions decide per action '''
+        return self.cacheable
 
+    def _describe_run(self):
+        # the same text help(self.run) prints, built straight from the signature and docstring
         signature = inspect.signature(self.run)
+        help_string = (f"{self.run.__name__}{signature} method of "
+                       f"{self.__class__.__module__}.{self.__class__.__qualname__} instance")
+        doc = inspect.getdoc(self.run)
+        if doc:
+            help_string += ''.join(f'\n    {line}' for line in doc.split('\n'))
+
         param_dict = {name: param.annotation for name, param in signature.parameters.items()}
         if param_dict:
             help_string += "\nParameters to include in Action Input dictionary:\n"
@@ -42,8 +46,6 @@ class BaseTool:
         else:
             help_string += "\nParameters to include in Action Input dictionary: None\n"
 
-        # get the parameters and construct a sample call
-
         return help_string.strip()
 
 
@@ -64,3 +66,6 @@ class ReturnFinalAnswerTool(BaseTool):
         except:
             pass
         return final_answer
+
+    async def arun(self, final_answer: Any) -> Any:
+        return self.run(final_answer)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from .base_tool import BaseTool
+
+
+def normalize_input(value):
+    ''' tool input with whitespace runs collapsed and None values dropped, so trivially different calls match '''
+    if isinstance(value, dict):
+        return {str(key): normalize_input(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [normalize_input(item) for item in value]
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    return value
+
+
+class ToolCache:
+    """
+    Reuses the results of read-only tool runs, keyed on the tool name, its `cache_namespace` (e.g. the spreadsheet
+    or API account it reads, so same-named tools of agents sharing a cache stay apart) and its normalized input, e.g.
+
+    agent = Agent(llm=llm, tools=[SerpTool(), ApolloTool(api_key)], tool_cache=ToolCache(max_entries=2048))
+
+    Tools opt in with `cacheable` / `is_cacheable(tool_input)` (see BaseTool), so writes such as
+    GoogleSpreadsheetTool's append_to_sheet or ApolloTool's create_contact always run, and clear what the cache holds
+    for that tool instance. Results expire after the tool's `cache_ttl`, or `ttl` if it has none (None = never), the least
+    recently used are dropped beyond `max_entries` results or `max_bytes` of JSON. Identical calls made at the same
+    time share one run. Errors are never cached.
+
+    Every agent run also dedups identical calls within the run with a cache of its own when no ToolCache is given.
+    """
+
+    def __init__(self, ttl: Optional[float] = 3600.0, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._results: 'OrderedDict[Tuple, tuple]' = OrderedDict()  # key -> (expires_at, size, result)
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = dict(hits=0, misses=0, shared=0, bypassed=0, expired=0, evictions=0, invalidations=0)
+
+    @staticmethod
+    def key(tool_name: str, tool_input: Optional[dict], namespace: Optional[str] = None) -> Tuple:
+        return tool_name, namespace, json.dumps(normalize_input(tool_input or {}), sort_keys=True, default=str)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _drop(self, key):
+        # called holding the lock
+        self._bytes -= self._results.pop(key)[1]
+
+    def _join(self, key) -> Tuple[Any, Optional[Future], bool]:
+        ''' (result, flight, hit): a hit, another caller's run to wait on, or (None, None, False) to run it '''
+        now = time.monotonic()
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= now:
+                self._drop(key)
+                self._counters['expired'] += 1
+                entry = None
+            if entry is not None:
+                self._results.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[2], None, True
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self._counters['shared'] += 1
+                return None, flight, False
+            self._counters['misses'] += 1
+            self._in_flight[key] = Future()
+            return None, None, False
+
+    def _land(self, key, tool: BaseTool, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            flight = self._in_flight.pop(key)
+        if error is not None:
+            flight.set_exception(error)
+            return
+        self._store(key, tool, result)
+        flight.set_result(result)
+
+    def _store(self, key, tool: BaseTool, result):
+        try:
+            size = len(json.dumps(result, default=str))
+        except (TypeError, ValueError):  # e.g. circular references
+            size = len(str(result))
+        if size > self.max_bytes:
+            return
+        ttl = tool.cache_ttl if tool.cache_ttl is not None else self.ttl
+        with self._lock:
+            if key in self._results:
+                self._drop(key)
+            self._results[key] = (None if ttl is None else time.monotonic() + ttl, size, result)
+            self._bytes += size
+            while len(self._results) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._results)))
+                self._counters['evictions'] += 1
+
+    def invalidate(self, tool: Union[BaseTool, str]):
+        ''' forgets every cached result of the tool, e.g. after it wrote something. A name forgets every namespace '''
+        if isinstance(tool, str):
+            def matches(key):
+                return key[0] == tool
+        else:
+            def matches(key):
+                return key[:2] == (tool.name, tool.cache_namespace)
+        with self._lock:
+            stale = [key for key in self._results if matches(key)]
+            for key in stale:
+                self._drop(key)
+            self._counters['invalidations'] += len(stale)
+
+    def run(self, tool: BaseTool, tool_input: Optional[dict], call: Callable[[], Any]) -> Tuple[Any, bool]:
+        ''' (result, hit): the cached result of the call if the tool allows it, else the result of call() '''
+        if not tool.is_cacheable(tool_input or {}):
+            self._count('bypassed')
+            try:
+                return call(), False
+            finally:
+                self.invalidate(tool)
+        key = self.key(tool.name, tool_input, tool.cache_namespace)
+        result, flight, hit = self._join(key)
+        if hit:
+            return result, True
+        if flight is not None:
+            return flight.result(), True
+        try:
+            result = call()
+        except BaseException as e:
+            self._land(key, tool, error=e)
+            raise
+        self._land(key, tool, result)
+        return result, False
+
+    async def arun(self, tool: BaseTool, tool_input: Optional[dict],
+                   call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        if not tool.is_cacheable(tool_input or {}):
+            self._count('bypassed')
+            try:
+                return await call(), False
+            finally:
+                self.invalidate(tool)
+        key = self.key(tool.name, tool_input, tool.cache_namespace)
+        result, flight, hit = self._join(key)
+        if hit:
+            return result, True
+        if flight is not None:
+            return await asyncio.wrap_future(flight), True
+        try:
+            result = await call()
+        except BaseException as e:
+            self._land(key, tool, error=e)
+            raise
+        self._land(key, tool, result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        ''' hit / miss counters, `shared` counts calls that waited on an identical run, `bypassed` the writes '''
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._results), bytes=self._bytes)
+        hits = stats['hits'] + stats['shared']
+        stats['hit_rate'] = hits / (hits + stats['misses']) if hits + stats['misses'] else 0.
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __repr__(self) -> str:
+        return f"ToolCache({len(self._results)} results, ttl={self.ttl})"
@@ -1,12 +1,14 @@
 import os
 
-import requests
-
 from .base_tool import BaseTool
+from ..utils.http import http_pool
 
 
 
 class ReversePhoneLookupTool(BaseTool):
+    cacheable = True
+    cache_ttl = 7 * 24 * 3600.0
+
     def __init__(self, **kwargs):
         self.name = "Reverse Phone Lookup Tool"
         self.description = "This tool takes in a phone number and returns information about the owner if available on this service"
@@ -25,6 +27,6 @@ class ReversePhoneLookupTool(BaseTool):
             "x-rapidapi-host": "caller-id-social-search-eyecon.p.rapidapi.com"
         }
 
-        response = requests.get(url, headers=headers, params=querystring)
+        response = http_pool().get(url, headers=headers, params=querystring)
 
         return response.json().get('response')
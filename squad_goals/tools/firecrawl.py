@@ -1,9 +1,8 @@
 import os
 from typing import Optional
 
-import requests
-
 from .base_tool import BaseTool
+from ..utils.http import http_pool
 
 
 def scrape_linkedin(url):
@@ -88,11 +87,13 @@ def scrape_linkedin(url):
         "x-rapidapi-host": "linkedin-data-api.p.rapidapi.com"
     }
 
-    response = requests.get(scrape_url, headers=headers, params=querystring)
+    response = http_pool().get(scrape_url, headers=headers, params=querystring)
     return generate_text_blob(response.json())
 
 
 class FirecrawlSearchTool(BaseTool):
+    cacheable = True
+    cache_ttl = 24 * 3600.0
 
     def __init__(self,
                  name: str = "Firecrawl web search tool",
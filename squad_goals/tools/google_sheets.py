@@ -6,6 +6,10 @@ from .base_tool import BaseTool
 
 
 class GoogleSpreadsheetTool(BaseTool):
+    # cacheable, append_to_sheet and insert_into_cell always run and clear the cached reads
+    read_actions = ("search", "get_data_in_range", "describe")
+    cache_ttl = 60.0
+
     def __init__(
             self,
             spreadsheet_id: str,
@@ -23,6 +27,7 @@ class GoogleSpreadsheetTool(BaseTool):
             raise ImportError('Please install google-api-python-client with "pip install google-api-python-client"')
         self.spreadsheet_id = spreadsheet_id
         self.sheet_name = sheet_name
+        self.cache_namespace = f'{spreadsheet_id}/{sheet_name}'
         self.credentials_json = credentials_json
         self.header_row = header_row
         if not self.credentials_json:
@@ -35,6 +40,9 @@ class GoogleSpreadsheetTool(BaseTool):
         self.service = build('sheets', 'v4', credentials=creds)
         super().__init__(name, description, **kwargs)
 
+    def is_cacheable(self, tool_input: dict) -> bool:
+        return tool_input.get('action', 'append_to_sheet') in self.read_actions
+
     def append_data(self, data: List[List[str]]):
         """
         Appends data to the end of the sheet.
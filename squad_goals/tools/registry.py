@@ -0,0 +1,86 @@
+import inspect
+import re
+import typing
+from typing import Any, Dict, List, Sequence
+
+from .base_tool import BaseTool
+
+# python annotation -> JSON schema type
+JSON_SCHEMA_TYPES = {
+    str: 'string',
+    int: 'integer',
+    float: 'number',
+    bool: 'boolean',
+    dict: 'object',
+    list: 'array',
+    tuple: 'array',
+}
+
+
+def annotation_schema(annotation) -> Dict[str, Any]:
+    ''' JSON schema for a parameter annotation, e.g. str -> {"type": "string"}, List[str] -> {"type": "array"} '''
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {}
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:  # Optional[X] -> schema of X
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return annotation_schema(args[0]) if len(args) == 1 else {}
+    json_type = JSON_SCHEMA_TYPES.get(origin or annotation)
+    return {'type': json_type} if json_type else {}
+
+
+class ToolSpec:
+    """ Everything the agent needs to know about one tool, compiled once from its signature and docstring """
+
+    def __init__(self, tool: BaseTool):
+        self.tool = tool
+        self.name = tool.name
+        self.description = tool.description
+        self.run_description = tool._describe_run()
+        self.prompt_description = f"{self.name}: {self.description}. how to run: {self.run_description}"
+        self.parameters = self._parameters_schema(tool)
+        # provider function-calling APIs only allow [a-zA-Z0-9_-]{1,64} in names, e.g. "Return_Final_Answer_Tool"
+        self.function_name = re.sub(r'[^a-zA-Z0-9_-]', '_', self.name)[:64]
+        doc = inspect.getdoc(tool.run)
+        self.function_description = f"{self.description}\n{doc}" if doc else self.description
+
+    @staticmethod
+    def _parameters_schema(tool: BaseTool) -> Dict[str, Any]:
+        ''' JSON schema of the keyword arguments tool.run accepts '''
+        schema = {'type': 'object', 'properties': {}, 'required': []}
+        for name, param in inspect.signature(tool.run).parameters.items():
+            if param.kind == inspect.Parameter.VAR_KEYWORD:
+                schema['additionalProperties'] = True
+                continue
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+            schema['properties'][name] = annotation_schema(param.annotation)
+            if param.default is inspect.Parameter.empty:
+                schema['required'].append(name)
+        return schema
+
+
+class ToolRegistry:
+    """
+    Compiles the descriptions, parameter schemas and name index of a list of tools once, so prompt assembly does not
+    re-inspect every tool on every run. An Agent rebuilds its registry when its tool list changes.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool]):
+        self.tools: List[BaseTool] = list(tools)
+        self.specs: List[ToolSpec] = [ToolSpec(tool) for tool in self.tools]
+        self.by_name: Dict[str, BaseTool] = {spec.name: spec.tool for spec in self.specs}
+        self.spec_by_name: Dict[str, ToolSpec] = {spec.name: spec for spec in self.specs}
+        self.spec_by_function_name: Dict[str, ToolSpec] = {spec.function_name: spec for spec in self.specs}
+        self.description = "\n".join(spec.prompt_description for spec in self.specs)
+        self.quoted_names = ", ".join(f'"{spec.name}"' for spec in self.specs)
+
+    def matches(self, tools: Sequence[BaseTool]) -> bool:
+        ''' True if `tools` holds exactly the tools this registry was compiled from '''
+        return len(tools) == len(self.tools) and all(a is b for a, b in zip(tools, self.tools))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def __len__(self) -> int:
+        return len(self.specs)
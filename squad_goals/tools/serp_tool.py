@@ -1,15 +1,18 @@
 # SerpAPI tool
-try:
-    from serpapi import GoogleSearch
-except ImportError:
-    raise ImportError('Please install serpapi with "pip install google-search-results"')
 import os
 
 from .base_tool import BaseTool
 
 
 class SerpTool(BaseTool):
+    cacheable = True
+    cache_ttl = 24 * 3600.0
+
     def __init__(self, api_key=None, **kwargs):
+        try:
+            import serpapi  # noqa: F401
+        except ImportError:
+            raise ImportError('Please install serpapi with "pip install google-search-results"')
         if not api_key:
             api_key = os.getenv("SERP_API_KEY")
         if not api_key:
@@ -32,6 +35,8 @@ class SerpTool(BaseTool):
         }
         params.update(kwargs)
 
+        from serpapi import GoogleSearch
+
         search = GoogleSearch(params)
         return search.get_dict()
 
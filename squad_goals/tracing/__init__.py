@@ -0,0 +1,2 @@
+from .exporters import InMemorySpanExporter, OTLPJsonFileExporter, SpanExporter
+from .tracer import Span, Tracer, current_span, get_tracer, set_tracer, span
@@ -0,0 +1,105 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, TextIO
+
+from .tracer import Span
+
+# OTLP enums, see opentelemetry/proto/trace/v1/trace.proto
+SPAN_KIND_INTERNAL = 1
+STATUS_CODES = {'OK': 1, 'ERROR': 2}
+
+
+class SpanExporter:
+    """ Receives finished spans from a Tracer """
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError("export method must be implemented in subclass")
+
+    def shutdown(self):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """ Keeps finished spans in a list, for tests and for inspecting a run from a notebook """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self.spans.extend(spans)
+
+    def by_name(self, name: str) -> List[Span]:
+        return [span for span in self.spans if span.name == name]
+
+    def children(self, parent: Span) -> List[Span]:
+        return sorted((span for span in self.spans if span.parent_id == parent.span_id), key=lambda s: s.start_time)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    ''' an attribute value in OTLP/JSON form, e.g. 3 -> {"intValue": "3"} '''
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}  # 64 bit ints are strings in OTLP/JSON
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    otlp = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': SPAN_KIND_INTERNAL,
+        'startTimeUnixNano': str(span.start_time),
+        'endTimeUnixNano': str(span.end_time),
+        'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in span.attributes.items()],
+        'status': {'code': STATUS_CODES[span.status]},
+    }
+    if span.parent_id:
+        otlp['parentSpanId'] = span.parent_id
+    if span.status_message:
+        otlp['status']['message'] = span.status_message
+    return otlp
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """
+    Appends spans to a file as OTLP/JSON ExportTraceServiceRequest objects, one per line (the format the
+    OpenTelemetry collector's file exporter writes), so a run can be loaded into a trace viewer without a collector.
+    The file stays open and is flushed after every export, close() (or the Tracer's shutdown()) closes it.
+    """
+
+    def __init__(self, path: str, service_name: str = 'squad_goals'):
+        self.path = path
+        self.service_name = service_name
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        request = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': otlp_value(self.service_name)}]},
+            'scopeSpans': [{'scope': {'name': 'squad_goals'}, 'spans': [otlp_span(span) for span in spans]}],
+        }]}
+        line = json.dumps(request)
+        with self._lock:
+            if self._file is None:  # opened on the first span, and again after a close
+                self._file = open(self.path, 'a')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def shutdown(self):
+        self.close()
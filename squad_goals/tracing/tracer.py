@@ -0,0 +1,143 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# the span the code currently running is inside of, contextvars follow asyncio tasks and asyncio.to_thread
+_current_span: contextvars.ContextVar = contextvars.ContextVar('squad_goals_current_span', default=None)
+
+_tracer: Optional['Tracer'] = None
+
+
+class Span:
+    """ One timed operation (a workflow step, an agent loop, an LLM call, a tool run) and its attributes """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.status = 'OK'
+        self.status_message = ''
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, error: BaseException):
+        self.status = 'ERROR'
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration(self) -> Optional[float]:
+        ''' seconds, None while the span is still open '''
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def __repr__(self) -> str:
+        duration = 'open' if self.duration is None else f"{self.duration * 1000:.1f}ms"
+        return f"Span({self.name}, {duration}, {self.attributes})"
+
+
+class _NoopSpan:
+    """ handed out when no tracer is set so instrumented code can call set_attribute unconditionally """
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Opens nested spans and hands each finished one to the exporters, e.g.
+
+    exporter = InMemorySpanExporter()
+    set_tracer(Tracer(exporter))
+    agent.run(task)
+    exporter.spans  # workflow.step > agent.run > agent.loop > llm.generate / tool.run
+    """
+
+    def __init__(self, *exporters):
+        self.exporters = list(exporters)
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def start_span(self, name: str, **attributes: Any):
+        parent = _current_span.get()
+        span = Span(name, trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+                    parent_id=parent.span_id if parent else None,
+                    attributes={key: value for key, value in attributes.items() if value is not None})
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):  # a generator closed early is not a failure
+                span.record_exception(e)
+            raise
+        finally:
+            span.end_time = time.time_ns()
+            try:
+                _current_span.reset(token)
+            except ValueError:  # a generator finished in a different context than it started in
+                _current_span.set(parent)
+            self._export(span)
+
+    def _export(self, span: Span):
+        with self._lock:
+            for exporter in self.exporters:
+                exporter.export([span])
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    ''' installs the process-wide tracer, None turns tracing off '''
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    '''
+    opens a child of the current span on the installed tracer, e.g.
+    with span('tool.run', tool=tool.name) as s:
+        s.set_attribute('output_chars', len(result))
+    does nothing (beyond yielding a no-op span) when tracing is off
+    '''
+    tracer = _tracer
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    with tracer.start_span(name, **attributes) as opened:
+        yield opened
+
@@ -1 +1 @@
-from .extraction import extract_json_from_string
+from .extraction import extract_all_json_from_string, extract_json_from_string, iter_json_values, loads_tolerant
@@ -1,35 +1,260 @@
 import json
 import re
+from typing import Any, Iterator, List, Tuple
 
-def extract_json_from_string(input_string):
-    # Use regex to find the JSON part
-    # input_string = re.sub(r'[\x00-\x1F\x7F]', '', input_string)  # Remove control characters
+_OPENERS = re.compile(r'[{\[]')
+# inside brackets only these characters can change the scan state, everything between them is skipped in one search
+_BRACKET_SPECIAL = re.compile(r'''[{}\[\]"']''')
+_STRING_ENDS = {'"': re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL), "'": re.compile(r"'(?:[^'\\]|\\.)*'", re.DOTALL)}
+_PAIRS = {'}': '{', ']': '['}
+# a quote only starts a string where a JSON value or key can start, so apostrophes and \" in prose are left alone
+_VALUE_START = '{[,:'
+
+# tokens of the tolerant parser, tried at one position at a time so the text is read once
+_TOKEN = re.compile(r'''\s*(?:
+    ("(?:[^"\\]|\\.)*")
+    |('(?:[^'\\]|\\.)*')
+    |([{}\[\]:,])
+    |(-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    |(true|false|null|True|False|None|NaN|Infinity|-Infinity)\b
+    |(\S)
+)''', re.DOTALL | re.VERBOSE)
+_LITERALS = {'true': True, 'True': True, 'false': False, 'False': False, 'null': None, 'None': None,
+             'NaN': float('nan'), 'Infinity': float('inf'), '-Infinity': float('-inf')}
+_SINGLE_QUOTED_ESCAPES = re.compile(r'''\\.|"''', re.DOTALL)
+# the same repairs as loads_tolerant as one substitution, so the result can go through the C decoder
+_REPAIRS = re.compile(r'''("(?:[^"\\]|\\.)*")|('(?:[^'\\]|\\.)*')|\b(True|False|None)\b|,(\s*[\]}])''', re.DOTALL)
+_PYTHON_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_DECODER = json.JSONDecoder(strict=False)
+_FAST_PATH_ATTEMPTS = 8
+_NOT_FOUND, _GAVE_UP = object(), object()
+# what can follow an opening bracket, checked before parsing so the many spans in prose ([1], {name}) fail cheaply
+_HEADS = {
+    (False, '{'): re.compile(r'\{\s*["}]'),
+    (False, '['): re.compile(r'\[\s*(?:["{\[\]\-\d]|true|false|null|NaN|Infinity)'),
+    (True, '{'): re.compile(r'''\{\s*["'}]'''),
+    (True, '['): re.compile(r'''\[\s*(?:["'{\[\]\-\d.]|\\"|true|false|null|True|False|None|NaN|Infinity)'''),
+}
+
+
+def _candidates(text: str) -> List[Tuple[int, int]]:
+    '''
+    (start, end) of every balanced {...} / [...] span, in order of start, found in one pass over the text.
+    Brackets inside strings are ignored and a close bracket without a matching opener is skipped.
+    '''
+    spans = []
+    stack = []  # (bracket, start)
+    open_counts = {'{': 0, '[': 0}
+    pos = 0
+    while True:
+        match = (_BRACKET_SPECIAL if stack else _OPENERS).search(text, pos)
+        if match is None:
+            break
+        char, index = match.group(), match.start()
+        pos = index + 1
+        if char in open_counts:
+            stack.append((char, index))
+            open_counts[char] += 1
+        elif char in _PAIRS:
+            opener = _PAIRS[char]
+            if not open_counts[opener]:
+                continue
+            while True:  # anything opened since the matching bracket was never closed, drop it
+                bracket, start = stack.pop()
+                open_counts[bracket] -= 1
+                if bracket == opener:
+                    break
+            spans.append((start, pos))
+        else:  # a quote
+            before = index - 1
+            while text[before].isspace():
+                before -= 1
+            if text[before] not in _VALUE_START:
+                continue
+            string = _STRING_ENDS[char].match(text, index)
+            if string is not None:  # an unterminated quote is just a character
+                pos = string.end()
+    spans.sort()
+    return spans
+
+
+def _single_quoted(token: str) -> str:
+    ''' a Python 'string' as the equivalent JSON "string" '''
+    def escape(match):
+        escaped = match.group()
+        return '\\"' if escaped == '"' else "'" if escaped == "\\'" else escaped
+    return '"' + _SINGLE_QUOTED_ESCAPES.sub(escape, token[1:-1]) + '"'
+
+
+def _scalar(groups) -> Any:
+    double, single, _, number, literal, _ = groups
+    if double is not None:
+        return json.loads(double, strict=False)
+    if single is not None:
+        return json.loads(_single_quoted(single), strict=False)
+    if number is not None:
+        return float(number) if any(c in number for c in '.eE') else int(number)
+    return _LITERALS[literal]
+
+
+def _repair(match) -> str:
+    double, single, literal, close = match.groups()
+    if double is not None:
+        return double
+    if single is not None:
+        return _single_quoted(single)
+    if literal is not None:
+        return _PYTHON_LITERALS[literal]
+    return close  # drops the trailing comma
+
+
+def loads_tolerant(text: str) -> Any:
+    '''
+    json.loads for the almost-JSON LLMs write: single quoted strings, trailing commas and Python's True / False / None
+    are accepted. Iterative, so nesting depth is only limited by memory. Raises ValueError on anything else.
+    '''
+    stack = []  # open containers
+    keys = []  # pending key of every open dict (None for lists)
+    expect = 'value'  # value, key, colon, after (a value, so a comma or a close)
+    result, done = None, False
+    pos = 0
+    while True:
+        match = _TOKEN.match(text, pos)
+        if match is None:  # only whitespace is left
+            break
+        pos = match.end()
+        groups = match.groups()
+        punct, other = groups[2], groups[5]
+        if done or other is not None:
+            raise ValueError(f"Unexpected {match.group().strip()!r} at {match.start()}")
+        if punct in ('}', ']'):
+            container = stack[-1] if stack else None
+            if not isinstance(container, dict if punct == '}' else list) or expect in ('colon', 'dict_value'):
+                raise ValueError(f"Unexpected {punct!r} at {match.start()}")
+            stack.pop()
+            keys.pop()
+            value = container
+        elif punct == ',':
+            if expect != 'after':
+                raise ValueError(f"Unexpected ',' at {match.start()}")
+            expect = 'key' if isinstance(stack[-1], dict) else 'value'
+            continue
+        elif punct == ':':
+            if expect != 'colon':
+                raise ValueError(f"Unexpected ':' at {match.start()}")
+            expect = 'dict_value'
+            continue
+        elif expect == 'key':
+            if groups[0] is None and groups[1] is None:
+                raise ValueError(f"Expected a string key at {match.start()}")
+            keys[-1] = _scalar(groups)
+            expect = 'colon'
+            continue
+        elif expect not in ('value', 'dict_value'):
+            raise ValueError(f"Expected ',' or a closing bracket at {match.start()}")
+        elif punct in ('{', '['):
+            stack.append({} if punct == '{' else [])
+            keys.append(None)
+            expect = 'key' if punct == '{' else 'value'
+            continue
+        else:
+            value = _scalar(groups)
+        # a value is complete, add it to the container it is in
+        if not stack:
+            result, done = value, True
+        elif isinstance(stack[-1], dict):
+            stack[-1][keys[-1]] = value
+        else:
+            stack[-1].append(value)
+        expect = 'after'
+    if not done:
+        raise ValueError("Incomplete JSON")
+    return result
 
-    # Try to find JSON objects with curly braces
-    matches = re.findall(r'({(?:[^{}]|(?:{[^{}]*}))*})', input_string, re.DOTALL)
-    for match in matches:
-        try:
-            # Load the JSON string
-            return json.loads(match, strict=False)
-        except Exception:
-            pass
 
-    # Try to find JSON objects with balanced braces/brackets
-    matches = re.findall(r'(\{(?:[^{}]|(?:\{[^{}]*\}))*\}|\[(?:[^\[\]]|(?:\[[^\[\]]*\]))*\])', input_string, re.DOTALL)
-    for match in matches:
+def _loads(candidate: str, repair: bool) -> Any:
+    ''' the value of a {...} / [...] span, or raises ValueError '''
+    try:
+        return _DECODER.decode(candidate)
+    except RecursionError:  # nested deeper than the C decoder allows
+        return loads_tolerant(candidate)
+    except ValueError:
+        if not repair:
+            raise
+    try:
+        return _loads_repaired(candidate)
+    except ValueError:
+        if '\\"' not in candidate:
+            raise
+    # JSON that was escaped to sit inside a string, e.g. [\"a\", \"b\"]
+    return _loads_repaired(candidate.replace('\\"', '"'))
+
+
+def _loads_repaired(candidate: str) -> Any:
+    try:
+        return _DECODER.decode(_REPAIRS.sub(_repair, candidate))
+    except RecursionError:
+        return loads_tolerant(candidate)
+
+
+def _first_object(text: str) -> Any:
+    '''
+    fast path for the common case of valid JSON in the text: the C decoder is tried at the first few "{".
+    Returns _NOT_FOUND when there are no more, or _GAVE_UP. Each failure reads up to the whole text (the decoder
+    counts lines for its error message), so the attempts are capped to keep this linear
+    '''
+    start = text.find('{')
+    for _ in range(_FAST_PATH_ATTEMPTS):
+        if start == -1:
+            return _NOT_FOUND
         try:
-            match = match.replace('\\"', '"')
-            return eval(match)
-        except Exception:
+            return _DECODER.raw_decode(text, start)[0]
+        except ValueError:
             pass
-    
-    # Try to find arrays or simple objects that can be evaluated
-    matches = re.findall(r'([\[{].*?[\]}])', input_string, re.DOTALL)
-    for match in matches:
+        except RecursionError:
+            return _GAVE_UP
+        start = text.find('{', start + 1)
+    return _NOT_FOUND if start == -1 else _GAVE_UP
+
+
+def _values(input_string: str, spans: List[Tuple[int, int]], repair: bool, objects_only: bool) -> Iterator[Any]:
+    consumed = 0
+    for start, end in spans:
+        bracket = input_string[start]
+        if start < consumed or (objects_only and bracket != '{'):
+            continue
+        if not _HEADS[repair, bracket].match(input_string, start):
+            continue
         try:
-            match = match.replace('\\"', '"')
-            return eval(match)
-        except Exception:
-            pass
+            value = _loads(input_string[start:end], repair)
+        except ValueError:
+            continue
+        consumed = end
+        yield value
 
+
+def iter_json_values(input_string: str, repair: bool = True) -> Iterator[Any]:
+    '''
+    every JSON object / array in the text, left to right. Values nested in one that was returned are not returned
+    again, when a span does not parse the spans inside it are tried. With repair, almost-JSON is accepted too
+    (see loads_tolerant)
+    '''
+    return _values(input_string, _candidates(input_string), repair, objects_only=False)
+
+
+def extract_json_from_string(input_string):
+    ''' the first JSON object in the text, or failing that the first object / array that parses after repairs '''
+    value = _first_object(input_string)
+    if value is not _NOT_FOUND and value is not _GAVE_UP:
+        return value
+    spans = _candidates(input_string)
+    if value is _GAVE_UP:
+        for value in _values(input_string, spans, repair=False, objects_only=True):
+            return value
+    for value in _values(input_string, spans, repair=True, objects_only=False):
+        return value
     return None
+
+
+def extract_all_json_from_string(input_string) -> List[Any]:
+    return list(iter_json_values(input_string))
@@ -0,0 +1,160 @@
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+# (connect, read) seconds, the read timeout is long enough for a slow LLM completion
+DEFAULT_TIMEOUT = (5.0, 120.0)
+
+_default_pool: Optional['HTTPPool'] = None
+_default_pool_lock = threading.Lock()
+
+
+class HTTPPool:
+    """
+    Keep-alive connection pools shared by the providers and tools that talk HTTP directly (InceptionLLM, CustomLlama,
+    APITool, ReversePhoneLookupTool, LinkedIn scraping), so repeated calls to a host reuse an open TCP + TLS
+    connection instead of handshaking every time. They all use http_pool(), see configure_http to change it, e.g.
+
+    configure_http(pool_maxsize=64, host_pool_sizes={'api.apollo.io': 128}, timeout=(3, 60))
+
+    :param pool_connections: hosts to keep pools for
+    :param pool_maxsize: open connections kept per host, `host_pool_sizes` overrides it for some hosts ('host' or
+    'host:port')
+    :param timeout: (connect, read) seconds, or one number for both, used when a call does not pass its own
+    :param http2: use an httpx client speaking HTTP/2 (pip install "httpx[http2]") instead of requests, with one pool
+    of `pool_maxsize` connections for all hosts
+    """
+
+    def __init__(self, pool_connections: int = 16, pool_maxsize: int = 32,
+                 host_pool_sizes: Optional[Dict[str, int]] = None,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT, http2: bool = False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.timeout = timeout
+        self.http2 = http2
+        self._client = None
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, float]] = {}  # host -> request counters
+
+    @property
+    def client(self):
+        ''' the requests.Session (or httpx.Client with http2=True), created on first use '''
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._httpx_client() if self.http2 else self._requests_session()
+        return self._client
+
+    def _requests_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        for host, size in self.host_pool_sizes.items():
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount(f'https://{host}/', host_adapter)
+            session.mount(f'http://{host}/', host_adapter)
+        return session
+
+    def _httpx_client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('Please install httpx with "pip install httpx[http2]" to use http2=True')
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        return httpx.Client(http2=True, timeout=httpx.Timeout(read, connect=connect),
+                            limits=httpx.Limits(max_connections=self.pool_maxsize,
+                                                max_keepalive_connections=self.pool_maxsize))
+
+    def _count(self, host: str, latency: float, failed: bool):
+        with self._lock:
+            counters = self._hosts.setdefault(host, dict(requests=0, errors=0, latency=0.))
+            counters['requests'] += 1
+            counters['errors'] += failed
+            counters['latency'] += latency
+
+    def request(self, method: str, url: str, stream: bool = False, **kwargs):
+        ''' sends the request on a pooled connection, takes the keyword arguments of requests' methods '''
+        client = self.client
+        start, failed = time.perf_counter(), True
+        try:
+            if self.http2:
+                response = client.send(client.build_request(method.upper(), url, **kwargs), stream=stream)
+            else:
+                kwargs.setdefault('timeout', self.timeout)
+                if stream:
+                    kwargs['stream'] = True
+                response = getattr(client, method.lower())(url, **kwargs)
+            failed = False
+            return response
+        finally:
+            self._count(urlsplit(url).hostname or '', time.perf_counter() - start, failed)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        '''
+        per host: requests sent, errors, mean latency to the response headers and, with requests, the connections
+        opened (requests / connections is the reuse the pool bought) and the idle connections kept open
+        '''
+        with self._lock:
+            stats = {host: dict(requests=int(counters['requests']), errors=int(counters['errors']),
+                                mean_latency=counters['latency'] / counters['requests'])
+                     for host, counters in self._hosts.items()}
+        if self._client is not None and not self.http2:
+            for adapter in {id(adapter): adapter for adapter in self._client.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    host_stats = stats.setdefault(pool.host, dict(requests=0, errors=0, mean_latency=None))
+                    host_stats['connections_opened'] = host_stats.get('connections_opened', 0) + pool.num_connections
+                    idle = sum(connection is not None for connection in list(pool.pool.queue))  # empty slots are None
+                    host_stats['idle_connections'] = host_stats.get('idle_connections', 0) + idle
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def __repr__(self) -> str:
+        return f"HTTPPool(pool_maxsize={self.pool_maxsize}, http2={self.http2}, {len(self._hosts)} hosts)"
+
+
+def http_pool() -> HTTPPool:
+    ''' the process-wide pool the built-in providers and tools send their requests through '''
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HTTPPool()
+    return _default_pool
+
+
+def configure_http(**kwargs) -> HTTPPool:
+    ''' replaces the shared pool with HTTPPool(**kwargs), closing the connections of the old one '''
+    global _default_pool
+    with _default_pool_lock:
+        previous, _default_pool = _default_pool, HTTPPool(**kwargs)
+    if previous is not None:
+        previous.close()
+    return _default_pool
+
+
+def iter_lines(response) -> Iterator[str]:
+    ''' the decoded lines of a streamed response from either client '''
+    if hasattr(response, 'iter_content'):  # requests
+        return response.iter_lines(decode_unicode=True)
+    return response.iter_lines()
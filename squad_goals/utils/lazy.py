@@ -0,0 +1,24 @@
+import importlib
+from typing import Callable, Dict, List, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    '''
+    module __getattr__ and __dir__ that import `name` from the submodule exports[name] on first access, so importing
+    the package does not import every provider SDK and tool dependency, e.g.
+
+    __getattr__, __dir__ = lazy_exports(__name__, {'SerpTool': 'serp_tool'})
+    '''
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name: str):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f'.{exports[name]}', package), name)
+        namespace[name] = value  # later lookups skip __getattr__
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
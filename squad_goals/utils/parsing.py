@@ -0,0 +1,185 @@
+import re
+from typing import List, NamedTuple, Optional
+
+ACTION_MARKER = 'Action:'
+ACTION_INPUT_MARKER = 'Action Input:'
+
+# either marker, found in one pass over the text
+_MARKERS = re.compile(r'Action(?: Input)?:')
+# the only characters that change the state of a JSON scan, everything between them is skipped in one search
+_JSON_SPECIAL = re.compile(r'[{}"\\]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# fast path for objects nested at most two deep, which is nearly every Action Input. Every alternative starts with a
+# different character, so a failed match gives up without backtracking and the scanner takes over
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_FLAT_OBJECT = r'\{(?:[^{}"]|' + _STRING + r')*\}'
+_SHALLOW_OBJECT = re.compile(r'\{(?:[^{}"]|' + _STRING + '|' + _FLAT_OBJECT + r')*\}', re.DOTALL)
+
+
+class ParsedAction(NamedTuple):
+    tool: Optional[str]  # tool name from the `Action:` line without surrounding [brackets], None if there was none
+    tool_input: str  # raw text of the JSON object after `Action Input:`
+    end: int  # offset in the parsed text just past the closing brace of tool_input
+
+
+class ReActParser:
+    """
+    Single-pass state machine for the Action / Action Input blocks of ReAct output:
+
+        Action: Search Tool
+        Action Input: {"query": "...", "filters": {"year": {"gte": 2020}}}
+
+    Text can be fed in chunks (e.g. streamed tokens), every character is looked at once, and the Action Input is
+    matched by tracking brace depth and JSON string/escape state, so objects can nest to any depth and braces inside
+    strings are ignored. Completed actions are returned by feed() and collected on `actions`.
+    An Action Input with no Action line before it is still reported (with tool None) so streams can stop early.
+    """
+
+    _SEEK_ACTION, _SEEK_TOOL, _SEEK_INPUT, _SEEK_BRACE, _IN_JSON = range(5)
+
+    def __init__(self):
+        self.actions: List[ParsedAction] = []
+        self._buffer = ''  # text not scanned yet plus the part of it a later step still needs
+        self._base = 0  # offset of _buffer[0] in the fed text
+        self._mark = 0  # start of the text still needed (tool name line, Action Input object)
+        self._pos = 0  # next index of _buffer to scan
+        self._state = self._SEEK_ACTION
+        self._tool: Optional[str] = None
+        self._json_parts: List[str] = []  # earlier chunks of an Action Input object that spans several feeds
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[ParsedAction]:
+        ''' scan the next chunk, returns the actions completed by it '''
+        self._buffer += chunk
+        completed = []
+        while self._step(completed):
+            pass
+        if self._state == self._IN_JSON:  # set the object scanned so far aside so the buffer stays small
+            self._json_parts.append(self._buffer[self._mark:self._pos])
+            self._mark = self._pos
+        # drop the text no step needs any more, once per feed so each character is copied a bounded number of times
+        self._buffer = self._buffer[self._mark:]
+        self._base += self._mark
+        self._pos -= self._mark
+        self._mark = 0
+        self.actions.extend(completed)
+        return completed
+
+    def _step(self, completed: List[ParsedAction]) -> bool:
+        ''' advance by one state transition, False when more text is needed '''
+        buffer = self._buffer
+
+        if self._state in (self._SEEK_ACTION, self._SEEK_INPUT):
+            # back up a little in case a marker was split across chunks
+            match = _MARKERS.search(buffer, max(self._pos - len(ACTION_INPUT_MARKER) + 1, self._mark))
+            if match is None:
+                self._pos = len(buffer)
+                self._mark = max(len(buffer) - len(ACTION_INPUT_MARKER) + 1, self._mark)
+                return False
+            if match.group() == ACTION_MARKER:  # (a new) Action line, when seeking the input it replaces the last one
+                self._state = self._SEEK_TOOL
+            else:
+                if self._state == self._SEEK_ACTION:  # an Action Input without an Action line
+                    self._tool = None
+                self._state = self._SEEK_BRACE
+            self._mark = self._pos = match.end()
+            return True
+
+        if self._state == self._SEEK_TOOL:  # the tool name is the rest of the line (or the next non-empty line)
+            newline = buffer.find('\n', self._pos)
+            if newline == -1:
+                self._pos = len(buffer)
+                return False
+            tool = buffer[self._mark:newline].strip()
+            self._mark = self._pos = newline + 1
+            if tool:
+                self._tool = self._tool_name(tool)
+                self._state = self._SEEK_INPUT
+            return True
+
+        if self._state == self._SEEK_BRACE:
+            index = buffer.find('{', self._pos)
+            if index == -1:
+                self._mark = self._pos = len(buffer)
+                return False
+            match = _SHALLOW_OBJECT.match(buffer, index)
+            if match is None:  # deeper, or not complete yet
+                self._mark = self._pos = index
+                self._depth, self._in_string, self._escaped = 0, False, False
+                self._state = self._IN_JSON
+                return True
+            completed.append(ParsedAction(self._tool, match.group(), self._base + match.end()))
+            self._mark = self._pos = match.end()
+            self._state = self._SEEK_ACTION
+            return True
+
+        # _IN_JSON: jump from one brace/quote/backslash to the next
+        pos = self._pos
+        while True:
+            if self._escaped:
+                if pos >= len(buffer):
+                    break
+                self._escaped = False
+                pos += 1
+                continue
+            match = (_STRING_SPECIAL if self._in_string else _JSON_SPECIAL).search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char, pos = match.group(), match.end()
+            if char == '\\':
+                self._escaped = self._in_string
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif char == '{':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    tool_input = ''.join(self._json_parts) + buffer[self._mark:pos]
+                    self._json_parts = []
+                    completed.append(ParsedAction(self._tool, tool_input, self._base + pos))
+                    self._mark = self._pos = pos
+                    self._state = self._SEEK_ACTION
+                    return True
+        self._pos = pos
+        return False
+
+    @staticmethod
+    def _tool_name(line: str) -> str:
+        if line.startswith('['):
+            line = line[1:]
+        if line.endswith(']'):
+            line = line[:-1]
+        return line.strip()
+
+
+def parse_actions(text: str) -> List[ParsedAction]:
+    ''' every complete Action / Action Input pair in a full generation '''
+    return [action for action in ReActParser().feed(text) if action.tool is not None]
+
+
+class ActionInputWatcher:
+    """
+    Watches streamed LLM text and reports as soon as the JSON object of the first Action Input has closed,
+    so the agent can dispatch the tool without waiting for (or paying for) the rest of the generation.
+    """
+
+    def __init__(self):
+        self.parser = ReActParser()
+        self.end = None  # offset in the streamed text just past the closing brace of the Action Input object
+
+    @property
+    def closed(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str) -> bool:
+        ''' scan the next chunk of streamed text, returns True once the Action Input object has closed '''
+        if self.closed:
+            return True
+        completed = self.parser.feed(chunk)
+        if completed:
+            self.end = completed[0].end
+        return self.closed
@@ -1,10 +1,13 @@
+import asyncio
 import re
-from typing import List, Any, Dict
+import uuid
+from typing import List, Any, Dict, Optional
 
 from pydantic import BaseModel
 
 from squad_goals.tools.base_tool import BaseTool
 from .task import Task
+from .tracing import span
 
 
 class Plan(BaseModel):
@@ -33,6 +36,8 @@ class Workflow(BaseModel):
     agents: List[Any] = []
     tasks: List[Any] = []
     verbose: bool = False
+    checkpoint_store: Any = None  # CheckpointStore saved to after every step (and every agent loop), None = off
+    run_id: Optional[str] = None  # run id of the latest run, pass it to resume()
 
     def _extract_variables(self, text):
         ''' find <<x>> variables in the goal and return them as a list '''
@@ -48,54 +53,144 @@ class Workflow(BaseModel):
             raise ValueError(f"At least one variable was not replaced in the text: {text}")
         return text
 
-    def run(self, yield_events=False, **variables: Dict[str, str]):
-        ''' run the workflow '''
-        self.plan.results = []  # reset results
+    def _prepare_step(self, **variables: Dict[str, str]):
+        ''' build the Task for the next step of the plan and pick the agent that runs it '''
+        next_step = self.plan.steps[len(self.plan.results)]
+        next_step = self._replace_variables(next_step, **variables)
+        if self.verbose:
+            print(f"Next Step: {next_step}")
+
+        on_last_step = len(self.plan.results) == (len(self.plan.steps) - 1)
+        plan_formatted = self.plan.formatted_plan(include_goal=on_last_step)
+        plan_formatted = self._replace_variables(plan_formatted, **variables)
+        if self.verbose:
+            print(f"Formatted Plan: {plan_formatted}")
+
+        step_task = Task(
+            name=f"Execute Step {len(self.plan.results) + 1}",
+            goal=f'You are executing a SINGLE step of the following plan.\n\n<plan>\n{plan_formatted}\n</plan>\n\nThe step you are now executing is:\n\n<step>\n{next_step}\n</step>\n\nExecute only the given step of the plan and nothing more.',
+            output_format='text'
+        )
+        self.tasks.append(step_task)
 
+        if self.agents:  # use the agent in the list with the same index as the step
+            agent = self.agents[len(self.plan.results) % len(self.agents)]
+        elif self.agent:
+            agent = self.agent
+        else:
+            raise ValueError("No agent or agents provided to run the workflow")
+        return next_step, step_task, agent
+
+    def _record_step_result(self, step_task: Task):
+        step_result = step_task.output
+        self.plan.results.append(step_result)
+        if self.verbose:
+            print(f"Step Result: {step_result}")
+        return step_result
+
+    def _checkpoint(self, variables: Dict[str, str]):
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.save(self.run_id, 'workflow',
+                                       dict(results=list(self.plan.results), variables=variables))
+
+    def _step_session(self, agent, step_task: Task, resuming: bool):
+        '''
+        the agent session of the next step, checkpointed under "<run_id>/step-<n>". When resuming, a step that was
+        interrupted continues from its agent's last completed loop
+        '''
+        run_id = f"{self.run_id}/step-{len(self.plan.results) + 1}"
+        store = agent.checkpoint_store or self.checkpoint_store
+        if resuming and store is not None and store.load(run_id) is not None:
+            session = agent.restore_session(run_id, store)
+            self.tasks[-1] = session.task
+            return session
+        session = agent.new_session(step_task, run_id=run_id)
+        session.checkpoints = store
+        return session
+
+    def _start(self, run_id: Optional[str]):
+        self.plan.results = []  # reset results
+        self.run_id = run_id or uuid.uuid4().hex
+
+    def _resume_state(self, run_id: str) -> Dict[str, str]:
+        if self.checkpoint_store is None:
+            raise ValueError("No checkpoint store to resume from, pass one as Workflow(..., checkpoint_store=...)")
+        state = self.checkpoint_store.require(run_id, 'workflow')
+        self.plan.results = state['results']
+        self.run_id = run_id
+        return state['variables']
+
+    def run(self, yield_events=False, run_id: Optional[str] = None, **variables: Dict[str, str]):
+        '''
+        run the workflow. With a checkpoint store the run is saved under `run_id` (random by default, see
+        self.run_id) after every step and every agent loop, and can be continued with resume(run_id)
+        '''
+        self._start(run_id)
+        return self._run(yield_events, variables, resuming=False)
+
+    def resume(self, run_id: str, yield_events=False):
+        ''' continue a run from its latest checkpoint without repeating its completed steps and agent loops '''
+        variables = self._resume_state(run_id)
+        return self._run(yield_events, variables, resuming=True)
+
+    def _run(self, yield_events: bool, variables: Dict[str, str], resuming: bool):
         def execute_steps():
+            with span('workflow.run', workflow=self.name, steps=len(self.plan.steps)):
+                self._checkpoint(variables)
+                while not self.plan.is_complete:
+                    with span('workflow.step', step=len(self.plan.results) + 1):
+                        next_step, step_task, agent = self._prepare_step(**variables)
+                        yield dict(event='next_step', next_step=next_step)
+                        session = self._step_session(agent, step_task, resuming)
+                        step_task = session.task
+
+                        if not step_task.completed:  # a resumed step can have finished just before the crash
+                            # agent.run(step_task) also has an optional yield_events parameter, so we need to pass
+                            # it through if we are yielding events, we need to yield them from the agent as well
+                            if yield_events:
+                                for event in agent.run(step_task, yield_events=True, session=session):
+                                    yield event
+                            else:
+                                agent.run(step_task, session=session)
+                        step_result = self._record_step_result(step_task)
+                        self._checkpoint(variables)
+                        yield dict(event='step_result', step_result=step_result)
+
+                yield dict(event='workflow_complete', results=self.plan.results)
+
+        return execute_steps() if yield_events else list(execute_steps())
+
+    async def arun(self, run_id: Optional[str] = None, **variables: Dict[str, str]):
+        ''' async counterpart of run(), an async generator yielding the workflow and agent events '''
+        self._start(run_id)
+        async for event in self._arun(variables, resuming=False):
+            yield event
+
+    async def aresume(self, run_id: str):
+        ''' async counterpart of resume() '''
+        variables = self._resume_state(run_id)
+        async for event in self._arun(variables, resuming=True):
+            yield event
+
+    async def _arun(self, variables: Dict[str, str], resuming: bool):
+        with span('workflow.run', workflow=self.name, steps=len(self.plan.steps)):
+            await asyncio.to_thread(self._checkpoint, variables)
             while not self.plan.is_complete:
-                next_step = self.plan.steps[len(self.plan.results)]
-                next_step = self._replace_variables(next_step, **variables)
-                yield dict(event='next_step', next_step=next_step)
-                if self.verbose:
-                    print(f"Next Step: {next_step}")
-
-                on_last_step = len(self.plan.results) == (len(self.plan.steps) - 1)
-                plan_formatted = self.plan.formatted_plan(include_goal=on_last_step)
-                plan_formatted = self._replace_variables(plan_formatted, **variables)
-                if self.verbose:
-                    print(f"Formatted Plan: {plan_formatted}")
-
-                step_task = Task(
-                    name=f"Execute Step {len(self.plan.results) + 1}",
-                    goal=f'You are executing a SINGLE step of the following plan.\n\n<plan>\n{plan_formatted}\n</plan>\n\nThe step you are now executing is:\n\n<step>\n{next_step}\n</step>\n\nExecute only the given step of the plan and nothing more.',
-                    output_format='text'
-                )
-                self.tasks.append(step_task)
-
-                # agent.run(step_task) also has an optional yield_events parameter, so we need to pass it through
-                # if we are yielding events, we need to yield them from the agent as well
-                if self.agents:  # use the agent in the list with the same index as the step
-                    agent = self.agents[len(self.plan.results) % len(self.agents)]
-                elif self.agent:
-                    agent = self.agent
-                else:
-                    raise ValueError("No agent or agents provided to run the workflow")
-                if yield_events:
-                    for event in agent.run(step_task, yield_events=True):
-                        yield event
-                else:
-                    agent.run(step_task)
-                step_result = step_task.output
-                yield dict(event='step_result', step_result=step_result)
-                self.plan.results.append(step_result)
-                if self.verbose:
-                    print(f"Step Result: {step_result}")
+                with span('workflow.step', step=len(self.plan.results) + 1):
+                    next_step, step_task, agent = self._prepare_step(**variables)
+                    yield dict(event='next_step', next_step=next_step)
+                    session = self._step_session(agent, step_task, resuming)
+                    step_task = session.task
+
+                    if not step_task.completed:
+                        async for event in agent.arun(step_task, session=session):
+                            yield event
+                    step_result = self._record_step_result(step_task)
+                    await asyncio.to_thread(self._checkpoint, variables)
+                    yield dict(event='step_result', step_result=step_result)
 
             yield dict(event='workflow_complete', results=self.plan.results)
 
-        return execute_steps() if yield_events else list(execute_steps())
-
 
 class WorkflowTool(BaseTool):
 
@@ -115,6 +210,11 @@ class WorkflowTool(BaseTool):
         results = self.workflow.run(**variables)
         return results[-1]
 
+    async def arun(self, **variables: Dict[str, str]):
+        variables.update({'verbose': self.verbose})
+        events = [event async for event in self.workflow.arun(**variables)]
+        return events[-1]
+
     # base tool has _describe_run, but add the workflow variables here so they know to set it
     def _describe_run(self):
         workflow_variables = self.workflow._extract_variables(self.workflow.goal)
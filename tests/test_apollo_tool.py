@@ -20,7 +20,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(self.apollo_tool.api_method, "POST")
         self.assertEqual(self.apollo_tool.name, "Apollo Tool")
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_search_contacts(self, mock_post):
         """Test the search_contacts method."""
         # Setup mock response
@@ -48,7 +48,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], search_params)
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_create_contact(self, mock_post):
         """Test the create_contact method."""
         # Setup mock response
@@ -74,7 +74,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], contact_data)
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_get_contact(self, mock_post):
         """Test the get_contact method."""
         # Setup mock response
@@ -96,7 +96,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], {"id": "123"})
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_update_contact(self, mock_post):
         """Test the update_contact method."""
         # Setup mock response
@@ -119,7 +119,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], {"id": "123", "last_name": "Smith"})
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_run_search_contacts(self, mock_post):
         """Test the run method with search_contacts action."""
         # Setup mock response
@@ -150,7 +150,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], search_params)
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_run_create_contact(self, mock_post):
         """Test the run method with create_contact action."""
         # Setup mock response
@@ -179,7 +179,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], contact_data)
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_run_get_contact(self, mock_post):
         """Test the run method with get_contact action."""
         # Setup mock response
@@ -204,7 +204,7 @@ class TestApolloTool(unittest.TestCase):
         self.assertEqual(call_args[1]['json'], {"id": "123"})
         self.assertEqual(result, mock_response.json.return_value)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_run_update_contact(self, mock_post):
         """Test the run method with update_contact action."""
         # Setup mock response
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool
+from squad_goals.workflow import Plan, Workflow
+
+
+class ScriptedLLM(LLM):
+    """LLM that replays canned generations in order, so agent loops can run offline."""
+
+    def __init__(self, responses, **kwargs):
+        self.responses = list(responses)
+        self.calls = []
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.calls.append(messages)
+        return self.responses[min(len(self.calls), len(self.responses)) - 1]
+
+
+class EchoTool(BaseTool):
+    def __init__(self):
+        super().__init__("Echo Tool", "Echoes the input back")
+
+    def run(self, text: str) -> str:
+        '''
+        :param text: The text to echo
+        '''
+        return text.upper()
+
+
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "42"}'
+ECHO = 'Thought: echo first\nAction: Echo Tool\nAction Input: {"text": "hi"}'
+
+
+async def collect(async_gen):
+    return [event async for event in async_gen]
+
+
+class TestAsyncAgent(unittest.TestCase):
+    def test_agenerate_falls_back_to_generate(self):
+        llm = ScriptedLLM(['hello'])
+        self.assertEqual(asyncio.run(llm.agenerate([{'role': 'user', 'content': 'hi'}])), 'hello')
+
+    def test_arun_yields_same_events_as_run(self):
+        sync_agent = Agent(llm=ScriptedLLM([ECHO, FINAL_ANSWER]), tools=[EchoTool()])
+        async_agent = Agent(llm=ScriptedLLM([ECHO, FINAL_ANSWER]), tools=[EchoTool()])
+        sync_task, async_task = Task(name='t', goal='g'), Task(name='t', goal='g')
+
+        sync_events = sync_agent.run(sync_task)
+        async_events = asyncio.run(collect(async_agent.arun(async_task)))
+
+        self.assertEqual([e['event'] for e in sync_events], [e['event'] for e in async_events])
+        self.assertEqual(async_events[-1]['final_answer'], '"42"')
+        self.assertTrue(async_task.completed)
+        self.assertIn('Observation: HI', async_agent.llm.calls[-1][-1]['content'])
+
+    def test_many_agents_share_one_event_loop(self):
+        async def run_all():
+            agents = [Agent(llm=ScriptedLLM([FINAL_ANSWER]), tools=[]) for _ in range(20)]
+            tasks = [Task(name=f't{i}', goal='g') for i in range(20)]
+            await asyncio.gather(*(collect(agent.arun(task)) for agent, task in zip(agents, tasks)))
+            return tasks
+
+        self.assertTrue(all(task.succeeded for task in asyncio.run(run_all())))
+
+    def test_workflow_arun(self):
+        agent = Agent(llm=ScriptedLLM([FINAL_ANSWER]), tools=[])
+        workflow = Workflow(plan=Plan(goal='g', steps=['one', 'two']), goal='g', agent=agent)
+        events = asyncio.run(collect(workflow.arun()))
+        self.assertEqual(events[-1], dict(event='workflow_complete', results=['"42"', '"42"']))
+
+
+if __name__ == "__main__":
+    unittest.main()
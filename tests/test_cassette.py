@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from squad_goals import Agent, Cassette, Task
+from squad_goals.cassette import CassetteMiss, RecordedToolError
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool, ToolRegistry
+
+
+class ScriptedLLM(LLM):
+    provider = 'scripted'
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        if 'Observation: sunny in' in prompt:
+            return 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "sunny"}'
+        # a failed tool call leaves the prompt as it was, so the second request repeats the first one
+        city = 'Nowhere' if self.calls == 1 else 'Paris'
+        return f'Thought: check\nAction: Weather Tool\nAction Input: {{"city": "{city}"}}'
+
+
+class WeatherTool(BaseTool):
+    def __init__(self):
+        super().__init__("Weather Tool", "Looks up the weather")
+        self.calls = 0
+
+    def run(self, city: str) -> str:
+        '''
+        :param city: name of the city
+        '''
+        self.calls += 1
+        if city == 'Nowhere':
+            raise ValueError(f'unknown city {city}')
+        return f'sunny in {city}'
+
+
+class UnreachableLLM(LLM):
+    provider = 'scripted'
+
+    def _generate(self, messages, **kwargs):
+        raise AssertionError('replay called the LLM')
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'run.jsonl')
+
+    def record(self):
+        cassette = Cassette(self.path, mode='record')
+        llm, tool = ScriptedLLM(), WeatherTool()
+        agent = Agent(llm=cassette.wrap_llm(llm), tools=cassette.wrap_tools([tool]))
+        events = list(agent.run(Task(name='weather', goal='weather in Paris?')))
+        return events, llm, tool
+
+    def test_replay_serves_the_recorded_run_without_calling_out(self):
+        events, llm, tool = self.record()
+        self.assertEqual((llm.calls, tool.calls), (3, 2))
+
+        cassette = Cassette(self.path)
+        self.assertEqual(len(cassette), 5)
+        tool = WeatherTool()
+        agent = Agent(llm=cassette.wrap_llm(UnreachableLLM()), tools=cassette.wrap_tools([tool]))
+        replayed = list(agent.run(Task(name='weather', goal='weather in Paris?')))
+
+        self.assertEqual(tool.calls, 0)
+        self.assertEqual([event['event'] for event in replayed], [event['event'] for event in events])
+        self.assertEqual(replayed[-1]['final_answer'], events[-1]['final_answer'])
+        self.assertIn('Error from tool: unknown city Nowhere', [event.get('message') for event in replayed])
+
+    def test_unrecorded_request_and_tool_error(self):
+        self.record()
+        cassette = Cassette(self.path)
+        with self.assertRaises(CassetteMiss):
+            cassette.wrap_llm(UnreachableLLM()).generate([{'role': 'user', 'content': 'never asked'}])
+        with self.assertRaises(RecordedToolError) as raised:
+            cassette.wrap_tool(WeatherTool()).run(city='Nowhere')
+        self.assertEqual((raised.exception.error_type, str(raised.exception)), ('ValueError', 'unknown city Nowhere'))
+
+    def test_wrapped_tools_describe_themselves_the_same(self):
+        cassette = Cassette(self.path, mode='record')
+        tool = WeatherTool()
+        plain, wrapped = ToolRegistry([tool]), ToolRegistry(cassette.wrap_tools([tool]))
+        self.assertEqual(plain.description, wrapped.description)
+        self.assertEqual(plain.specs[0].parameters, wrapped.specs[0].parameters)
+        self.assertEqual(plain.specs[0].function_description, wrapped.specs[0].function_description)
+        tool.cache_namespace = 'europe'  # the tool cache keys results on the wrapped tool's data source
+        self.assertEqual(cassette.wrap_tool(tool).cache_namespace, 'europe')
+
+    def test_recorded_latency_is_replayed_faster(self):
+        self.record()
+        cassette = Cassette(self.path, latency=lambda entry: 0.5, speed=10)
+        agent = Agent(llm=cassette.wrap_llm(UnreachableLLM()), tools=cassette.wrap_tools([WeatherTool()]))
+
+        async def replay():
+            return [event async for event in agent.arun(Task(name='weather', goal='weather in Paris?'))]
+
+        start = time.perf_counter()
+        events = asyncio.run(replay())
+        self.assertEqual(events[-1]['final_answer'], '"sunny"')
+        self.assertGreaterEqual(time.perf_counter() - start, 5 * 0.05)
+        self.assertEqual(Cassette(self.path, latency='recorded', speed=100).delay({'latency': 2.0}), 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import re
+import tempfile
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.checkpoint import InMemoryCheckpointStore, SQLiteCheckpointStore
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool
+from squad_goals.workflow import Plan, Workflow
+
+
+class SearchingLLM(LLM):
+    """ searches twice and then answers, raising on call number `crash_on` like a process dying mid-run """
+
+    def __init__(self, crash_on=None):
+        super().__init__()
+        self.calls = 0
+        self.crash_on = crash_on
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == self.crash_on:
+            raise KeyboardInterrupt('process killed')
+        prompt = messages[-1]['content']
+        step = re.search(r'<step>\s*(.*?)\s*</step>', prompt, re.DOTALL)
+        searches = prompt.count('Observation: found')
+        if searches >= 2:
+            return ('Thought: done\nAction: Return Final Answer Tool\n'
+                    f'Action Input: {{"final_answer": "answer to {step.group(1) if step else "task"}"}}')
+        return f'Thought: search\nAction: Search Tool\nAction Input: {{"query": "{searches}"}}'
+
+
+class SearchTool(BaseTool):
+    def __init__(self):
+        super().__init__("Search Tool", "Searches")
+        self.queries = []
+
+    def run(self, query: str) -> str:
+        self.queries.append(query)
+        return f'found {query}'
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'runs.db')
+
+    def test_agent_resumes_after_the_last_completed_loop(self):
+        tool = SearchTool()
+        agent = Agent(llm=SearchingLLM(crash_on=2), tools=[tool], checkpoint_store=SQLiteCheckpointStore(self.path))
+        with self.assertRaises(KeyboardInterrupt):
+            agent.run(Task(name='lookup', goal='find it'), run_id='run-1')
+        self.assertEqual(tool.queries, ['0'])
+
+        # a new process: new agent, new store on the same file
+        llm, tool = SearchingLLM(), SearchTool()
+        agent = Agent(llm=llm, tools=[tool], checkpoint_store=SQLiteCheckpointStore(self.path))
+        events = agent.resume('run-1')
+
+        self.assertEqual(events[-1]['final_answer'], '"answer to task"')
+        self.assertEqual((llm.calls, tool.queries), (2, ['1']))  # loop 1 is neither asked nor run again
+        self.assertEqual(agent.last_session.num_loops, 3)
+
+        # resuming a finished run only returns its answer
+        llm = SearchingLLM()
+        agent = Agent(llm=llm, tools=[SearchTool()], checkpoint_store=SQLiteCheckpointStore(self.path))
+        self.assertEqual([event['event'] for event in agent.resume('run-1')], ['agent_completed'])
+        self.assertEqual(llm.calls, 0)
+
+    def test_async_resume(self):
+        store = InMemoryCheckpointStore()
+        agent = Agent(llm=SearchingLLM(crash_on=3), tools=[SearchTool()], checkpoint_store=store)
+
+        async def crash():
+            return [event async for event in agent.arun(Task(name='lookup', goal='find it'), run_id='run-2')]
+
+        with self.assertRaises(KeyboardInterrupt):
+            asyncio.run(crash())
+        llm = SearchingLLM()
+        agent = Agent(llm=llm, tools=[SearchTool()], checkpoint_store=store)
+
+        async def resume():
+            return [event async for event in agent.aresume('run-2')]
+
+        self.assertEqual(asyncio.run(resume())[-1]['final_answer'], '"answer to task"')
+        self.assertEqual(llm.calls, 1)
+
+    def test_workflow_resumes_mid_step(self):
+        plan = Plan(goal='three steps', steps=['step one', 'step two', 'step three'])
+        # step one takes calls 1-3, the crash hits the second loop of step two
+        agent = Agent(llm=SearchingLLM(crash_on=5), tools=[SearchTool()])
+        workflow = Workflow(plan=plan, goal='three steps', agent=agent, checkpoint_store=SQLiteCheckpointStore(self.path))
+        with self.assertRaises(KeyboardInterrupt):
+            workflow.run(run_id='wf-1')
+
+        llm, tool = SearchingLLM(), SearchTool()
+        plan = Plan(goal='three steps', steps=['step one', 'step two', 'step three'])
+        workflow = Workflow(plan=plan, goal='three steps', agent=Agent(llm=llm, tools=[tool]),
+                            checkpoint_store=SQLiteCheckpointStore(self.path))
+        events = workflow.resume('wf-1')
+
+        self.assertEqual(events[-1]['results'],
+                         ['"answer to step one"', '"answer to step two"', '"answer to step three"'])
+        self.assertEqual(llm.calls, 2 + 3)  # the rest of step two, then step three
+        self.assertEqual(tool.queries, ['1', '0', '1'])
+
+    def test_store(self):
+        store = SQLiteCheckpointStore(self.path)
+        store.save('a', 'agent', {'num_loops': 1})
+        store.save('b', 'workflow', {'results': []})
+        store.save('a', 'agent', {'num_loops': 2})
+        self.assertEqual(store.load('a')['state'], {'num_loops': 2})
+        self.assertEqual([run['run_id'] for run in store.runs()], ['a', 'b'])
+        with self.assertRaises(ValueError):
+            store.require('b', 'agent')
+        store.delete('a')
+        self.assertIsNone(store.load('a'))
+        with self.assertRaises(KeyError):
+            store.require('a', 'agent')
+
+
+if __name__ == "__main__":
+    unittest.main()
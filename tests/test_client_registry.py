@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import unittest
+
+from squad_goals.llms import clients
+from squad_goals.llms.clients import ClientRegistry, client_registry
+from squad_goals.llms.groq import GroqLLM
+from squad_goals.llms.openai import OpenAILLM
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncClient(FakeClient):
+    async def close(self):
+        self.closed = True
+
+
+class TestClientRegistry(unittest.TestCase):
+    def setUp(self):
+        self.previous, clients._default_registry = clients._default_registry, None
+
+    def tearDown(self):
+        client_registry().close()
+        clients._default_registry = self.previous
+
+    def test_llms_share_clients_per_endpoint_and_key(self):
+        first, second = OpenAILLM(api_key='key-a'), OpenAILLM('gpt-4o-mini', api_key='key-a')
+        self.assertIs(first.openai, second.openai)
+        self.assertIsNot(first.openai, OpenAILLM(api_key='key-b').openai)
+        self.assertIsNot(first.openai, GroqLLM(api_key='key-a').openai)  # another base_url
+        stats = client_registry().stats()
+        self.assertEqual((stats['clients'], stats['created'], stats['reused']), (3, 3, 1))
+        self.assertNotIn('key-a', repr(ClientRegistry.key('openai', None, 'key-a')))
+
+    def test_sdk_retries_are_off_when_the_llm_retries(self):
+        retrying, sdk_retrying = OpenAILLM(api_key='key-a'), OpenAILLM(api_key='key-a', retry=None)
+        self.assertEqual(retrying.openai.max_retries, 0)  # one retry loop with one backoff, not 3 x 3 attempts
+        self.assertEqual(sdk_retrying.openai.max_retries, 2)  # the SDK's default
+        self.assertIsNot(retrying.openai, sdk_retrying.openai)
+
+    def test_concurrent_first_use_builds_one_client(self):
+        registry, built = ClientRegistry(), []
+
+        def factory():
+            built.append(FakeClient())
+            return built[-1]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get(('sdk',), factory))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(built), 1)
+        self.assertTrue(all(result is built[0] for result in results))
+        registry.close()
+        self.assertTrue(built[0].closed)
+        self.assertIsNot(registry.get(('sdk',), factory), built[0])  # a new client after close
+
+    def test_async_clients_are_kept_per_event_loop(self):
+        registry = ClientRegistry()
+
+        async def get_twice():
+            first = registry.get_async(('sdk',), FakeAsyncClient)
+            self.assertIs(registry.get_async(('sdk',), FakeAsyncClient), first)
+            return first
+
+        first_loop, second_loop = asyncio.run(get_twice()), asyncio.run(get_twice())
+        self.assertIsNot(first_loop, second_loop)
+
+        async def use_and_close():
+            client = registry.get_async(('sdk',), FakeAsyncClient)
+            await registry.aclose()
+            return client
+
+        self.assertTrue(asyncio.run(use_and_close()).closed)
+
+    def test_close_closes_async_clients_of_running_loops_and_warns_about_stopped_ones(self):
+        registry = ClientRegistry()
+        running = asyncio.new_event_loop()
+        thread = threading.Thread(target=running.run_forever)
+        thread.start()
+        stopped = asyncio.new_event_loop()
+        try:
+            async def get_client():
+                return registry.get_async(('sdk',), FakeAsyncClient)
+
+            live = asyncio.run_coroutine_threadsafe(get_client(), running).result()
+            dropped = stopped.run_until_complete(get_client())
+            with self.assertWarns(ResourceWarning):
+                registry.close()
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), running).result()  # lets the scheduled close run
+            self.assertTrue(live.closed)
+            self.assertFalse(dropped.closed)
+            self.assertEqual(registry.stats()['async_clients'], 0)
+        finally:
+            running.call_soon_threadsafe(running.stop)
+            thread.join()
+            running.close()
+            stopped.close()
+
+    def test_async_llm_clients_come_from_the_registry(self):
+        llm, other = OpenAILLM(api_key='key-a'), OpenAILLM(api_key='key-a')
+
+        async def clients_of_both():
+            return llm.async_openai, other.async_openai
+
+        first, second = asyncio.run(clients_of_both())
+        self.assertIs(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.prompts import CompiledPrompt, ContextManager
+from squad_goals.tools import BaseTool
+
+
+def turn(i, observation):
+    return f'Thought: step {i}\nAction: Page Tool\nAction Input: {{"i": {i}}}\nObservation: {observation}\nNext Thought: (3 thoughts left)'
+
+
+class TestContextManager(unittest.TestCase):
+    def test_large_observation_is_truncated(self):
+        manager = ContextManager(max_observation_tokens=10)
+        fitted = manager.fit_turn(turn(1, 'x' * 1000))
+        self.assertIn('Observation: ' + 'x' * 40 + ' ... [960 characters elided]\nNext Thought:', fitted)
+        self.assertTrue(fitted.startswith('Thought: step 1\nAction: Page Tool'))
+
+    def test_labelled_observations_are_truncated_separately(self):
+        manager = ContextManager(max_observation_tokens=1)
+        fitted = manager.fit_turn('Thought: t\nObservation: [A] aaaaaaaa\nObservation: [B] bbbbbbbb\nNext Thought: (1)')
+        self.assertEqual(fitted, 'Thought: t\nObservation: [A] aaaa ... [4 characters elided]\n'
+                                 'Observation: [B] bbbb ... [4 characters elided]\nNext Thought: (1)')
+
+    def test_old_turns_compacted_then_dropped(self):
+        manager = ContextManager(max_tokens=0, keep_recent_turns=1, compacted_observation_tokens=2)
+        turns = [turn(i, 'y' * 400) for i in range(3)]
+
+        compacted = manager.fit(turns, budget=270)
+        self.assertEqual(compacted[-1], turns[-1])  # recent turn verbatim
+        self.assertIn('Observation: yyyyyyyy ... [392 characters elided]', compacted[0])
+
+        dropped = manager.fit(turns, budget=130)
+        self.assertEqual(dropped, ['[2 earlier thoughts omitted to save space]', turns[-1]])
+
+    def test_prompt_stays_within_budget(self):
+        manager = ContextManager(max_tokens=600, keep_recent_turns=2, max_observation_tokens=200)
+        prompt = CompiledPrompt('Goal: {goal}\n{previous_responses}', context_manager=manager, goal='g')
+        for i in range(50):
+            prompt.append(turn(i, 'z' * 5000))
+            self.assertLessEqual(manager.count_tokens(prompt.render()), 600)
+        self.assertEqual(len(prompt.turns), 50)
+        self.assertTrue(prompt.dynamic_suffix.startswith('[48 earlier thoughts omitted'))
+
+
+class PageTool(BaseTool):
+    def __init__(self):
+        super().__init__("Page Tool", "Returns a big page")
+
+    def run(self, i: int) -> str:
+        return 'page ' * 5000
+
+
+class LoopingLLM(LLM):
+    def __init__(self, **kwargs):
+        self.prompt_sizes = []
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.prompt_sizes.append(len(messages[-1]['content']))
+        return 'Thought: more\nAction: Page Tool\nAction Input: {"i": 1}'
+
+
+class TestAgentContextBudget(unittest.TestCase):
+    def test_prompt_size_is_bounded(self):
+        bounded_llm, unbounded_llm = LoopingLLM(), LoopingLLM()
+        manager = ContextManager(max_tokens=2000, max_observation_tokens=300)
+        Agent(llm=bounded_llm, tools=[PageTool()], max_loops=8, context_manager=manager).run(Task(name='t', goal='g'))
+        Agent(llm=unbounded_llm, tools=[PageTool()], max_loops=8).run(Task(name='t', goal='g'))
+
+        self.assertEqual(len(bounded_llm.prompt_sizes), 8)
+        self.assertLessEqual(max(bounded_llm.prompt_sizes), 2000 * 4)  # ~4 characters per estimated token
+        self.assertGreater(unbounded_llm.prompt_sizes[-1], 150000)
+
+
+if __name__ == "__main__":
+    unittest.main()
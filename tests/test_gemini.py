@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import threading
+import types
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from squad_goals import Agent, Task
+from squad_goals.llms import clients
+from squad_goals.llms.gemini import GeminiLLM
+
+
+def reply_response(text):
+    part = SimpleNamespace(text=text)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason=None)],
+                           usage_metadata=None, parts=[part])
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, content, generation_config=None, stream=False, tools=None):
+        self.model.sent.append((content, len(self.history)))
+        reply = f'reply {len(self.model.sent)}'
+        self.history += [{'role': 'user', 'parts': [content]}, {'role': 'model', 'parts': [reply]}]
+        return iter([reply_response(reply)]) if stream else reply_response(reply)
+
+    async def send_message_async(self, content, **kwargs):
+        return self.send_message(content, **kwargs)
+
+
+class FakeModel:
+    """Records what a google.generativeai.GenerativeModel would be sent."""
+
+    def __init__(self, model_name=None, cached_content=None):
+        self.model_name = model_name
+        self.cached_content = cached_content
+        self.sent = []  # (content, messages already in the chat's history)
+        self.converted = 0  # history messages passed to start_chat
+
+    def start_chat(self, history):
+        self.converted += len(history)
+        return FakeChat(self, history)
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls(cached_content=cached_content)
+
+
+def fake_genai():
+    genai = types.ModuleType('google.generativeai')
+    genai.configure = lambda api_key: None
+    genai.GenerativeModel = FakeModel
+    genai.configs = []
+    genai.types = SimpleNamespace(GenerationConfig=lambda **kwargs: genai.configs.append(kwargs) or kwargs)
+    genai.caching = types.ModuleType('google.generativeai.caching')
+    genai.caching.created, genai.caching.attempts = [], []
+
+    def create(model, contents, ttl):
+        genai.caching.attempts.append(threading.current_thread())
+        if len(contents[0]['parts'][0]) < 20:
+            raise ValueError('Cached content is too small')
+        genai.caching.created.append(contents[0]['parts'][0])
+        return SimpleNamespace(name=f'cachedContents/{len(genai.caching.created)}')
+
+    genai.caching.CachedContent = SimpleNamespace(create=create)
+    google = types.ModuleType('google')
+    google.generativeai = genai
+    return {'google': google, 'google.generativeai': genai, 'google.generativeai.caching': genai.caching}
+
+
+def user(content):
+    return {'role': 'user', 'content': content}
+
+
+def assistant(content):
+    return {'role': 'assistant', 'content': content}
+
+
+class TestGeminiContextCache(unittest.TestCase):
+    def setUp(self):
+        self.modules = fake_genai()
+        patcher = patch.dict(sys.modules, self.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        previous, clients._default_registry = clients._default_registry, None
+        self.addCleanup(setattr, clients, '_default_registry', previous)
+
+    def test_generation_configs_are_built_once_per_kwargs(self):
+        llm = GeminiLLM(api_key='key')
+        self.assertEqual(llm.generate([user('a')]), 'reply 1')
+        self.assertEqual(llm.generate([user('a'), assistant('reply 1'), user('b')]), 'reply 2')
+        self.assertEqual(llm.client.sent[-1], ('b', 2))
+        self.assertEqual(''.join(llm.stream([user('c')])), 'reply 3')
+        self.assertEqual(len(self.modules['google.generativeai'].configs), 1)  # one config for the same kwargs
+        asyncio.run(llm.agenerate([user('d')], temperature=0.5))
+        self.assertEqual(len(self.modules['google.generativeai'].configs), 2)
+
+    def test_static_prefix_context_cache(self):
+        llm = GeminiLLM('gemini-1.5-flash-001', api_key='key', context_cache_ttl=600, context_cache_min_chars=10)
+        prefix = 'You are a research agent with these tools. '
+        llm.cache_static_prefix(prefix)
+        llm.cache_static_prefix(prefix)  # already cached
+        self.assertEqual(self.modules['google.generativeai.caching'].created, [prefix])
+        llm.generate([user(prefix + 'Thought: first')])
+        cached_model = llm._context_caches[prefix][0]
+        self.assertEqual(cached_model.sent, [('Thought: first', 0)])
+        self.assertEqual(llm.client.sent, [])
+
+        llm.cache_static_prefix('too short, refused')
+        self.assertEqual(llm.context_cache_stats['context_cache_errors'], 1)
+        llm.generate([user('another prompt entirely')])
+        self.assertEqual(llm.client.sent, [('another prompt entirely', 0)])
+        self.assertEqual(GeminiLLM(api_key='key').context_cache_stats['context_caches'], 0)  # off by default
+
+    def test_refused_and_unversioned_prefixes_are_not_retried(self):
+        caching = self.modules['google.generativeai.caching']
+        llm = GeminiLLM('gemini-1.5-flash-001', api_key='key', context_cache_ttl=600, context_cache_min_chars=10)
+        for _ in range(3):
+            llm.cache_static_prefix('too short, refused')
+        self.assertEqual((len(caching.attempts), llm.context_cache_stats['context_cache_errors']), (1, 1))
+        llm.generate([user('too short, refused, and the rest')])
+        self.assertEqual(llm.context_cache_stats['context_cache_hits'], 0)
+
+        unversioned = GeminiLLM(api_key='key', context_cache_ttl=600, context_cache_min_chars=10)
+        unversioned.cache_static_prefix('You are a research agent with these tools. ')
+        self.assertEqual(len(caching.attempts), 1)  # the gemini-1.5-flash alias cannot be cached, no request made
+
+    def test_agent_runs_register_their_static_prefix(self):
+        caching = self.modules['google.generativeai.caching']
+        llm = GeminiLLM('gemini-1.5-flash-001', api_key='key', context_cache_ttl=600, context_cache_min_chars=10)
+        agent = Agent(llm=llm, tools=[], max_loops=1)
+        session = agent.new_session(Task(name='t', goal='find the CEO of Acme'))
+        agent.run(session.task, session=session)
+        self.assertEqual(caching.created, [session.prompt.static_prefix])
+        cached_model = llm._context_caches[session.prompt.static_prefix][0]
+        self.assertEqual(len(cached_model.sent), 1)  # the loop's single message went out without the prefix
+        self.assertFalse(cached_model.sent[0][0].startswith(session.prompt.static_prefix[:20]))
+        self.assertEqual((llm.client.sent, llm.context_cache_stats['context_cache_hits']), ([], 1))
+
+        async def run_async():
+            return [event async for event in agent.arun(Task(name='t', goal='find the CEO of Globex'))]
+
+        asyncio.run(run_async())
+        self.assertEqual(len(caching.created), 2)
+        self.assertIsNot(caching.attempts[-1], threading.current_thread())  # created off the event loop
+
+
+if __name__ == '__main__':
+    unittest.main()
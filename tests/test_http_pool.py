@@ -0,0 +1,87 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from squad_goals.tools import APITool
+from squad_goals.utils import http
+from squad_goals.utils.http import HTTPPool, configure_http, http_pool
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    connections = set()
+
+    def _reply(self, body):
+        EchoHandler.connections.add(self.client_address)
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._reply(dict(path=self.path))
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        self._reply(dict(path=self.path, body=json.loads(self.rfile.read(length))))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        EchoHandler.connections = set()
+
+    def test_connections_are_reused(self):
+        pool = HTTPPool()
+        for i in range(5):
+            self.assertEqual(pool.get(f'{self.url}/{i}').json(), dict(path=f'/{i}'))
+        self.assertEqual(pool.post(f'{self.url}/p', json={'a': 1}).json()['body'], {'a': 1})
+        self.assertEqual(len(EchoHandler.connections), 1)  # one handshake for six requests
+        stats = pool.stats()['127.0.0.1']
+        self.assertEqual((stats['requests'], stats['errors'], stats['connections_opened']), (6, 0, 1))
+        self.assertEqual(stats['idle_connections'], 1)
+        pool.close()
+
+    def test_errors_and_per_host_pools(self):
+        pool = HTTPPool(host_pool_sizes={f'127.0.0.1:{self.server.server_port}': 2}, timeout=1)
+        pool.get(self.url)
+        with self.assertRaises(Exception):
+            pool.get('http://127.0.0.1:1/unreachable')
+        stats = pool.stats()['127.0.0.1']
+        self.assertEqual((stats['requests'], stats['errors']), (2, 1))
+        adapter = pool.client.get_adapter(f'{self.url}/')
+        self.assertEqual(adapter._pool_maxsize, 2)
+        pool.close()
+
+    def test_tools_use_the_shared_pool(self):
+        previous = http._default_pool
+        try:
+            pool = configure_http(pool_maxsize=4)
+            self.assertIs(http_pool(), pool)
+            tool = APITool(api_url=f'{self.url}/items/{{item_id}}', api_key=None, api_method='GET')
+            for _ in range(3):
+                self.assertEqual(tool.run(item_id='7', api_payload={'q': 'x'}), dict(path='/items/7?q=x'))
+            self.assertEqual(pool.stats()['127.0.0.1']['connections_opened'], 1)
+        finally:
+            http_pool().close()
+            http._default_pool = previous
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from squad_goals.utils.extraction import extract_json_from_string
+from squad_goals.utils.extraction import extract_all_json_from_string, extract_json_from_string, loads_tolerant
 
 
 class TestExtraction(unittest.TestCase):
@@ -59,5 +59,37 @@ Action Input: {"final_answer": [\"Use a restaurant rating platform (like Yelp or
         result = extract_json_from_string(input_string)
         self.assertIsJson(result)
 
+    def test_python_literals_are_repaired_without_eval(self):
+        input_string = "Action Input: {'query': 'it\\'s \"quoted\"', 'exact': True, 'page': None, 'tags': ['a', 'b',],}"
+        self.assertEqual(extract_json_from_string(input_string),
+                         {'query': 'it\'s "quoted"', 'exact': True, 'page': None, 'tags': ['a', 'b']})
+        self.assertIsNone(extract_json_from_string("{'a': __import__('os').getcwd()}"))
+
+    def test_non_string_keys_are_rejected(self):
+        # eval used to turn these into {1: 2}, JSON object keys have to be strings
+        self.assertIsNone(extract_json_from_string("{1: 2}"))
+        self.assertIsNone(extract_json_from_string("Action Input: {1: 'a', (2, 3): 'b'}"))
+
+    def test_brackets_inside_strings_and_prose(self):
+        input_string = 'I can\'t [decide] yet: {"text": "a } and a ]", "n": [1, {"m": 2}]} then [3]'
+        self.assertEqual(extract_json_from_string(input_string), {'text': 'a } and a ]', 'n': [1, {'m': 2}]})
+        self.assertEqual(extract_all_json_from_string(input_string), [{'text': 'a } and a ]', 'n': [1, {'m': 2}]}, [3]])
+
+    def test_objects_are_preferred(self):
+        self.assertEqual(extract_json_from_string('see [1] for {"a": 1}'), {'a': 1})
+
+    def test_deep_nesting(self):
+        depth = 5000
+        result = extract_json_from_string('text ' + '{"a": ' * depth + '1' + '}' * depth)
+        for _ in range(depth):
+            result = result['a']
+        self.assertEqual(result, 1)
+
+    def test_loads_tolerant_rejects_malformed(self):
+        for malformed in ('{"a" 1}', '{"a": }', '[1 2]', '{"a": 1}}', '[1,,2]', '{1: 2}'):
+            with self.assertRaises(ValueError, msg=malformed):
+                loads_tolerant(malformed)
+
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
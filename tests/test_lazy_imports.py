@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = str(Path(__file__).resolve().parents[1])
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_packages_defer_provider_and_tool_imports(self):
+        loaded = run("import json, sys, squad_goals, squad_goals.tools, squad_goals.llms; "
+                     "print(json.dumps(sorted(m for m in sys.modules if m.startswith('squad_goals.') or m in "
+                     "('serpapi', 'requests', 'openai', 'anthropic', 'pydantic'))))")
+        self.assertEqual(json.loads(loaded), ['squad_goals.llms', 'squad_goals.tools', 'squad_goals.utils',
+                                        'squad_goals.utils.extraction', 'squad_goals.utils.lazy'])
+
+    def test_exports_load_on_first_access(self):
+        import squad_goals
+        from squad_goals import llms, tools
+        from squad_goals.agent import Agent
+        from squad_goals.tools.python_tool import PythonREPLTool
+
+        self.assertIs(squad_goals.Agent, Agent)
+        self.assertIs(tools.PythonREPLTool, PythonREPLTool)
+        self.assertIn('SerpTool', dir(tools))
+        self.assertIn('OpenAILLM', llms.__all__)
+        with self.assertRaises(AttributeError):
+            tools.NotATool
+        self.assertIn("ReverseImageSearchTool", run("from squad_goals.tools import *; print(ReverseImageSearchTool)"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.cache import ResponseCache
+from squad_goals.llms.response import LLMResponse
+
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "%s"}'
+
+
+class CountingLLM(LLM):
+    """Answers with how many calls it has made, optionally taking `latency` seconds."""
+
+    def __init__(self, latency=0., **kwargs):
+        self.latency = latency
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _answer(self):
+        with self._calls_lock:
+            self.calls += 1
+            return LLMResponse(FINAL_ANSWER % f"call {self.calls}", prompt_tokens=10, completion_tokens=5)
+
+    def _generate(self, messages, **kwargs):
+        time.sleep(self.latency)
+        return self._answer()
+
+    async def _agenerate(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._answer()
+
+
+def messages(content='hi'):
+    return [{'role': 'user', 'content': content}]
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_hits_misses_and_kwargs_in_the_key(self):
+        llm = CountingLLM(cache=ResponseCache())
+        first = llm.generate(messages(), stop=['Observation:'])
+        second = llm.generate(messages(), stop=['Observation:'])
+        self.assertEqual(first, second)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.prompt_tokens, 10)
+        llm.generate(messages(), stop=['\n'])
+        llm.generate(messages('hello'), stop=['Observation:'])
+        self.assertEqual(llm.calls, 3)
+        stats = llm.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+        self.assertEqual(stats['hit_rate'], .25)
+
+    def test_ttl_and_lru_eviction(self):
+        llm = CountingLLM(cache=ResponseCache(ttl=0.05, max_entries=2))
+        for content in ('a', 'b', 'c'):
+            llm.generate(messages(content))
+        llm.generate(messages('a'))  # evicted from the LRU by c
+        self.assertEqual(llm.calls, 4)
+        time.sleep(0.06)
+        llm.generate(messages('c'))  # expired
+        self.assertEqual(llm.calls, 5)
+        self.assertEqual(llm.cache.stats()['expired'], 1)
+
+    def test_persists_to_sqlite_and_evicts_by_size(self):
+        path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+        llm = CountingLLM(cache=ResponseCache(path))
+        llm.generate(messages())
+        llm.cache.close()
+
+        restarted = CountingLLM(cache=ResponseCache(path))
+        self.assertTrue(restarted.generate(messages()).cached)
+        self.assertEqual(restarted.calls, 0)
+        self.assertEqual(restarted.cache.stats()['disk_hits'], 1)
+
+        small = ResponseCache(os.path.join(tempfile.mkdtemp(), 'small.db'), max_bytes=300)
+        llm = CountingLLM(cache=small)
+        for content in 'abcdef':
+            llm.generate(messages(content))
+        stats = small.stats()
+        self.assertGreater(stats['evictions'], 0)
+        self.assertLessEqual(stats['disk_bytes'], 300)
+
+    def test_singleflight(self):
+        llm = CountingLLM(latency=0.05, cache=ResponseCache())
+        answers = []
+        threads = [threading.Thread(target=lambda: answers.append(llm.generate(messages()))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(len(set(answers)), 1)
+        self.assertEqual(llm.cache.stats()['shared'], 7)
+
+        async def concurrently():
+            return await asyncio.gather(*(llm.agenerate(messages('async')) for _ in range(5)))
+
+        self.assertEqual(len(set(asyncio.run(concurrently()))), 1)
+        self.assertEqual(llm.calls, 2)
+
+    def test_streams_closed_early_are_cached_for_streams_only(self):
+        llm = CountingLLM(cache=ResponseCache())
+        stream = llm.stream(messages())
+        first = next(stream)
+        stream.close()
+        self.assertEqual(''.join(llm.stream(messages())), first)
+        self.assertEqual(llm.calls, 1)
+        self.assertIn('call 2', llm.generate(messages()))  # generate never gets a text cut short
+
+        streaming = Agent(llm=CountingLLM(cache=ResponseCache()), tools=[], stream=True)
+        for _ in range(2):
+            events = list(streaming.run(Task(name='t', goal='g'), yield_events=True))
+        self.assertIn('call 1', events[-1]['final_answer'])
+        self.assertEqual(streaming.llm.calls, 1)
+
+    def test_agent_reruns_are_served_from_the_cache(self):
+        llm = CountingLLM(cache=ResponseCache())
+        agent = Agent(llm=llm, tools=[])
+        for _ in range(2):
+            events = list(agent.run(Task(name='t', goal='g'), yield_events=True))
+        self.assertIn('call 1', events[-1]['final_answer'])
+        self.assertEqual(llm.calls, 1)
+
+        streaming = Agent(llm=llm, tools=[], stream=True)
+        events = list(streaming.run(Task(name='t', goal='g'), yield_events=True))
+        self.assertIn('call 1', events[-1]['final_answer'])
+        self.assertEqual(llm.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
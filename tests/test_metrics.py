@@ -0,0 +1,88 @@
+import pickle
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.openai import OpenAILLM
+from squad_goals.llms.response import LLMResponse
+from squad_goals.tools import BaseTool
+
+
+class UsageLLM(LLM):
+    """Replays canned generations and reports token usage like a real provider."""
+
+    def __init__(self, responses, **kwargs):
+        self.responses = list(responses)
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        return LLMResponse(self.responses.pop(0), prompt_tokens=100, completion_tokens=20, finish_reason='stop')
+
+
+class NapTool(BaseTool):
+    def __init__(self):
+        super().__init__("Nap Tool", "Sleeps briefly")
+
+    def run(self) -> str:
+        time.sleep(0.02)
+        return 'rested'
+
+
+NAP = 'Thought: rest\nAction: Nap Tool\nAction Input: {}'
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "ok"}'
+
+
+class TestLLMResponse(unittest.TestCase):
+    def test_is_a_string_with_metadata(self):
+        response = LLMResponse('hello', prompt_tokens=3, completion_tokens=2, finish_reason='stop')
+        self.assertEqual(response, 'hello')
+        self.assertEqual(response.upper(), 'HELLO')
+        self.assertEqual(response.total_tokens, 5)
+        self.assertEqual(pickle.loads(pickle.dumps(response)).usage, response.usage)
+
+    def test_generate_wraps_plain_strings_and_times_the_call(self):
+        class PlainLLM(LLM):
+            def _generate(self, messages, **kwargs):
+                return 'plain'
+
+        response = PlainLLM().generate([{'role': 'user', 'content': 'hi'}])
+        self.assertIsInstance(response, LLMResponse)
+        self.assertIsNone(response.prompt_tokens)
+        self.assertGreaterEqual(response.latency, 0)
+
+    def test_openai_usage_is_kept(self):
+        llm = OpenAILLM(api_key='test')
+        llm.openai = MagicMock()
+        llm.openai.chat.completions.create.return_value = SimpleNamespace(
+            model='gpt-4o', usage=SimpleNamespace(prompt_tokens=12, completion_tokens=4),
+            choices=[SimpleNamespace(message=SimpleNamespace(content='hi'), finish_reason='stop')])
+        response = llm.generate([{'role': 'user', 'content': 'hi'}])
+        self.assertEqual((response, response.prompt_tokens, response.completion_tokens, response.finish_reason),
+                         ('hi', 12, 4, 'stop'))
+
+
+class TestAgentMetrics(unittest.TestCase):
+    def test_events_and_task_carry_metrics(self):
+        agent = Agent(llm=UsageLLM([NAP, FINAL_ANSWER]), tools=[NapTool()])
+        task = Task(name='t', goal='g')
+        events = agent.run(task)
+
+        action = next(e for e in events if e['event'] == 'next_agent_action')
+        self.assertEqual((action['metrics']['prompt_tokens'], action['metrics']['finish_reason']), (100, 'stop'))
+        self.assertGreater(action['metrics']['prompt_chars'], 0)
+        tool_run = next(e for e in events if e['event'] == 'tool_run' and e['tool'] == 'Nap Tool')
+        self.assertGreaterEqual(tool_run['metrics']['tool_latency'], 0.02)
+        self.assertTrue(all('totals' in e['metrics'] for e in events))
+
+        totals = events[-1]['metrics']['totals']
+        self.assertEqual((totals['loops'], totals['llm_calls'], totals['tool_calls']), (2, 2, 2))
+        self.assertEqual((totals['prompt_tokens'], totals['completion_tokens']), (200, 40))
+        self.assertIs(task.metrics, agent.last_session.metrics)
+        self.assertGreaterEqual(task.metrics.tool_latency, 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
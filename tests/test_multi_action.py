@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.agent import MULTI_ACTION_PROMPT_TEMPLATE
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool
+
+
+class ScriptedLLM(LLM):
+    def __init__(self, responses, **kwargs):
+        self.responses = list(responses)
+        self.calls = []
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.calls.append(messages)
+        return self.responses[min(len(self.calls), len(self.responses)) - 1]
+
+
+class BarrierSearchTool(BaseTool):
+    """Only returns once `parties` calls are in flight at the same time, so it deadlocks if run sequentially."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+        super().__init__("Search Tool", "Searches for things")
+
+    def run(self, query: str) -> str:
+        '''
+        :param query: The search query
+        '''
+        self.barrier.wait()
+        return f'results for {query}'
+
+
+THREE_SEARCHES = '''Thought: I can look all three up at once
+Action: Search Tool
+Action Input: {"query": "a"}
+Action: Search Tool
+Action Input: {"query": "b"}
+Action: Search Tool
+Action Input: {"query": "c"}'''
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "abc"}'
+
+
+class TestMultiAction(unittest.TestCase):
+    def test_uses_multi_action_template(self):
+        agent = Agent(llm=ScriptedLLM([FINAL_ANSWER]), tools=[], multi_action=True)
+        self.assertEqual(agent.prompt_template, MULTI_ACTION_PROMPT_TEMPLATE)
+
+    def test_parse_all_returns_every_action(self):
+        agent = Agent(llm=ScriptedLLM([FINAL_ANSWER]), tools=[], multi_action=True)
+        self.assertEqual(agent._parse_all(THREE_SEARCHES), [
+            ('Search Tool', '{"query": "a"}'), ('Search Tool', '{"query": "b"}'), ('Search Tool', '{"query": "c"}')
+        ])
+
+    def test_actions_run_concurrently_and_are_observed_together(self):
+        llm = ScriptedLLM([THREE_SEARCHES, FINAL_ANSWER])
+        agent = Agent(llm=llm, tools=[BarrierSearchTool(parties=3)], multi_action=True, max_parallel_tools=3)
+        task = Task(name='t', goal='g')
+
+        events = agent.run(task)
+
+        self.assertTrue(task.succeeded)
+        self.assertEqual(len(llm.calls), 2)
+        self.assertEqual([e['result'] for e in events if e['event'] == 'tool_result'][:3],
+                         ['results for a', 'results for b', 'results for c'])
+        prompt = llm.calls[-1][-1]['content']
+        self.assertIn('Observation: [Search Tool] results for a\nObservation: [Search Tool] results for b', prompt)
+        self.assertEqual(prompt.count('Next Thought: (4 thoughts left)'), 1)
+
+    def test_arun_runs_actions_concurrently(self):
+        llm = ScriptedLLM([THREE_SEARCHES, FINAL_ANSWER])
+        agent = Agent(llm=llm, tools=[BarrierSearchTool(parties=3)], multi_action=True)
+        task = Task(name='t', goal='g')
+
+        async def collect():
+            return [event async for event in agent.arun(task)]
+
+        events = asyncio.run(collect())
+        self.assertEqual(events[-1]['event'], 'agent_completed')
+        self.assertEqual(agent.tools_used, ['Search Tool'] * 3 + ['Return Final Answer Tool'])
+
+
+if __name__ == "__main__":
+    unittest.main()
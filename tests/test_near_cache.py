@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.near_cache import NearDuplicateCache
+
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "%s"}'
+PROMPT = ("Today is 2026-10-18. You are a research assistant with access to a web search tool and a calculator. "
+          "Find the three most cited papers about retrieval augmented generation published in the last two years "
+          "and summarize each of them in one sentence, citing the venue. Prefer peer reviewed venues over preprints, "
+          "skip surveys and position papers, and say so when the citation counts could not be verified. Answer in "
+          "plain text with one numbered line per paper.")
+
+
+class CountingLLM(LLM):
+    def __init__(self, **kwargs):
+        self.calls = 0
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        return FINAL_ANSWER % f"call {self.calls}"
+
+    async def _agenerate(self, messages, **kwargs):
+        return self._generate(messages, **kwargs)
+
+
+def messages(content):
+    return [{'role': 'user', 'content': content}]
+
+
+class TestNearDuplicateCache(unittest.TestCase):
+    def test_volatile_fields_and_small_rewordings_hit(self):
+        cache = NearDuplicateCache()
+        llm = cache.wrap_llm(CountingLLM())
+        first = llm.generate(messages(PROMPT))
+        # another day, different case and spacing: the same prompt once normalized
+        same = llm.generate(messages(PROMPT.replace('2026-10-18', '2026-11-02').upper().replace(' ', '  ')))
+        reworded = llm.generate(messages(PROMPT.replace('summarize each of them', 'summarise each of them')))
+        self.assertEqual(first, same)
+        self.assertEqual(first, reworded)
+        self.assertTrue(reworded.cached)
+        self.assertEqual(llm.llm.calls, 1)
+        stats = cache.stats()
+        self.assertEqual((stats['exact_hits'], stats['near_hits'], stats['misses']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+        self.assertLess(stats['mean_similarity'], 1.)
+
+    def test_different_prompts_and_kwargs_miss(self):
+        llm = NearDuplicateCache().wrap_llm(CountingLLM())
+        llm.generate(messages(PROMPT))
+        llm.generate(messages("Write a haiku about the sea, in the style of Basho, with a seasonal word."))
+        llm.generate(messages(PROMPT.replace('three most cited papers about retrieval augmented generation',
+                                             'five newest blog posts about vector databases for startups')))
+        llm.generate(messages(PROMPT), stop=['Observation:'])  # generation kwargs have to match exactly
+        self.assertEqual(llm.llm.calls, 4)
+        cache = NearDuplicateCache()
+        cold, hot = (cache.wrap_llm(CountingLLM(static_generation_kwargs=dict(temperature=t))) for t in (0., 1.))
+        cold.generate(messages(PROMPT))
+        hot.generate(messages(PROMPT))  # same model and prompt, other settings
+        self.assertEqual((cold.llm.calls, hot.llm.calls), (1, 1))
+
+    def test_dates_and_ids_in_the_question_miss(self):
+        cache = NearDuplicateCache()
+        llm = cache.wrap_llm(CountingLLM())
+        statement = PROMPT + " Also summarize the Fed statement released on %s."
+        llm.generate(messages(statement % '2024-01-05 at 14:00'))
+        llm.generate(messages(statement % '2024-03-20 at 10:30'))
+        llm.generate(messages(statement % '2024-01-05 at 10:30'))
+        order = PROMPT + " Then look up the status of order %s."
+        llm.generate(messages(order % '3f2a1c9e-8b7d-4e6f-9a0b-1c2d3e4f5a6b'))
+        llm.generate(messages(order % '9d8c7b6a-5f4e-4d3c-8b2a-1f0e9d8c7b6a'))
+        self.assertEqual(llm.llm.calls, 5)
+        self.assertEqual(cache.stats()['exact_hits'] + cache.stats()['near_hits'], 0)
+
+    def test_threshold_and_eviction(self):
+        strict = NearDuplicateCache(threshold=1.0, max_entries=1)
+        llm = strict.wrap_llm(CountingLLM())
+        llm.generate(messages(PROMPT))
+        llm.generate(messages(PROMPT.replace('one sentence', 'one short sentence')))
+        llm.generate(messages(PROMPT))  # evicted by the previous prompt
+        self.assertEqual(llm.llm.calls, 3)
+        self.assertEqual(strict.stats()['evictions'], 2)
+
+    def test_audits_measure_accuracy(self):
+        cache = NearDuplicateCache(audit_rate=1.0)
+        llm = cache.wrap_llm(CountingLLM())
+        llm.generate(messages(PROMPT))
+        # every near hit is checked against a fresh completion, which answers "call 2" instead of "call 1"
+        fresh = asyncio.run(llm.agenerate(messages(PROMPT.replace('one sentence', 'a sentence'))))
+        self.assertIn('call 2', fresh)
+        self.assertEqual(cache.stats()['accuracy'], 0.)
+
+        llm.llm.calls = 1  # the next fresh completion is "call 2" again, the answer cached for the closest prompt
+        llm.generate(messages(PROMPT.replace('one sentence', 'a sentence').replace('numbered line', 'numbered row')))
+        stats = cache.stats()
+        self.assertEqual((stats['audits'], stats['audit_agreements']), (2, 1))
+        self.assertEqual(stats['accuracy'], .5)
+
+    def test_per_agent_opt_in(self):
+        llm, cache = CountingLLM(), NearDuplicateCache()
+        cached_agent = Agent(llm=llm, tools=[], near_duplicate_cache=cache)
+        plain_agent = Agent(llm=llm, tools=[])
+        for goal in ('find the CEO of the company and her email', 'find the CEO of the company and his email'):
+            list(cached_agent.run(Task(name='t', goal=goal)))
+        self.assertEqual(llm.calls, 1)
+        self.assertIs(cached_agent.llm, llm)
+        list(plain_agent.run(Task(name='t', goal='find the CEO of the company and her email')))
+        self.assertEqual(llm.calls, 2)
+        self.assertEqual(cache.stats()['near_hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from squad_goals import Agent, AgentPool, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.pool import percentile
+from squad_goals.tools import BaseTool
+
+
+class Gauge:
+    """Tracks how many callers are inside a section at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.current -= 1
+
+
+class SlowLLM(LLM):
+    provider = 'slow'
+
+    def __init__(self, delay=0.02, **kwargs):
+        self.delay = delay
+        self.gauge = Gauge()
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        with self.gauge:
+            time.sleep(self.delay)
+        if 'BROKEN' in prompt:
+            raise RuntimeError('provider is down')
+        if 'Observation: looked' in prompt:
+            return 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "ok"}'
+        return 'Thought: look\nAction: Slow Tool\nAction Input: {}'
+
+
+class SlowTool(BaseTool):
+    def __init__(self):
+        super().__init__("Slow Tool", "Takes a while")
+        self.gauge = Gauge()
+
+    def run(self) -> str:
+        with self.gauge:
+            time.sleep(0.02)
+        return 'looked'
+
+
+class TestAgentPool(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertIsNone(percentile([], 50))
+
+    def test_run_many_respects_limits_and_reports_stats(self):
+        llm, tool = SlowLLM(), SlowTool()
+        pool = AgentPool(Agent(llm=llm, tools=[tool]), max_concurrency=8,
+                         provider_limits={'slow': 3}, tool_limits={'Slow Tool': 2})
+        tasks = (Task(name=f't{i}', goal=f'goal {i}') for i in range(12))  # consumed lazily
+
+        results = list(pool.run_many(tasks))
+
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(result.succeeded and result.task.completed for result in results))
+        self.assertEqual(llm.gauge.peak, 3)
+        self.assertEqual(tool.gauge.peak, 2)
+        self.assertEqual(pool.stats.completed, 12)
+        self.assertGreater(pool.stats.throughput, 0)
+        self.assertLessEqual(pool.stats.p50, pool.stats.p95)
+        self.assertLessEqual(pool.stats.p95, pool.stats.p99)
+
+    def test_results_stream_in_completion_order_and_failures_are_reported(self):
+        agent = Agent(llm=SlowLLM(), tools=[SlowTool()])
+        tasks = [Task(name='slow', goal='goal'), Task(name='broken', goal='BROKEN')]
+        results = list(agent.run_many(tasks, max_concurrency=2))
+        self.assertEqual([result.task.name for result in results], ['broken', 'slow'])
+        self.assertIsInstance(results[0].error, RuntimeError)
+        self.assertFalse(results[0].succeeded)
+        self.assertEqual(results[1].events[-1]['final_answer'], '"ok"')
+
+    def test_stopping_early_does_not_wait_for_pending_runs(self):
+        pool = AgentPool(Agent(llm=SlowLLM(delay=0.2), tools=[SlowTool()]), max_concurrency=2)
+        results = pool.run_many(Task(name=f't{i}', goal='g') for i in range(6))
+        next(results)
+        start = time.perf_counter()
+        results.close()  # another run is in progress and one was just submitted, neither is waited on
+        self.assertLess(time.perf_counter() - start, 0.2)
+        self.assertIsNotNone(pool.stats.finished_at)
+
+    def test_arun_many_respects_provider_limit(self):
+        llm = SlowLLM()
+        pool = AgentPool(Agent(llm=llm, tools=[SlowTool()]), max_concurrency=10, provider_limits={'slow': 2})
+
+        async def run_all():
+            return [result async for result in pool.arun_many(Task(name=f't{i}', goal='g') for i in range(10))]
+
+        results = asyncio.run(run_all())
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(llm.gauge.peak, 2)
+        self.assertEqual(pool.stats.succeeded, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
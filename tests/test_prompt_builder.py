@@ -0,0 +1,53 @@
+import json
+import unittest
+
+from squad_goals.agent import PROMPT_TEMPLATE
+from squad_goals.prompts import CompiledPrompt
+
+FIELDS = dict(
+    today='2024-01-01',
+    tool_description='Search Tool: searches the web',
+    tool_names='"Search Tool"',
+    goal='Find the {weird} braces',
+    final_answer_dict=json.dumps({"final_answer": "the final answer to return to the user"}),
+    param_value_dict=json.dumps({"param": "value"}),
+)
+
+
+def legacy_render(previous_responses):
+    """How Agent.run used to rebuild the prompt on every loop."""
+    prompt = PROMPT_TEMPLATE.format(**dict(FIELDS, previous_responses='{previous_responses}',
+                                           final_answer_dict='{final_answer_dict}',
+                                           param_value_dict='{param_value_dict}'))
+    return prompt.replace('{previous_responses}', '\n'.join(previous_responses).strip()).replace(
+        '{final_answer_dict}', FIELDS['final_answer_dict']).replace('{param_value_dict}', FIELDS['param_value_dict'])
+
+
+class TestCompiledPrompt(unittest.TestCase):
+    def test_matches_legacy_rendering(self):
+        turns = ['Thought: a\nObservation: {"x": 1}\nNext Thought: (4 thoughts left)', 'Thought: b\n']
+        prompt = CompiledPrompt(PROMPT_TEMPLATE, **FIELDS)
+        self.assertEqual(prompt.render(), legacy_render([]))
+        for i, turn in enumerate(turns):
+            prompt.append(turn)
+            self.assertEqual(prompt.render(), legacy_render(turns[:i + 1]))
+
+    def test_static_prefix_is_stable(self):
+        prompt = CompiledPrompt(PROMPT_TEMPLATE, turns=['Thought: earlier run'], **FIELDS)
+        prefix = prompt.static_prefix
+        prompt.append('Thought: new turn')
+        self.assertIs(prompt.static_prefix, prefix)
+        self.assertTrue(prefix.endswith('First Thought:\n'))
+        self.assertEqual(prompt.dynamic_suffix, 'Thought: earlier run\nThought: new turn\n')
+        self.assertEqual(str(prompt), prefix + prompt.dynamic_suffix)
+
+    def test_template_without_scratchpad(self):
+        prompt = CompiledPrompt('Goal: {goal}', goal='g')
+        prompt.append('ignored by the template but kept')
+        self.assertEqual(prompt.static_prefix, 'Goal: g')
+        self.assertEqual(prompt.turns, ['ignored by the template but kept'])
+        self.assertEqual(prompt.render(), 'Goal: g')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from squad_goals import Agent
+from squad_goals.llms.base_llm import LLM
+from squad_goals.utils.parsing import ReActParser, parse_actions
+
+GENERATION = ('Thought: I need to look this up\n'
+              'Action: [Search Tool]\n'
+              'Action Input: {"query": "a {b}", "filters": {"year": {"range": {"gte": 2020, "lte": 2024}}}}\n'
+              'Observation: results\n'
+              'Next Thought: now echo it\n'
+              'Action:\n'
+              '  Echo Tool\n'
+              'Action Input: {"text": "quote \\" and brace }"}')
+
+
+class TestReActParser(unittest.TestCase):
+    def test_arbitrary_nesting_and_strings(self):
+        actions = parse_actions(GENERATION)
+        self.assertEqual([action.tool for action in actions], ['Search Tool', 'Echo Tool'])
+        self.assertEqual(actions[0].tool_input,
+                         '{"query": "a {b}", "filters": {"year": {"range": {"gte": 2020, "lte": 2024}}}}')
+        self.assertEqual(actions[1].tool_input, '{"text": "quote \\" and brace }"}')
+        self.assertEqual(GENERATION[:actions[0].end].rsplit('\n', 1)[1][-4:], '}}}}')
+
+    def test_chunked_input_matches_whole_input(self):
+        for size in (1, 2, 3, 7, 64):
+            parser = ReActParser()
+            for i in range(0, len(GENERATION), size):
+                parser.feed(GENERATION[i:i + size])
+            self.assertEqual(parser.actions, ReActParser().feed(GENERATION), size)
+
+    def test_incomplete_and_orphan_inputs(self):
+        self.assertEqual(parse_actions('Action: Search Tool\nAction Input: {"query": {"unclosed": 1}'), [])
+        self.assertEqual(parse_actions('Action Input: {"final_answer": 1}'), [])  # no Action line
+        self.assertEqual(ReActParser().feed('Action Input: {"final_answer": 1}')[0].tool, None)
+
+    def test_latest_action_line_wins(self):
+        [action] = parse_actions('Action: First\nThought: no wait\nAction: Second\nAction Input: {}')
+        self.assertEqual(action.tool, 'Second')
+
+    def test_no_backtracking_on_malformed_output(self):
+        malformed = 'Action: Tool\nAction Input: ' + '{' * 20000 + 'x' * 20000
+        self.assertEqual(parse_actions(malformed), [])
+
+
+class TestAgentParse(unittest.TestCase):
+    def test_agent_uses_parser(self):
+        agent = Agent(llm=LLM(), tools=[])
+        self.assertEqual(agent._parse(GENERATION),
+                         ('Search Tool', '{"query": "a {b}", "filters": {"year": {"range": {"gte": 2020, "lte": 2024}}}}'))
+
+    def test_final_answer_json_fallback_is_kept(self):
+        agent = Agent(llm=LLM(), tools=[])
+        self.assertEqual(agent._parse('{"final_answer": "done"}'), ('Return Final Answer Tool', '{"final_answer": "done"}'))
+
+    def test_deeply_nested_tool_input(self):
+        agent = Agent(llm=LLM(), tools=[])
+        depth = 2000
+        tool, tool_input = agent._tool_from_generated(
+            'Action: Search Tool\nAction Input: ' + '{"a": ' * depth + '1' + '}' * depth)
+        self.assertEqual(tool, 'Search Tool')
+        for _ in range(depth):
+            tool_input = tool_input['a']
+        self.assertEqual(tool_input, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
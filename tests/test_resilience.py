@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from squad_goals.llms import resilience
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.resilience import HedgePolicy, RetryPolicy, is_retryable, retry_after
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type('Response', (), dict(headers=headers or {}))()
+
+
+class FlakyLLM(LLM):
+    """Raises the scripted errors in order, then answers."""
+
+    def __init__(self, errors, delays=(), **kwargs):
+        self.errors = list(errors)
+        self.delays = list(delays)  # seconds each call takes, in order
+        self.calls = 0
+        super().__init__(**kwargs)
+
+    def _next(self):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0.
+        if self.errors:
+            raise self.errors.pop(0)
+        return delay, f'answer {self.calls}'
+
+    def _generate(self, messages, **kwargs):
+        delay, answer = self._next()
+        time.sleep(delay)
+        return answer
+
+    async def _agenerate(self, messages, **kwargs):
+        delay, answer = self._next()
+        await asyncio.sleep(delay)
+        return answer
+
+    def _stream(self, messages, **kwargs):
+        answer = self._generate(messages, **kwargs)  # fails before the first chunk
+        yield 'first '
+        yield answer
+
+
+FAST_RETRY = RetryPolicy(base_delay=0.001, max_delay=0.01)
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_classification(self):
+        self.assertTrue(is_retryable(APIError(429)))
+        self.assertTrue(is_retryable(APIError(503)))
+        self.assertTrue(is_retryable(TimeoutError()))
+        self.assertFalse(is_retryable(APIError(400)))
+        self.assertFalse(is_retryable(ValueError('bad input')))
+
+    def test_backoff_is_bounded_and_honors_retry_after(self):
+        policy = RetryPolicy(base_delay=1., max_delay=5., jitter=False)
+        self.assertEqual([policy.delay(attempt) for attempt in range(1, 6)], [1., 2., 4., 5., 5.])
+        jittered = RetryPolicy(base_delay=1., max_delay=5.)
+        self.assertTrue(all(0 <= jittered.delay(3) <= 4. for _ in range(100)))
+        self.assertEqual(retry_after(APIError(429, {'retry-after': '2'})), 2.)
+        self.assertEqual(retry_after(APIError(429, {'retry-after-ms': '250'})), .25)
+        self.assertEqual(policy.delay(1, APIError(429, {'retry-after': '60'})), 5.)
+
+
+class TestLLMRetries(unittest.TestCase):
+    def test_rate_limit_is_retried(self):
+        llm = FlakyLLM([APIError(429, {'retry-after': '0.01'}), APIError(503)], retry=FAST_RETRY)
+        self.assertEqual(llm.generate(MESSAGES), 'answer 3')
+        self.assertEqual(llm.resilience_stats['retries'], 2)
+
+    def test_non_retryable_and_exhausted_errors_are_raised(self):
+        llm = FlakyLLM([APIError(400)], retry=FAST_RETRY)
+        with self.assertRaises(APIError):
+            llm.generate(MESSAGES)
+        self.assertEqual(llm.calls, 1)
+
+        llm = FlakyLLM([APIError(500)] * 5, retry=FAST_RETRY)
+        with self.assertRaises(APIError):
+            asyncio.run(llm.agenerate(MESSAGES))
+        self.assertEqual(llm.calls, FAST_RETRY.max_attempts)
+
+        llm = FlakyLLM([APIError(429)], retry=None)
+        with self.assertRaises(APIError):
+            llm.generate(MESSAGES)
+
+    def test_stream_retried_only_before_first_chunk(self):
+        llm = FlakyLLM([APIError(429)], retry=FAST_RETRY)
+        self.assertEqual(''.join(llm.stream(MESSAGES)), 'first answer 2')
+
+        class MidStreamFailure(FlakyLLM):
+            def _stream(self, messages, **kwargs):
+                self.calls += 1
+                yield 'partial '
+                raise APIError(503)
+
+        llm = MidStreamFailure([], retry=FAST_RETRY)
+        with self.assertRaises(APIError):
+            list(llm.stream(MESSAGES))
+        self.assertEqual(llm.calls, 1)
+
+
+class TestHedging(unittest.TestCase):
+    def test_threshold_is_the_quantile_of_recent_latencies(self):
+        policy = HedgePolicy(min_samples=10)
+        self.assertIsNone(policy.threshold([1.] * 9))
+        self.assertEqual(policy.threshold([i / 100 for i in range(1, 101)]), .95)
+        self.assertEqual(HedgePolicy(after=.2).threshold([]), .2)
+
+    def test_slow_call_is_hedged(self):
+        llm = FlakyLLM([], delays=[1., 0.], hedge=HedgePolicy(after=0.05))
+        start = time.perf_counter()
+        self.assertEqual(llm.generate(MESSAGES), 'answer 2')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(llm.resilience_stats, dict(retries=0, hedged=1, hedge_wins=1))
+
+    def test_async_slow_call_is_hedged(self):
+        llm = FlakyLLM([], delays=[1., 0.], hedge=HedgePolicy(after=0.05))
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(llm.agenerate(MESSAGES)), 'answer 2')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(llm.resilience_stats['hedge_wins'], 1)
+
+    def test_concurrent_first_hedges_share_one_executor(self):
+        previous, resilience._hedge_executor = resilience._hedge_executor, None
+        barrier, executors = threading.Barrier(8), []
+
+        def first_call():
+            barrier.wait()
+            executors.append(resilience._executor())
+
+        threads = [threading.Thread(target=first_call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(executor) for executor in executors}), 1)
+        executors[0].shutdown()
+        resilience._hedge_executor = previous
+
+    def test_fast_call_is_not_hedged(self):
+        llm = FlakyLLM([], hedge=HedgePolicy(after=0.5))
+        self.assertEqual(llm.generate(MESSAGES), 'answer 1')
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(llm.resilience_stats['hedged'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
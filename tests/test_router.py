@@ -0,0 +1,134 @@
+import asyncio
+import time
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.router import AllBackendsFailed, RouterLLM
+
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "from %s"}'
+
+
+class StubLLM(LLM):
+    """A local backend with a fixed latency that can be switched to failing."""
+
+    def __init__(self, provider, latency=0., failing=False):
+        self.provider = provider
+        self.latency = latency
+        self.failing = failing
+        self.calls = 0
+        super().__init__(retry=None)
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.failing:
+            raise ConnectionError(f"{self.provider} is down")
+        return FINAL_ANSWER % self.provider
+
+    async def _agenerate(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failing:
+            raise ConnectionError(f"{self.provider} is down")
+        return FINAL_ANSWER % self.provider
+
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+def answered_by(response):
+    return response.rsplit('from ', 1)[1].rstrip('"}')
+
+
+class TestRouterLLM(unittest.TestCase):
+    def test_routes_to_the_fastest_backend(self):
+        slow, fast = StubLLM('slow', latency=0.02), StubLLM('fast', latency=0.)
+        router = RouterLLM([slow, fast], explore=0)
+        # both are measured once, then the fast one gets every request
+        answers = [answered_by(router.generate(MESSAGES)) for _ in range(6)]
+        self.assertEqual(sorted(answers[:2]), ['fast', 'slow'])
+        self.assertEqual(answers[2:], ['fast'] * 4)
+        stats = router.routing_stats()
+        self.assertEqual(list(stats), ['fast:StubLLM', 'slow:StubLLM'])
+        self.assertEqual(stats['fast:StubLLM']['calls'], 5)
+        self.assertLess(stats['fast:StubLLM']['latency'], stats['slow:StubLLM']['latency'])
+
+    def test_fails_over_and_cools_down(self):
+        primary, backup = StubLLM('primary'), StubLLM('backup', latency=0.05)  # well above the primary's call overhead
+        router = RouterLLM([primary, backup], explore=0, failure_threshold=2, cooldown=60)
+        for _ in range(2):
+            router.generate(MESSAGES)
+        primary.failing = True
+        self.assertEqual([answered_by(router.generate(MESSAGES)) for _ in range(3)], ['backup'] * 3)
+        # after two failures in a row the primary sits out the cooldown instead of being tried first
+        self.assertEqual(primary.calls, 1 + 2)  # the warm-up measured each backend once
+        stats = router.routing_stats()
+        self.assertFalse(stats['primary:StubLLM']['healthy'])
+        self.assertEqual(stats['primary:StubLLM']['errors'], 2)
+        self.assertGreater(stats['primary:StubLLM']['error_rate'], 0)
+
+        primary.failing = False
+        router.stats[0].unhealthy_until = 0.  # the cooldown is over
+        self.assertEqual(answered_by(router.generate(MESSAGES)), 'primary')
+
+    def test_all_backends_failing(self):
+        router = RouterLLM([StubLLM('a', failing=True), StubLLM('b', failing=True)], explore=0)
+        with self.assertRaises(AllBackendsFailed) as raised:
+            router.generate(MESSAGES)
+        self.assertEqual(set(raised.exception.errors), {'a:StubLLM', 'b:StubLLM'})
+
+    def test_bad_requests_are_raised_without_failing_over(self):
+        primary, backup = StubLLM('primary'), StubLLM('backup', latency=0.05)
+        router = RouterLLM([primary, backup], explore=0, failure_threshold=1)
+        for _ in range(2):
+            router.generate(MESSAGES)
+
+        def bad_request(messages, **kwargs):
+            raise TypeError("unexpected keyword argument 'temprature'")
+
+        primary._generate = bad_request
+        with self.assertRaises(TypeError):
+            router.generate(MESSAGES)
+        with self.assertRaises(TypeError):
+            list(router.stream(MESSAGES))
+        self.assertEqual(backup.calls, 1)  # only the warm-up, the bad request was not sent on
+        self.assertEqual(router.routing_stats()['primary:StubLLM']['errors'], 0)
+        self.assertTrue(router.routing_stats()['primary:StubLLM']['healthy'])
+
+    def test_async_and_stream_fail_over(self):
+        down, up = StubLLM('down', failing=True), StubLLM('up')
+        router = RouterLLM([down, up], explore=0)
+        self.assertEqual(answered_by(asyncio.run(router.agenerate(MESSAGES))), 'up')
+        self.assertEqual(answered_by(''.join(router.stream(MESSAGES))), 'up')
+
+        async def consume():
+            return ''.join([chunk async for chunk in router.astream(MESSAGES)])
+
+        self.assertEqual(answered_by(asyncio.run(consume())), 'up')
+
+    def test_streams_closed_early_update_the_latency(self):
+        router = RouterLLM([StubLLM('only')], explore=0)
+        stream = router.stream(MESSAGES)
+        next(stream)
+        stream.close()  # the agent stops reading once it has parsed the next action
+
+        async def consume_one():
+            stream = router.astream(MESSAGES)
+            await stream.__anext__()
+            await stream.aclose()
+
+        asyncio.run(consume_one())
+        stats = router.routing_stats()['only:StubLLM']
+        self.assertEqual((stats['calls'], stats['errors']), (2, 0))
+        self.assertIsNotNone(stats['latency'])
+
+    def test_agent_runs_on_a_router(self):
+        router = RouterLLM([StubLLM('down', failing=True), StubLLM('up')], explore=0)
+        agent = Agent(llm=router, tools=[])
+        events = list(agent.run(Task(name='t', goal='g'), yield_events=True))
+        self.assertIn('from up', events[-1]['final_answer'])
+
+
+if __name__ == '__main__':
+    unittest.main()
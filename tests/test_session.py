@@ -0,0 +1,94 @@
+import asyncio
+import re
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.session import AgentSession
+from squad_goals.tools import BaseTool
+
+
+class GoalEchoLLM(LLM):
+    """Answers with a tool call derived from the goal in the prompt, so concurrent runs can be told apart."""
+
+    def __init__(self, **kwargs):
+        self.barrier = None
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        goal = re.search(r'Task: (\w+)', prompt).group(1)
+        if f'Observation: {goal.upper()}' in prompt:
+            return f'Thought: done\nAction: Return Final Answer Tool\nAction Input: {{"final_answer": "{goal}"}}'
+        if self.barrier:  # make sure the runs really overlap
+            self.barrier.wait(timeout=5)
+        return f'Thought: echo\nAction: Echo Tool\nAction Input: {{"text": "{goal}"}}'
+
+
+class EchoTool(BaseTool):
+    def __init__(self):
+        super().__init__("Echo Tool", "Echoes the input back")
+
+    def run(self, text: str) -> str:
+        '''
+        :param text: The text to echo
+        '''
+        return text.upper()
+
+
+class TestAgentSession(unittest.TestCase):
+    def test_concurrent_threaded_runs_do_not_leak(self):
+        llm = GoalEchoLLM()
+        llm.barrier = threading.Barrier(4)
+        agent = Agent(llm=llm, tools=[EchoTool()])
+        tasks = [Task(name=f't{i}', goal=f'Task: goal{i}') for i in range(4)]
+        sessions = [agent.new_session(task) for task in tasks]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda session: agent.run(session.task, session=session), sessions))
+
+        for i, (task, session) in enumerate(zip(tasks, sessions)):
+            self.assertEqual(task.output, f'"goal{i}"')
+            self.assertEqual(session.tools_used, ['Echo Tool', 'Return Final Answer Tool'])
+            self.assertEqual(session.num_loops, 2)
+            self.assertTrue(all(f'goal{i}' in response for response in session.ai_responses))
+
+    def test_concurrent_async_runs_do_not_leak(self):
+        agent = Agent(llm=GoalEchoLLM(), tools=[EchoTool()])
+        tasks = [Task(name=f't{i}', goal=f'Task: goal{i}') for i in range(10)]
+
+        async def run_all():
+            async def run_one(task):
+                return [event async for event in agent.arun(task)]
+            return await asyncio.gather(*(run_one(task) for task in tasks))
+
+        results = asyncio.run(run_all())
+        for i, events in enumerate(results):
+            self.assertEqual((events[-1]['event'], events[-1]['final_answer']), ('agent_completed', f'"goal{i}"'))
+
+    def test_runs_start_fresh_unless_given_history(self):
+        agent = Agent(llm=GoalEchoLLM(), tools=[EchoTool()])
+        agent.run(Task(name='t', goal='Task: first'))
+        first = agent.last_session
+        agent.run(Task(name='t', goal='Task: second'))
+        self.assertIsNot(agent.last_session, first)
+        self.assertEqual(agent.tools_used, ['Echo Tool', 'Return Final Answer Tool'])
+        self.assertFalse(any('first' in response for response in agent.ai_responses))
+
+        session = agent.new_session(Task(name='t', goal='Task: third'), history=first.ai_responses)
+        self.assertIsInstance(session, AgentSession)
+        self.assertIn(first.ai_responses[0], session.prompt.render())
+
+    def test_default_tools_are_not_shared(self):
+        first, second = Agent(llm=GoalEchoLLM()), Agent(llm=GoalEchoLLM())
+        self.assertEqual(len(first.tools), 1)
+        self.assertIsNot(first.tools, second.tools)
+        tools = [EchoTool()]
+        Agent(llm=GoalEchoLLM(), tools=tools)
+        self.assertEqual(len(tools), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.utils.parsing import ActionInputWatcher
+
+FINAL_ANSWER_CHUNKS = ['Thought: I know', ' this\nAction: Return Final', ' Answer Tool\nAction In', 'put: {"final_',
+                       'answer": "{42}"', '}\nObservation: made up', ' observation', ' that costs tokens']
+
+
+class StreamingLLM(LLM):
+    """Streams canned chunks and records how many the caller actually consumed."""
+
+    def __init__(self, chunks, **kwargs):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        return ''.join(self.chunks)
+
+    def _stream(self, messages, **kwargs):
+        try:
+            for chunk in self.chunks:
+                self.consumed += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+def feed_all(watcher, chunks):
+    return [watcher.feed(chunk) for chunk in chunks]
+
+
+class TestActionInputWatcher(unittest.TestCase):
+    def test_detects_close_across_chunks(self):
+        watcher = ActionInputWatcher()
+        text = ''.join(FINAL_ANSWER_CHUNKS[:6])
+        self.assertEqual(feed_all(watcher, FINAL_ANSWER_CHUNKS[:6]), [False] * 5 + [True])
+        self.assertEqual(text[:watcher.end], text[:text.index('}\n') + 1])
+
+    def test_braces_inside_strings_and_nesting(self):
+        watcher = ActionInputWatcher()
+        self.assertFalse(watcher.feed('Action Input: {"a": {"b": "}\\"{"}'))
+        self.assertTrue(watcher.feed(', "c": 1}'))
+
+    def test_no_action_input(self):
+        watcher = ActionInputWatcher()
+        self.assertEqual(feed_all(watcher, ['{"final_answer": 1}', ' done']), [False, False])
+
+
+class TestStreamingAgent(unittest.TestCase):
+    def test_tokens_are_emitted_and_generation_cancelled(self):
+        llm = StreamingLLM(FINAL_ANSWER_CHUNKS)
+        agent = Agent(llm=llm, tools=[], stream=True)
+        task = Task(name='t', goal='g')
+
+        events = list(agent.run(task, yield_events=True))
+
+        tokens = [e['token'] for e in events if e['event'] == 'token']
+        self.assertEqual(tokens, FINAL_ANSWER_CHUNKS[:6])
+        self.assertEqual(llm.consumed, 6)
+        self.assertTrue(llm.closed)
+        action = next(e for e in events if e['event'] == 'next_agent_action')
+        self.assertTrue(action['generated'].endswith('"{42}"}'))
+        self.assertEqual(task.output, '"{42}"')
+
+    def test_arun_streams_with_fallback_chunking(self):
+        llm = StreamingLLM(FINAL_ANSWER_CHUNKS)
+        agent = Agent(llm=llm, tools=[], stream=True)
+        task = Task(name='t', goal='g')
+
+        async def collect():
+            return [event async for event in agent.arun(task)]
+
+        events = asyncio.run(collect())
+        # no native async stream, so the base class yields the whole completion as one token
+        self.assertEqual([e['event'] for e in events][:2], ['token', 'next_agent_action'])
+        self.assertEqual(events[-1]['event'], 'agent_completed')
+
+
+if __name__ == "__main__":
+    unittest.main()
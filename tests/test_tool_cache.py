@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import ApolloTool, BaseTool, ToolCache
+
+
+class ScriptedLLM(LLM):
+    def __init__(self, responses, **kwargs):
+        self.responses = list(responses)
+        self.calls = 0
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        return self.responses[min(self.calls, len(self.responses)) - 1]
+
+
+class SearchTool(BaseTool):
+    cacheable = True
+
+    def __init__(self, latency=0.):
+        self.latency = latency
+        self.calls = 0
+        super().__init__("Search Tool", "Searches for things")
+
+    def run(self, query: str, limit: int = None) -> str:
+        '''
+        :param query: The search query
+        :param limit: optional maximum number of results
+        '''
+        self.calls += 1
+        time.sleep(self.latency)
+        return f'results for {query} #{self.calls}'
+
+
+class SheetTool(BaseTool):
+    """Reads are cacheable, appends are writes."""
+
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        super().__init__("Sheet Tool", "Reads and appends rows")
+
+    def is_cacheable(self, tool_input):
+        return tool_input.get('action') == 'read'
+
+    def run(self, action: str, row: str = None):
+        '''
+        :param action: "read" or "append"
+        :param row: the row to append
+        '''
+        self.calls += 1
+        if action == 'append':
+            self.rows.append(row)
+            return 'appended'
+        return list(self.rows)
+
+
+def action(tool, tool_input):
+    return f'Thought: next\nAction: {tool}\nAction Input: {tool_input}'
+
+
+FINAL = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "done"}'
+
+
+class TestToolCache(unittest.TestCase):
+    def test_normalized_inputs_share_a_result(self):
+        cache, tool = ToolCache(), SearchTool()
+        first, hit = cache.run(tool, {'query': 'coffee  shops'}, lambda: tool.run(query='coffee shops'))
+        self.assertFalse(hit)
+        second, hit = cache.run(tool, {'query': ' coffee shops', 'limit': None}, lambda: tool.run(query='x'))
+        self.assertTrue(hit)
+        self.assertEqual(first, second)
+        cache.run(tool, {'query': 'coffee shops', 'limit': 5}, lambda: tool.run(query='coffee shops', limit=5))
+        self.assertEqual(tool.calls, 2)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_ttl_and_bounded_memory(self):
+        cache, tool = ToolCache(ttl=0.05, max_entries=2), SearchTool()
+        for query in ('a', 'b', 'c'):
+            cache.run(tool, {'query': query}, lambda: tool.run(query=query))
+        self.assertEqual(len(cache), 2)
+        cache.run(tool, {'query': 'a'}, lambda: tool.run(query='a'))  # evicted
+        time.sleep(0.06)
+        cache.run(tool, {'query': 'c'}, lambda: tool.run(query='c'))  # expired
+        self.assertEqual(tool.calls, 5)
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['expired']), (2, 1))
+
+        tool.cache_ttl = 60  # a per-tool ttl wins over the cache's
+        cache.run(tool, {'query': 'd'}, lambda: tool.run(query='d'))
+        time.sleep(0.06)
+        self.assertTrue(cache.run(tool, {'query': 'd'}, lambda: tool.run(query='d'))[1])
+
+        small = ToolCache(max_bytes=40)
+        for query in ('a', 'b', 'c'):
+            small.run(tool, {'query': query}, lambda: tool.run(query=query))
+        self.assertLessEqual(small.stats()['bytes'], 40)
+
+    def test_writes_bypass_and_invalidate(self):
+        cache, sheet = ToolCache(), SheetTool()
+
+        def run(tool_input):
+            return cache.run(sheet, tool_input, lambda: sheet.run(**tool_input))
+
+        self.assertEqual(run({'action': 'read'}), ([], False))
+        self.assertEqual(run({'action': 'read'}), ([], True))
+        for _ in range(2):  # identical writes both run
+            self.assertEqual(run({'action': 'append', 'row': 'x'}), ('appended', False))
+        self.assertEqual(run({'action': 'read'}), (['x', 'x'], False))
+        stats = cache.stats()
+        self.assertEqual((stats['bypassed'], stats['invalidations']), (2, 1))
+
+    def test_same_named_tools_on_other_data_keep_their_own_results(self):
+        cache, first, second = ToolCache(), SheetTool(), SheetTool()
+        first.cache_namespace, second.cache_namespace = 'sheet-a', 'sheet-b'
+        second.rows.append('b')
+
+        def run(sheet, tool_input):
+            return cache.run(sheet, tool_input, lambda: sheet.run(**tool_input))
+
+        self.assertEqual(run(first, {'action': 'read'}), ([], False))
+        self.assertEqual(run(second, {'action': 'read'}), (['b'], False))
+        run(first, {'action': 'append', 'row': 'a'})  # only clears the first sheet's reads
+        self.assertEqual(run(second, {'action': 'read'}), (['b'], True))
+        self.assertEqual(run(first, {'action': 'read'}), (['a'], False))
+        cache.invalidate('Sheet Tool')  # by name, every namespace
+        self.assertEqual(len(cache), 0)
+
+        apollo_a, apollo_b = ApolloTool('key-a'), ApolloTool('key-b')
+        self.assertNotEqual(apollo_a.cache_namespace, apollo_b.cache_namespace)
+        self.assertEqual(apollo_a.cache_namespace, ApolloTool('key-a').cache_namespace)
+        self.assertNotIn('key-a', apollo_a.cache_namespace)
+
+    def test_concurrent_identical_calls_share_a_run(self):
+        cache, tool = ToolCache(), SearchTool(latency=0.05)
+        threads = [threading.Thread(target=cache.run, args=(tool, {'query': 'q'}, lambda: tool.run(query='q')))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tool.calls, 1)
+        self.assertEqual(cache.stats()['shared'], 5)
+
+        async def concurrently():
+            return await asyncio.gather(*(cache.arun(tool, {'query': 'r'}, lambda: tool.arun(query='r'))
+                                          for _ in range(4)))
+
+        results = asyncio.run(concurrently())
+        self.assertEqual(len({result for result, _ in results}), 1)
+        self.assertEqual(tool.calls, 2)
+
+
+class TestAgentToolCache(unittest.TestCase):
+    def test_identical_calls_in_a_run_are_deduped(self):
+        tool = SearchTool()
+        llm = ScriptedLLM([action('Search Tool', '{"query": "q"}')] * 2 + [FINAL])
+        agent = Agent(llm=llm, tools=[tool], max_loops=5)
+        for _ in range(2):
+            llm.calls = 0
+            list(agent.run(Task(name='t', goal='g')))
+        self.assertEqual(tool.calls, 2)  # once per run, each run has its own dedup cache
+
+    def test_shared_cache_across_runs_and_writes(self):
+        search, sheet, cache = SearchTool(), SheetTool(), ToolCache()
+        llm = ScriptedLLM([action('Search Tool', '{"query": "q"}'),
+                           action('Sheet Tool', '{"action": "append", "row": "r"}'), FINAL])
+        agent = Agent(llm=llm, tools=[search, sheet], tool_cache=cache, max_loops=5)
+        for _ in range(2):
+            llm.calls = 0
+            events = list(agent.run(Task(name='t', goal='g'), yield_events=True))
+        self.assertEqual(search.calls, 1)
+        self.assertEqual(sheet.rows, ['r', 'r'])
+        self.assertEqual(events[-1]['event'], 'agent_completed')
+
+
+if __name__ == '__main__':
+    unittest.main()
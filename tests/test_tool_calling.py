@@ -0,0 +1,87 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from squad_goals import Agent, Task
+from squad_goals.agent import TOOL_CALLING_PROMPT_TEMPLATE
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.openai import OpenAILLM
+from squad_goals.tools import BaseTool, ToolRegistry
+
+
+class ToolCallingLLM(LLM):
+    """Replays canned (text, tool_calls) replies from a native tool-calling API."""
+
+    def __init__(self, replies, **kwargs):
+        self.replies = list(replies)
+        self.calls = []
+        super().__init__(**kwargs)
+
+    def _generate_with_tools(self, messages, tools, **kwargs):
+        self.calls.append(dict(messages=messages, tools=tools, kwargs=kwargs))
+        return self.replies[len(self.calls) - 1]
+
+
+class WeatherTool(BaseTool):
+    def __init__(self):
+        super().__init__("Weather Tool", "Gets the weather for a city")
+
+    def run(self, city: str) -> str:
+        '''
+        :param city: The city to get the weather for
+        '''
+        return f'sunny in {city}'
+
+
+class TestToolCallingAgent(unittest.TestCase):
+    def test_structured_calls_drive_the_loop(self):
+        llm = ToolCallingLLM([
+            ('Checking the weather', [dict(name='Weather_Tool', arguments={'city': 'Paris'})]),
+            ('', [dict(name='Return_Final_Answer_Tool', arguments={'final_answer': 'sunny'})]),
+        ])
+        agent = Agent(llm=llm, tools=[WeatherTool()], tool_calling=True)
+        task = Task(name='t', goal='weather in paris?')
+
+        events = agent.run(task)
+
+        self.assertEqual(agent.prompt_template, TOOL_CALLING_PROMPT_TEMPLATE)
+        self.assertEqual(agent.tools_used, ['Weather Tool', 'Return Final Answer Tool'])
+        self.assertEqual((events[-1]['event'], events[-1]['final_answer']), ('agent_completed', '"sunny"'))
+        self.assertEqual([spec.function_name for spec in llm.calls[0]['tools']],
+                         ['Weather_Tool', 'Return_Final_Answer_Tool'])
+        self.assertNotIn('stop', llm.calls[0]['kwargs'])
+        second_prompt = llm.calls[1]['messages'][-1]['content']
+        self.assertIn('Action: Weather Tool\nAction Input: {"city": "Paris"}\nObservation: sunny in Paris', second_prompt)
+        self.assertNotIn('Thought/Action/Action Input/Observation', second_prompt)
+
+    def test_plain_text_reply_is_the_final_answer(self):
+        agent = Agent(llm=ToolCallingLLM([('It is sunny.', [])]), tools=[], tool_calling=True)
+        task = Task(name='t', goal='g')
+        agent.run(task)
+        self.assertTrue(task.succeeded)
+        self.assertEqual(task.output, '"It is sunny."')
+
+    def test_stream_and_tool_calling_are_exclusive(self):
+        with self.assertRaises(ValueError):
+            Agent(llm=ToolCallingLLM([]), tools=[], tool_calling=True, stream=True)
+
+
+class TestOpenAIToolSchemas(unittest.TestCase):
+    def test_schema_and_response_conversion(self):
+        llm = OpenAILLM(api_key='test')
+        message = SimpleNamespace(content=None, tool_calls=[
+            SimpleNamespace(function=SimpleNamespace(name='Weather_Tool', arguments='{"city": "Paris"}'))])
+        llm.openai = MagicMock()
+        llm.openai.chat.completions.create.return_value = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        specs = ToolRegistry([WeatherTool()]).specs
+        text, tool_calls = llm.generate_with_tools([{'role': 'user', 'content': 'hi'}], specs)
+
+        self.assertEqual((text, tool_calls), ('', [dict(name='Weather_Tool', arguments={'city': 'Paris'})]))
+        sent_tools = llm.openai.chat.completions.create.call_args.kwargs['tools']
+        self.assertEqual(sent_tools[0]['function']['name'], 'Weather_Tool')
+        self.assertEqual(sent_tools[0]['function']['parameters']['required'], ['city'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from typing import List, Optional
+from unittest.mock import patch
+
+from squad_goals import Agent
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool, PythonREPLTool, ReturnFinalAnswerTool, ToolRegistry
+
+
+class NoopLLM(LLM):
+    def _generate(self, messages, **kwargs):
+        return ''
+
+
+class LookupTool(BaseTool):
+    def __init__(self):
+        super().__init__("Lookup Tool", "Looks things up")
+
+    def run(self, query: str, limit: Optional[int] = 5, tags: List[str] = None, **kwargs) -> list:
+        '''
+        :param query: what to look up
+        '''
+        return []
+
+
+class TestToolRegistry(unittest.TestCase):
+    def test_parameter_schema(self):
+        spec = ToolRegistry([LookupTool()]).spec_by_name['Lookup Tool']
+        self.assertEqual(spec.parameters, {
+            'type': 'object',
+            'properties': {'query': {'type': 'string'}, 'limit': {'type': 'integer'}, 'tags': {'type': 'array'}},
+            'required': ['query'],
+            'additionalProperties': True,
+        })
+
+    def test_description_matches_per_tool_format(self):
+        tools = [PythonREPLTool(), ReturnFinalAnswerTool()]
+        registry = ToolRegistry(tools)
+        self.assertEqual(registry.description, "\n".join(
+            f"{tool.name}: {tool.description}. how to run: {tool._describe_run()}" for tool in tools))
+        self.assertEqual(registry.quoted_names, '"Python REPL Tool", "Return Final Answer Tool"')
+        self.assertIn('Python REPL Tool', registry)
+
+    def test_agent_compiles_once_and_invalidates_on_change(self):
+        agent = Agent(llm=NoopLLM(), tools=[PythonREPLTool()])
+        with patch.object(BaseTool, '_describe_run', autospec=True, return_value='described') as describe:
+            agent.tools = list(agent.tools)
+            for _ in range(5):
+                agent.tool_description, agent.quoted_tool_names, agent.tool_by_names
+            self.assertEqual(describe.call_count, 2)
+
+            agent.tools.append(LookupTool())  # in-place edits are picked up too
+            self.assertIn('Lookup Tool', agent.tool_by_names)
+            self.assertEqual(describe.call_count, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from squad_goals import Agent, Task
+from squad_goals.llms.base_llm import LLM
+from squad_goals.tools import BaseTool
+from squad_goals.tracing import InMemorySpanExporter, OTLPJsonFileExporter, Tracer, set_tracer, span
+from squad_goals.workflow import Plan, Workflow
+
+
+class ScriptedLLM(LLM):
+    def __init__(self, responses, **kwargs):
+        self.responses = list(responses)
+        self.model_name = 'scripted'
+        self.calls = 0
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        self.calls += 1
+        return self.responses[min(self.calls, len(self.responses)) - 1]
+
+
+class EchoTool(BaseTool):
+    def __init__(self):
+        super().__init__("Echo Tool", "Echoes the input back")
+
+    def run(self, text: str) -> str:
+        return text.upper()
+
+
+ECHO = 'Thought: echo\nAction: Echo Tool\nAction Input: {"text": "hi"}'
+ECHO_TWICE = ECHO + '\nAction: Echo Tool\nAction Input: {"text": "there"}'
+FINAL_ANSWER = 'Thought: done\nAction: Return Final Answer Tool\nAction Input: {"final_answer": "42"}'
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemorySpanExporter()
+        set_tracer(Tracer(self.exporter))
+
+    def tearDown(self):
+        set_tracer(None)
+
+    def assertChildNames(self, parent, names):
+        self.assertEqual([child.name for child in self.exporter.children(parent)], names)
+
+    def test_workflow_spans_nest(self):
+        agent = Agent(llm=ScriptedLLM([ECHO, FINAL_ANSWER]), tools=[EchoTool()])
+        Workflow(plan=Plan(goal='g', steps=['only step']), goal='g', agent=agent).run()
+
+        [workflow] = self.exporter.by_name('workflow.run')
+        self.assertIsNone(workflow.parent_id)
+        [step] = self.exporter.children(workflow)
+        self.assertEqual(step.name, 'workflow.step')
+        [agent_run] = self.exporter.children(step)
+        self.assertEqual(agent_run.attributes['provider'], 'custom')
+        first_loop, second_loop = self.exporter.children(agent_run)
+        self.assertChildNames(first_loop, ['llm.generate', 'tool.run'])
+        llm_span, tool_span = self.exporter.children(first_loop)
+        self.assertEqual(llm_span.attributes['model'], 'scripted')
+        self.assertGreater(llm_span.attributes['prompt_chars'], 0)
+        self.assertEqual(llm_span.attributes['completion_chars'], len(ECHO))
+        self.assertEqual((tool_span.attributes['tool'], tool_span.attributes['output_chars']), ('Echo Tool', 2))
+        self.assertEqual(second_loop.attributes['tools'], 'Return Final Answer Tool')
+        self.assertEqual({s.trace_id for s in self.exporter.spans}, {workflow.trace_id})
+
+    def test_parallel_tools_nest_under_their_loop(self):
+        agent = Agent(llm=ScriptedLLM([ECHO_TWICE, FINAL_ANSWER]), tools=[EchoTool()], multi_action=True)
+        agent.run(Task(name='t', goal='g'))
+        first_loop = self.exporter.by_name('agent.loop')[0]
+        self.assertChildNames(first_loop, ['llm.generate', 'tool.run', 'tool.run'])
+
+    def test_async_runs_get_separate_traces(self):
+        async def collect(agent):
+            return [e async for e in agent.arun(Task(name='t', goal='g'))]
+
+        async def run_gathered():
+            agents = [Agent(llm=ScriptedLLM([ECHO, FINAL_ANSWER]), tools=[EchoTool()]) for _ in range(3)]
+            await asyncio.gather(*(collect(agent) for agent in agents))
+
+        asyncio.run(run_gathered())
+        runs = self.exporter.by_name('agent.run')
+        self.assertEqual(len({run.trace_id for run in runs}), 3)
+        for run in runs:
+            for loop in self.exporter.children(run):
+                self.assertEqual(loop.trace_id, run.trace_id)
+                self.assertChildNames(loop, ['llm.generate', 'tool.run'])
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with span('failing'):
+                raise ValueError('boom')
+        [failed] = self.exporter.spans
+        self.assertEqual((failed.status, failed.status_message), ('ERROR', 'ValueError: boom'))
+
+    def test_otlp_json_file_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'spans.jsonl')
+            exporter = OTLPJsonFileExporter(path)
+            set_tracer(Tracer(exporter))
+            with span('parent', size=3):
+                with span('child', ratio=0.5, ok=True):
+                    pass
+            handle = exporter._file
+            with open(path) as f:  # flushed after every span, readable while the exporter keeps it open
+                requests = [json.loads(line) for line in f]
+            with span('another'):
+                pass
+            self.assertIs(exporter._file, handle)  # one handle for every span
+            exporter.close()
+            self.assertTrue(handle.closed)
+
+        spans = [r['resourceSpans'][0]['scopeSpans'][0]['spans'][0] for r in requests]
+        child, parent = spans
+        self.assertEqual(child['parentSpanId'], parent['spanId'])
+        self.assertEqual(parent['attributes'], [{'key': 'size', 'value': {'intValue': '3'}}])
+        self.assertEqual(child['attributes'][0]['value'], {'doubleValue': 0.5})
+        self.assertEqual(child['status'], {'code': 1})
+        self.assertLessEqual(int(parent['startTimeUnixNano']), int(child['startTimeUnixNano']))
+        self.assertEqual(len(parent['traceId']), 32)
+
+    def test_no_tracer_no_spans(self):
+        set_tracer(None)
+        Agent(llm=ScriptedLLM([FINAL_ANSWER]), tools=[]).run(Task(name='t', goal='g'))
+        self.assertEqual(self.exporter.spans, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
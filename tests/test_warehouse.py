@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from squad_goals.llms.base_llm import LLM
+from squad_goals.llms.resilience import RetryPolicy
+from squad_goals.llms.warehouse import InMemorySink, JSONLSink, PromptLogger, PromptSink, SQLiteSink, prompt_logger
+
+
+class EchoLLM(LLM):
+    def __init__(self, **kwargs):
+        self.model_name = 'echo'
+        super().__init__(**kwargs)
+
+    def _generate(self, messages, **kwargs):
+        return messages[-1]['content']
+
+    def _stream(self, messages, **kwargs):
+        words = messages[-1]['content'].split(' ')
+        yield words[0]
+        for word in words[1:]:
+            yield ' ' + word
+
+    async def _astream(self, messages, **kwargs):
+        for chunk in self._stream(messages, **kwargs):
+            yield chunk
+
+
+class SlowSink(InMemorySink):
+    """Takes `latency` seconds per batch and fails the first `failures` writes."""
+
+    def __init__(self, latency=0., failures=0):
+        super().__init__()
+        self.latency = latency
+        self.failures = failures
+
+    def write(self, records):
+        time.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('sink unreachable')
+        super().write(records)
+
+
+def messages(content):
+    return [{'role': 'user', 'content': content}]
+
+
+class TestPromptLogger(unittest.TestCase):
+    def test_generate_does_not_wait_on_the_sink(self):
+        sink = SlowSink(latency=0.2)
+        logger = PromptLogger(sink, batch_size=10, flush_interval=0.05)
+        llm = EchoLLM(warehouse=logger)
+        start = time.perf_counter()
+        for i in range(5):
+            self.assertEqual(llm.generate(messages(f'hi {i}'), temperature=0), f'hi {i}')
+        self.assertLess(time.perf_counter() - start, 0.2)
+        self.assertTrue(logger.flush(timeout=2))
+        self.assertEqual(sink.batches, 1)  # one write for the five calls
+        record = sink.records[0]
+        self.assertEqual((record['model'], record['response']), ('EchoLLM', 'hi 0'))
+        self.assertEqual(json.loads(record['prompt']), messages('hi 0'))
+        self.assertEqual(record['inference_params']['temperature'], 0)
+        self.assertEqual(record['inference_params']['model_name'], 'echo')
+        logger.close()
+
+    def test_batches_by_size_and_interval(self):
+        sink = InMemorySink()
+        logger = PromptLogger(sink, batch_size=3, flush_interval=0.05)
+        for i in range(7):
+            logger.log({'response': i})
+        time.sleep(0.2)  # the last record is written once it waited flush_interval
+        self.assertEqual([record['response'] for record in sink.records], list(range(7)))
+        self.assertEqual(sink.batches, 3)  # 3 + 3 by size, 1 by interval
+        self.assertEqual(logger.stats()['written'], 7)
+        logger.close()
+
+    def test_retries_and_drops(self):
+        sink = SlowSink(failures=2)
+        logger = PromptLogger(sink, batch_size=1, retry=RetryPolicy(max_attempts=3, base_delay=0.01,
+                                                                   retry_on=lambda e: True))
+        logger.log({'response': 'a'})
+        logger.flush(timeout=2)
+        self.assertEqual(len(sink.records), 1)
+        sink.failures = 5
+        logger.log({'response': 'b'})
+        logger.flush(timeout=2)
+        stats = logger.stats()
+        self.assertEqual((stats['written'], stats['failed'], stats['retries']), (1, 1, 4))
+        self.assertIsInstance(logger.last_error, ConnectionError)
+        logger.close()
+
+        full = PromptLogger(SlowSink(latency=0.2), batch_size=1, max_queue=1)
+        results = [full.log({'response': i}) for i in range(4)]
+        self.assertFalse(all(results))
+        self.assertGreater(full.stats()['dropped'], 0)
+        full.close()
+
+    def test_sampling(self):
+        sink = InMemorySink()
+        logger = PromptLogger(sink, sample_rate=0.)
+        self.assertFalse(logger.log({'response': 'x'}))
+        errors_only = PromptLogger(sink, sample=lambda record: 'error' in record['response'])
+        errors_only.log({'response': 'fine'})
+        errors_only.log({'response': 'an error'})
+        errors_only.close()
+        self.assertEqual(sink.records, [{'response': 'an error'}])
+        self.assertEqual((logger.stats()['sampled_out'], errors_only.stats()['sampled_out']), (1, 1))
+
+    def test_close_flushes_and_async_paths(self):
+        sink = InMemorySink()
+        logger = PromptLogger(sink, batch_size=100, flush_interval=60)
+        llm = EchoLLM(warehouse=logger)
+        asyncio.run(llm.agenerate(messages('async')))
+        list(llm.stream(messages('streamed')))
+        logger.close()
+        self.assertEqual([record['response'] for record in sink.records], ['async', 'streamed'])
+        self.assertFalse(logger.log({'response': 'late'}))
+
+    def test_streams_closed_early_are_logged(self):
+        sink = InMemorySink()
+        logger = PromptLogger(sink, batch_size=100, flush_interval=60)
+        llm = EchoLLM(warehouse=logger)
+        stream = llm.stream(messages('first then the rest'))
+        next(stream)
+        stream.close()  # what the agent does once it has parsed its next action
+        asyncio.run(self._consume_one(llm.astream(messages('async first then more'))))
+        logger.close()
+        self.assertEqual([record['response'] for record in sink.records], ['first', 'async'])
+
+    @staticmethod
+    async def _consume_one(stream):
+        await stream.__anext__()
+        await stream.aclose()
+
+
+class TestSinks(unittest.TestCase):
+    def test_local_sinks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl, db = os.path.join(tmp, 'prompts.jsonl'), os.path.join(tmp, 'prompts.db')
+            for sink in (JSONLSink(jsonl), SQLiteSink(db)):
+                logger = PromptLogger(sink)
+                EchoLLM(warehouse=logger).generate(messages('hello'))
+                logger.close()
+            with open(jsonl) as f:
+                self.assertEqual(json.loads(f.readline())['response'], 'hello')
+            with sqlite3.connect(db) as connection:
+                self.assertEqual(connection.execute('SELECT model, response FROM prompt_logs').fetchall(),
+                                 [('EchoLLM', 'hello')])
+
+    def test_prompt_logger_resolution(self):
+        logger = PromptLogger(InMemorySink())
+        self.assertIs(prompt_logger(logger), logger)
+        self.assertIsInstance(prompt_logger(InMemorySink()), PromptLogger)
+        with self.assertRaises(ValueError):
+            prompt_logger('bigquery')
+        with self.assertRaises(NotImplementedError):
+            PromptSink().write([])
+
+
+if __name__ == '__main__':
+    unittest.main()